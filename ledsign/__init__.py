@@ -1,11 +1,13 @@
 from ledsign.device import LEDSignDeviceNotFoundError,LEDSignAccessError,LEDSign
+from ledsign.cache import LEDSignCompilationCache
 from ledsign.hardware import LEDSignHardware,LEDSignSelector
 from ledsign.keypoint_list import LEDSignKeypoint
-from ledsign.program import LEDSignProgramError,LEDSignProgram,LEDSignProgramBuilder
+from ledsign.mask import LEDSignMask
+from ledsign.program import LEDSignProgramError,LEDSignKeypointOverlap,LEDSignProgram,LEDSignProgramBuilder
 from ledsign.program_io import LEDSignCompiledProgram
 from ledsign.protocol import LEDSignUnsupportedProtocolError
 from ledsign.proxy import LEDSignProtocolError,LEDSignProxyError
 
 
 
-__all__=["LEDSign","LEDSignAccessError","LEDSignCompiledProgram","LEDSignDeviceNotFoundError","LEDSignHardware","LEDSignKeypoint","LEDSignProgram","LEDSignProgramBuilder","LEDSignProgramError","LEDSignProtocolError","LEDSignProxyError","LEDSignSelector","LEDSignUnsupportedProtocolError"]
+__all__=["LEDSign","LEDSignAccessError","LEDSignCompilationCache","LEDSignCompiledProgram","LEDSignDeviceNotFoundError","LEDSignHardware","LEDSignKeypoint","LEDSignKeypointOverlap","LEDSignMask","LEDSignProgram","LEDSignProgramBuilder","LEDSignProgramError","LEDSignProtocolError","LEDSignProxyError","LEDSignSelector","LEDSignUnsupportedProtocolError"]
@@ -0,0 +1,174 @@
+import hashlib
+import ledsign.program_io
+import os
+import struct
+import time
+
+
+
+__all__=["LEDSignCompilationCache"]
+
+
+
+class LEDSignCompilationCache(object):
+	"""
+	Content-addressed, on-disk cache of compiled programs stored in the :python:`directory` folder (created if it does not exist). Enabled by assigning an instance of this class to :py:attr:`LEDSignProgram.compilation_cache`.
+
+	Each entry is a regular :python:`.led` file named after a SHA-256 hash of the program's keypoints, hardware configuration (see :py:func:`LEDSignHardware.get_raw`), duration and compression layout. Whenever the total size of all entries exceeds :python:`max_size` bytes, the least recently used entries are evicted.
+
+	.. autoattribute:: DEFAULT_MAX_SIZE
+	   :no-value:
+
+	   Default cache size limit of 256 MiB.
+	"""
+
+	DEFAULT_MAX_SIZE:int=1<<28
+	FILE_EXTENSION:str=".led"
+	HASH_CHUNK_SIZE:int=4096
+
+	__slots__=["_directory","_max_size","_hit_count","_miss_count","_last_access_time"]
+
+	def __init__(self,directory:str,max_size:int=DEFAULT_MAX_SIZE) -> None:
+		if (not isinstance(directory,str)):
+			raise TypeError(f"Expected 'str', got '{directory.__class__.__name__}'")
+		if (not isinstance(max_size,int)):
+			raise TypeError(f"Expected 'int', got '{max_size.__class__.__name__}'")
+		if (max_size<0):
+			raise ValueError(f"Invalid cache size: {max_size}")
+		os.makedirs(directory,exist_ok=True)
+		self._directory=directory
+		self._max_size=max_size
+		self._hit_count=0
+		self._miss_count=0
+		self._last_access_time=0
+
+	def __repr__(self) -> str:
+		return f"<LEDSignCompilationCache directory={self._directory} hits={self._hit_count} misses={self._miss_count}>"
+
+	def _get_key(self,program:"LEDSignProgram",is_compressed:bool) -> str:
+		out=hashlib.sha256(struct.pack("<8sIB",program._hardware.get_raw(),program._duration,is_compressed))
+		mask_size=(len(program._hardware._pixels)+7)>>3
+		chunk=[]
+		for kp in program._keypoint_list.iterate_all():
+			chunk.append(struct.pack("<III",kp.rgb,kp.end,kp.duration)+kp.mask.to_bytes(mask_size,"little"))
+			if (len(chunk)>=LEDSignCompilationCache.HASH_CHUNK_SIZE):
+				out.update(b"".join(chunk))
+				chunk=[]
+		out.update(b"".join(chunk))
+		return out.hexdigest()
+
+	def _get_path(self,key:str) -> str:
+		return os.path.join(self._directory,key+LEDSignCompilationCache.FILE_EXTENSION)
+
+	def _touch(self,path:str) -> None:
+		self._last_access_time=max(time.time_ns(),self._last_access_time+1)
+		os.utime(path,ns=(self._last_access_time,self._last_access_time))
+
+	def _get_entries(self) -> list[os.DirEntry]:
+		return [entry for entry in os.scandir(self._directory) if entry.name.endswith(LEDSignCompilationCache.FILE_EXTENSION) and entry.is_file()]
+
+	def _load(self,key:str,program:"LEDSignProgram",is_compressed:bool,engine:int) -> "LEDSignCompiledProgram|None":
+		path=self._get_path(key)
+		out=None
+		try:
+			with open(path,"rb") as rf:
+				header=rf.read(8)
+				data=bytearray(rf.read())
+		except OSError:
+			self._miss_count+=1
+			return None
+		if (len(header)==8):
+			ctrl,crc=struct.unpack("<II",header)
+			out=ledsign.program_io.LEDSignCompiledProgram._from_payload(program,is_compressed,engine,crc,data)
+			if (out is not None and out._ctrl!=ctrl):
+				out=None
+		try:
+			if (out is None):
+				os.remove(path)
+			else:
+				self._touch(path)
+		except OSError:
+			pass
+		if (out is None):
+			self._miss_count+=1
+		else:
+			self._hit_count+=1
+		return out
+
+	def _store(self,key:str,compiled_program:"LEDSignCompiledProgram") -> None:
+		if (len(compiled_program._data)+8>self._max_size):
+			return
+		path=self._get_path(key)
+		temp_path=f"{path}.{os.getpid()}.tmp"
+		with open(temp_path,"wb") as wf:
+			wf.write(struct.pack("<II",compiled_program._ctrl,compiled_program._crc))
+			wf.write(compiled_program._data)
+		os.replace(temp_path,path)
+		self._touch(path)
+		self._evict()
+
+	def _evict(self) -> None:
+		entries=[]
+		size=0
+		for entry in self._get_entries():
+			try:
+				stat=entry.stat()
+			except OSError:
+				continue
+			entries.append((stat.st_mtime_ns,stat.st_size,entry.path))
+			size+=stat.st_size
+		entries.sort()
+		for _,entry_size,path in entries:
+			if (size<=self._max_size):
+				break
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+			size-=entry_size
+
+	def clear(self) -> None:
+		"""
+		Removes all entries from the cache. Hit and miss counters are left unchanged.
+		"""
+		for entry in self._get_entries():
+			try:
+				os.remove(entry.path)
+			except OSError:
+				pass
+
+	def get_directory(self) -> str:
+		"""
+		Returns the directory in which cache entries are stored.
+		"""
+		return self._directory
+
+	def get_max_size(self) -> int:
+		"""
+		Returns the maximum total size of all cache entries, in bytes.
+		"""
+		return self._max_size
+
+	def get_size(self) -> int:
+		"""
+		Returns the current total size of all cache entries, in bytes.
+		"""
+		out=0
+		for entry in self._get_entries():
+			try:
+				out+=entry.stat().st_size
+			except OSError:
+				pass
+		return out
+
+	def get_hit_count(self) -> int:
+		"""
+		Returns the number of compilations served from the cache.
+		"""
+		return self._hit_count
+
+	def get_miss_count(self) -> int:
+		"""
+		Returns the number of compilations which were not found in the cache (or whose cache entry was invalid), and had to be compiled.
+		"""
+		return self._miss_count
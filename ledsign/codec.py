@@ -0,0 +1,223 @@
+from collections.abc import Sequence
+import ledsign.program
+import struct
+try:
+	import numpy
+except ImportError:
+	numpy=None
+
+
+
+__all__=["LEDSignFrameCodec"]
+
+
+
+def _bit_permute_step(a,b,c):
+	t=((a>>c)^a)&b
+	return (a^t)^(t<<c)
+
+
+
+def _permute_word(value):
+	value=_bit_permute_step(value,0x00aa00aa,7)
+	value=_bit_permute_step(value,0x0000cccc,14)
+	value=_bit_permute_step(value,0x00f000f0,4)
+	return _bit_permute_step(value,0x0000ff00,8)
+
+
+
+def _inverse_permute_word(value):
+	value=_bit_permute_step(value,0x0a0a0a0a,3)
+	value=_bit_permute_step(value,0x00cc00cc,6)
+	value=_bit_permute_step(value,0x0000f0f0,12)
+	return _bit_permute_step(value,0x0000ff00,8)
+
+
+
+def _create_pack_table() -> list[list[int]]:
+	out=[]
+	for i in range(0,12):
+		channel_offset=(32,0,64)[i%3]
+		out.append([_permute_word(j<<((i//3)<<3))<<channel_offset for j in range(0,256)])
+	return out
+
+
+
+def _create_unpack_table() -> list[list[int]]:
+	out=[]
+	for i in range(0,12):
+		channel_offset=(8,16,0)[i>>2]
+		table=[]
+		for j in range(0,256):
+			value=_inverse_permute_word(j<<((i&3)<<3))
+			table.append(sum([((value>>(k<<3))&0xff)<<(24*k+channel_offset) for k in range(0,4)]))
+		out.append(table)
+	return out
+
+
+
+class LEDSignFrameCodec(object):
+	CODEC_AUTO:int=0x00
+	CODEC_PYTHON:int=0x01
+	CODEC_NUMPY:int=0x02
+
+	CODECS:dict[int,str]={
+		CODEC_AUTO: "auto",
+		CODEC_PYTHON: "python",
+		CODEC_NUMPY: "numpy",
+	}
+
+	NUMPY_MIN_PIXEL_COUNT:int=256
+
+	PACK_TABLE:list[list[int]]=_create_pack_table()
+	UNPACK_TABLE:list[list[int]]=_create_unpack_table()
+
+	@staticmethod
+	def _resolve_codec(codec:int,pixel_count:int) -> int:
+		if (codec==LEDSignFrameCodec.CODEC_AUTO):
+			return (LEDSignFrameCodec.CODEC_NUMPY if numpy is not None and pixel_count>=LEDSignFrameCodec.NUMPY_MIN_PIXEL_COUNT else LEDSignFrameCodec.CODEC_PYTHON)
+		if (codec==LEDSignFrameCodec.CODEC_NUMPY and numpy is None):
+			raise ledsign.program.LEDSignProgramError("NumPy codec not available")
+		return codec
+
+	@staticmethod
+	def pack_word(a:int,b:int,c:int,d:int) -> bytes:
+		table=LEDSignFrameCodec.PACK_TABLE
+		return (table[0][(a>>16)&0xff]|table[1][(a>>8)&0xff]|table[2][a&0xff]|table[3][(b>>16)&0xff]|table[4][(b>>8)&0xff]|table[5][b&0xff]|table[6][(c>>16)&0xff]|table[7][(c>>8)&0xff]|table[8][c&0xff]|table[9][(d>>16)&0xff]|table[10][(d>>8)&0xff]|table[11][d&0xff]).to_bytes(12,"little")
+
+	@staticmethod
+	def pack_words(pixels:Sequence[int],codec:int=CODEC_AUTO) -> bytearray:
+		if (LEDSignFrameCodec._resolve_codec(codec,len(pixels))==LEDSignFrameCodec.CODEC_NUMPY):
+			return LEDSignFrameCodec._pack_words_numpy(numpy.asarray(pixels,dtype=numpy.uint32))
+		t0,t1,t2,t3,t4,t5,t6,t7,t8,t9,t10,t11=LEDSignFrameCodec.PACK_TABLE
+		out=bytearray(len(pixels)*3)
+		for i in range(0,len(pixels),4):
+			a=pixels[i]
+			b=pixels[i+1]
+			c=pixels[i+2]
+			d=pixels[i+3]
+			out[i*3:i*3+12]=(t0[(a>>16)&0xff]|t1[(a>>8)&0xff]|t2[a&0xff]|t3[(b>>16)&0xff]|t4[(b>>8)&0xff]|t5[b&0xff]|t6[(c>>16)&0xff]|t7[(c>>8)&0xff]|t8[c&0xff]|t9[(d>>16)&0xff]|t10[(d>>8)&0xff]|t11[d&0xff]).to_bytes(12,"little")
+		return out
+
+	@staticmethod
+	def unpack_words(data:bytes|bytearray,codec:int=CODEC_AUTO) -> list[int]:
+		if (LEDSignFrameCodec._resolve_codec(codec,len(data)//3)==LEDSignFrameCodec.CODEC_NUMPY):
+			return LEDSignFrameCodec._unpack_words_numpy(data).tolist()
+		t0,t1,t2,t3,t4,t5,t6,t7,t8,t9,t10,t11=LEDSignFrameCodec.UNPACK_TABLE
+		out=[]
+		for i in range(0,len(data),12):
+			value=t0[data[i]]|t1[data[i+1]]|t2[data[i+2]]|t3[data[i+3]]|t4[data[i+4]]|t5[data[i+5]]|t6[data[i+6]]|t7[data[i+7]]|t8[data[i+8]]|t9[data[i+9]]|t10[data[i+10]]|t11[data[i+11]]
+			out.append(value&0xffffff)
+			out.append((value>>24)&0xffffff)
+			out.append((value>>48)&0xffffff)
+			out.append(value>>72)
+		return out
+
+	@staticmethod
+	def pack(pixels:Sequence[int],led_depth:int,codec:int=CODEC_AUTO) -> bytearray:
+		if (not led_depth):
+			return bytearray()
+		if (LEDSignFrameCodec._resolve_codec(codec,len(pixels))==LEDSignFrameCodec.CODEC_NUMPY):
+			return LEDSignFrameCodec._pack_frames_numpy(numpy.asarray(pixels,dtype=numpy.uint32),led_depth)
+		words=[0 for _ in range(0,len(pixels))]
+		frame_length=led_depth<<3
+		for i in range(0,len(pixels),frame_length):
+			for j in range(0,8):
+				k=i+(j>>2)*(led_depth<<2)+(j&3)
+				words[k:k+(led_depth<<2):4]=pixels[i+j*led_depth:i+(j+1)*led_depth]
+		return LEDSignFrameCodec.pack_words(words,LEDSignFrameCodec.CODEC_PYTHON)
+
+	@staticmethod
+	def unpack(data:bytes|bytearray,led_depth:int,codec:int=CODEC_AUTO) -> list[int]:
+		if (not led_depth):
+			return []
+		if (LEDSignFrameCodec._resolve_codec(codec,len(data)//3)==LEDSignFrameCodec.CODEC_NUMPY):
+			return LEDSignFrameCodec._unpack_frames_numpy(data,led_depth).tolist()
+		words=LEDSignFrameCodec.unpack_words(data,LEDSignFrameCodec.CODEC_PYTHON)
+		out=[0 for _ in range(0,len(words))]
+		frame_length=led_depth<<3
+		for i in range(0,len(words),frame_length):
+			for j in range(0,8):
+				k=i+(j>>2)*(led_depth<<2)+(j&3)
+				out[i+j*led_depth:i+(j+1)*led_depth]=words[k:k+(led_depth<<2):4]
+		return out
+
+	@staticmethod
+	def _pack_channels_python(channels:Sequence[tuple[int,int,int]],led_depth:int) -> bytearray:
+		out=bytearray()
+		for i in range(0,len(channels),led_depth<<3):
+			for j in range(i,i+(led_depth<<3),led_depth<<2):
+				for k in range(j,j+led_depth):
+					r=0
+					g=0
+					b=0
+					for l in range(0,4):
+						pixel=channels[k+l*led_depth]
+						r|=pixel[0]<<(l<<3)
+						g|=pixel[1]<<(l<<3)
+						b|=pixel[2]<<(l<<3)
+					out+=struct.pack("<III",_permute_word(g),_permute_word(r),_permute_word(b))
+		return out
+
+	@staticmethod
+	def _pack_words_numpy(pixels:"numpy.ndarray") -> bytearray:
+		pixels=pixels.reshape(-1,4,1)
+		return LEDSignFrameCodec._pack_channels_numpy(((pixels>>numpy.array([16,8,0],dtype=numpy.uint32))&0xff).astype(numpy.uint8))
+
+	@staticmethod
+	def _pack_channels_numpy(channels:"numpy.ndarray") -> bytearray:
+		channels=channels.reshape(-1,4,3)
+		out=numpy.empty((channels.shape[0],3),dtype="<u4")
+		words=channels.view(numpy.uint8).transpose(0,2,1).copy().view("<u4")[:,:,0]
+		words=_bit_permute_step(words,0x00aa00aa,7)
+		words=_bit_permute_step(words,0x0000cccc,14)
+		words=_bit_permute_step(words,0x00f000f0,4)
+		out[:]=_bit_permute_step(words,0x0000ff00,8)[:,[1,0,2]]
+		return bytearray(out)
+
+	@staticmethod
+	def _unpack_channels_numpy(data:bytes|bytearray|memoryview) -> "numpy.ndarray":
+		words=numpy.frombuffer(data,dtype="<u4").reshape(-1,3)[:,[1,0,2]]
+		words=_bit_permute_step(words,0x0a0a0a0a,3)
+		words=_bit_permute_step(words,0x00cc00cc,6)
+		words=_bit_permute_step(words,0x0000f0f0,12)
+		words=_bit_permute_step(words,0x0000ff00,8)
+		return numpy.ascontiguousarray(words,dtype="<u4").view(numpy.uint8).reshape(-1,3,4).transpose(0,2,1)
+
+	@staticmethod
+	def _unpack_words_numpy(data:bytes|bytearray) -> "numpy.ndarray":
+		words=numpy.frombuffer(data,dtype="<u4").reshape(-1,3).astype(numpy.uint32)
+		out=numpy.zeros((words.shape[0],4),dtype=numpy.uint32)
+		for i,shift in enumerate((8,16,0)):
+			word=words[:,i]
+			word=_bit_permute_step(word,0x0a0a0a0a,3)
+			word=_bit_permute_step(word,0x00cc00cc,6)
+			word=_bit_permute_step(word,0x0000f0f0,12)
+			word=_bit_permute_step(word,0x0000ff00,8)
+			for j in range(0,4):
+				out[:,j]|=((word>>(j<<3))&0xff)<<shift
+		return out.ravel()
+
+	@staticmethod
+	def _pack_frames_numpy(pixels:"numpy.ndarray",led_depth:int) -> bytearray:
+		if (not led_depth):
+			return bytearray()
+		return LEDSignFrameCodec._pack_words_numpy(pixels.reshape(-1,2,4,led_depth).transpose(0,1,3,2))
+
+	@staticmethod
+	def _pack_frame_channels_numpy(channels:"numpy.ndarray",led_depth:int) -> bytearray:
+		if (not led_depth):
+			return bytearray()
+		return LEDSignFrameCodec._pack_channels_numpy(channels.reshape(-1,2,4,led_depth,3).transpose(0,1,3,2,4))
+
+	@staticmethod
+	def _unpack_frame_channels_numpy(data:bytes|bytearray|memoryview,led_depth:int) -> "numpy.ndarray":
+		if (not led_depth):
+			return numpy.zeros((0,0,3),dtype=numpy.uint8)
+		return LEDSignFrameCodec._unpack_channels_numpy(data).reshape(-1,2,led_depth,4,3).transpose(0,1,3,2,4).reshape(-1,led_depth<<3,3)
+
+	@staticmethod
+	def _unpack_frames_numpy(data:bytes|bytearray,led_depth:int) -> "numpy.ndarray":
+		if (not led_depth):
+			return numpy.zeros(0,dtype=numpy.uint32)
+		return LEDSignFrameCodec._unpack_words_numpy(data).reshape(-1,2,led_depth,4).transpose(0,1,3,2).ravel()
@@ -1,4 +1,5 @@
 from collections.abc import Iterator
+from ledsign.mask import LEDSignMask
 from ledsign.program import LEDSignProgramBuilder
 from ledsign.protocol import LEDSignProtocol
 import array
@@ -106,74 +107,65 @@ class LEDSignSelector(object):
 		return LEDSignSelector._check_hardware(hardware)._led_depth
 
 	@staticmethod
-	def get_bounding_box(mask:int=-1,hardware:LEDSignHardware|None=None) -> tuple[float,float,float,float]:
+	def get_bounding_box(mask:int|LEDSignMask=-1,hardware:LEDSignHardware|None=None) -> tuple[float,float,float,float]:
 		"""
 		Returns the bounding box :python:`(sx, sy, ex, ey)` of all pixels selected by :python:`mask`. If no mask is given, the bounding box of all pixels is computed.
 		"""
 		hardware=LEDSignSelector._check_hardware(hardware)
-		if (not isinstance(mask,int)):
-			raise TypeError(f"Expected 'int', got '{mask.__class__.__name__}'")
+		mask=LEDSignMask._get_int(mask)
 		out=[0.0,0.0,0.0,0.0]
 		is_first=True
-		for i,xy in enumerate(hardware._pixels):
-			if (xy is not None and (mask&1)):
-				x,y=xy
-				if (is_first):
-					is_first=False
-					out[0]=x
-					out[1]=y
-					out[2]=x
-					out[3]=y
-				else:
-					out[0]=min(out[0],x)
-					out[1]=min(out[1],y)
-					out[2]=max(out[2],x)
-					out[3]=max(out[3],y)
-			mask>>=1
+		for i in LEDSignMask(mask&hardware._mask).iterate():
+			x,y=hardware._pixels[i]
+			if (is_first):
+				is_first=False
+				out[0]=x
+				out[1]=y
+				out[2]=x
+				out[3]=y
+			else:
+				out[0]=min(out[0],x)
+				out[1]=min(out[1],y)
+				out[2]=max(out[2],x)
+				out[3]=max(out[3],y)
 		return tuple(out)
 
 	@staticmethod
-	def get_center(mask:int=-1,weighted:bool=False,hardware:LEDSignHardware|None=None) -> tuple[float,float]:
+	def get_center(mask:int|LEDSignMask=-1,weighted:bool=False,hardware:LEDSignHardware|None=None) -> tuple[float,float]:
 		"""
 		Returns the center :python:`(cx, cy)` of all pixels selected by :python:`mask`. If no mask is given, the bounding box of all pixels is computed.
 
 		If the :python:`weighted` flag is set, the center is weighted across all pixels locations. Otherwise, the center of the bounding box returned by :py:func:`get_bounding_box` is calculated.
 		"""
 		hardware=LEDSignSelector._check_hardware(hardware)
-		if (not isinstance(mask,int)):
-			raise TypeError(f"Expected 'int', got '{mask.__class__.__name__}'")
+		mask=LEDSignMask._get_int(mask)
 		if (not weighted):
 			bbox=LEDSignSelector.get_bounding_box(mask,hardware)
 			return ((bbox[0]+bbox[2])/2,(bbox[1]+bbox[3])/2)
 		cx=0.0
 		cy=0.0
 		cn=0
-		for i,xy in enumerate(hardware._pixels):
-			if (xy is not None and (mask&1)):
-				cx+=xy[0]
-				cy+=xy[1]
-				cn+=1
-			mask>>=1
+		for i in LEDSignMask(mask&hardware._mask).iterate():
+			cx+=hardware._pixels[i][0]
+			cy+=hardware._pixels[i][1]
+			cn+=1
 		cn+=not cn
 		return (cx/cn,cy/cn)
 
 	@staticmethod
-	def get_pixels(mask:int=-1,letter:int|None=None,hardware:LEDSignHardware|None=None) -> Iterator[tuple[float,float,int]]:
+	def get_pixels(mask:int|LEDSignMask=-1,letter:int|None=None,hardware:LEDSignHardware|None=None) -> Iterator[tuple[float,float,int]]:
 		"""
 		Returns all pixel :python:`(x, y, mask)` tuples selected by :python:`mask`. If no mask is given, the bounding box of all pixels is computed.
 
 		If the :python:`letter` index is given, only pixels from the given letter are processed.
 		"""
 		hardware=LEDSignSelector._check_hardware(hardware)
-		if (not isinstance(mask,int)):
-			raise TypeError(f"Expected 'int', got '{mask.__class__.__name__}'")
+		mask=LEDSignMask._get_int(mask)
 		if (letter is not None):
 			mask&=LEDSignSelector.get_letter_mask(letter,hardware=hardware)
-		m=1
-		for i,xy in enumerate(hardware._pixels):
-			if (xy is not None and (mask&m)):
-				yield (xy[0],xy[1],m)
-			m<<=1
+		for i in LEDSignMask(mask&hardware._mask).iterate():
+			xy=hardware._pixels[i]
+			yield (xy[0],xy[1],1<<i)
 
 	@staticmethod
 	def get_letter_mask(index:int,hardware:LEDSignHardware|None=None) -> int:
@@ -219,7 +211,7 @@ class LEDSignSelector(object):
 		return out
 
 	@staticmethod
-	def get_circle_mask(cx:int|float,cy:int|float,r:int|float,mask:int=-1,hardware:LEDSignHardware|None=None) -> int:
+	def get_circle_mask(cx:int|float,cy:int|float,r:int|float,mask:int|LEDSignMask=-1,hardware:LEDSignHardware|None=None) -> int:
 		"""
 		Returns a mask selecting all pixels within the circle centered at :python:`(cx, cy)` with radius :python:`r`, selected by the provided :python:`mask`. If no mask is given, the all pixels are processed.
 		"""
@@ -232,12 +224,11 @@ class LEDSignSelector(object):
 			raise TypeError(f"Expected 'int' or 'float', got '{r.__class__.__name__}'")
 		if (r<0):
 			raise ValueError(f"Radius must not be negative, got '{r}'")
-		if (not isinstance(mask,int)):
-			raise TypeError(f"Expected 'int', got '{mask.__class__.__name__}'")
+		mask=LEDSignMask._get_int(mask)
 		r*=r
-		out=0
-		for i,xy in enumerate(hardware._pixels):
-			if (xy is not None and (mask&1) and (xy[0]-cx)**2+(xy[1]-cy)**2<=r):
-				out|=1<<i
-			mask>>=1
-		return out
+		out=LEDSignMask(0,len(hardware._pixels))
+		for i in LEDSignMask(mask&hardware._mask).iterate():
+			xy=hardware._pixels[i]
+			if ((xy[0]-cx)**2+(xy[1]-cy)**2<=r):
+				out[i]=True
+		return int(out)
@@ -1,8 +1,12 @@
 from collections.abc import Iterator
+from types import CodeType
+import array
+import bisect
+import heapq
 
 
 
-__all__=["LEDSignKeypoint","LEDSignKeypointList"]
+__all__=["LEDSignKeypoint","LEDSignKeypointList","LEDSignCompactKeypointList","LEDSignPixelKeypointIndex"]
 
 
 
@@ -11,7 +15,7 @@ class LEDSignKeypoint(object):
 	Represents a single keypoint in a program.
 
 	.. note::
-	   For performance reasons, not all generated keypoints are always coalesced together, as this expensive step is only performed during external program loads (ie. programs loaded using :py:func:`LEDSignProgram` or through :py:func:`LEDSign.get_program`).
+	   For performance reasons, generated keypoints are not coalesced together automatically, unless :py:func:`LEDSignProgram.optimize` is called (or :py:attr:`LEDSignProgram.auto_optimize` is set). Programs loaded externally (ie. using :py:func:`LEDSignProgram` or through :py:func:`LEDSign.get_program`) are coalesced during decoding.
 	"""
 
 	__slots__=["rgb","end","duration","mask","_frame","_key","_subtree_mask","_parent","_color","_nodes"]
@@ -21,7 +25,7 @@ class LEDSignKeypoint(object):
 		self.end=end
 		self.duration=duration
 		self.mask=mask
-		self._frame=("<unknown>" if frame is None else f"{frame.f_code.co_filename}:{frame.f_lineno}({frame.f_code.co_name})")
+		self._frame=frame
 		self._key=None
 		self._subtree_mask=mask
 		self._parent=None
@@ -31,6 +35,10 @@ class LEDSignKeypoint(object):
 	def __repr__(self) -> str:
 		return f"<LEDSignKeypoint color=#{self.rgb:06x} duration={self.duration/60:.3f}s end={self.end/60:.3f}s mask={self.mask:x}>"
 
+	@staticmethod
+	def _format_source_location(code:CodeType,line:int) -> str:
+		return f"{code.co_filename}:{line}({code.co_name})"
+
 	def get_rgb(self) -> int:
 		"""
 		Returns the raw RGB color of the current keypoint (red in MSB, blue in LSB).
@@ -67,12 +75,25 @@ class LEDSignKeypoint(object):
 		"""
 		return self.mask
 
+	def get_source_location(self) -> str:
+		"""
+		Returns the source location (:python:`"file:line(function)"`) of the generator code which created the current keypoint, or :python:`"<unknown>"` if it was not recorded (see :py:attr:`LEDSignProgram.SOURCE_LOCATION_LAZY` for details).
+		"""
+		if (self._frame is None):
+			return "<unknown>"
+		if (isinstance(self._frame,str)):
+			return self._frame
+		return LEDSignKeypoint._format_source_location(*self._frame)
+
 
 
 class LEDSignKeypointList(object):
+	BULK_INSERT_RATIO:int=8
+
 	def __init__(self) -> None:
 		self.root=None
 		self._index=0
+		self._size=0
 
 	def _rotate_subtree(self,x:LEDSignKeypoint,dir:int) -> None:
 		y=x._parent
@@ -100,8 +121,41 @@ class LEDSignKeypointList(object):
 			if (y._nodes[dir^1] is not None):
 				y._subtree_mask|=y._nodes[dir^1]._subtree_mask
 
+	def _update_subtree_masks(self,x:LEDSignKeypoint|None) -> None:
+		while (x is not None):
+			x._subtree_mask=x.mask
+			if (x._nodes[0] is not None):
+				x._subtree_mask|=x._nodes[0]._subtree_mask
+			if (x._nodes[1] is not None):
+				x._subtree_mask|=x._nodes[1]._subtree_mask
+			x=x._parent
+
+	def _replace_subtree(self,x:LEDSignKeypoint,y:LEDSignKeypoint|None) -> None:
+		if (x._parent is None):
+			self.root=y
+		else:
+			x._parent._nodes[x==x._parent._nodes[1]]=y
+		if (y is not None):
+			y._parent=x._parent
+
+	def _build_subtree(self,nodes:list[LEDSignKeypoint],start:int,stop:int,depth:int,red_depth:int,parent:LEDSignKeypoint|None) -> LEDSignKeypoint|None:
+		if (start>=stop):
+			return None
+		mid=(start+stop)>>1
+		x=nodes[mid]
+		x._parent=parent
+		x._color=int(depth==red_depth)
+		x._nodes=[self._build_subtree(nodes,start,mid,depth+1,red_depth,x),self._build_subtree(nodes,mid+1,stop,depth+1,red_depth,x)]
+		x._subtree_mask=x.mask
+		if (x._nodes[0] is not None):
+			x._subtree_mask|=x._nodes[0]._subtree_mask
+		if (x._nodes[1] is not None):
+			x._subtree_mask|=x._nodes[1]._subtree_mask
+		return x
+
 	def clear(self) -> None:
 		self.root=None
+		self._size=0
 
 	def lookup_decreasing(self,key:int,mask:int) -> LEDSignKeypoint|None:
 		x=self.root
@@ -151,11 +205,16 @@ class LEDSignKeypointList(object):
 			key=x._key
 		return x
 
+	def contains(self,x:LEDSignKeypoint) -> bool:
+		return (x._key is not None and self.lookup_increasing(x._key,x.mask) is x)
+
 	def insert(self,x:LEDSignKeypoint) -> None:
 		x._key=(x.end<<44)|self._index
+		x._subtree_mask=x.mask
 		x._parent=None
 		x._nodes=[None,None]
 		self._index+=1
+		self._size+=1
 		if (self.root is None):
 			x._color=0
 			self.root=x
@@ -205,8 +264,563 @@ class LEDSignKeypointList(object):
 				y._subtree_mask|=y._nodes[1]._subtree_mask
 			y=y._parent
 
+	def insert_many(self,keypoints:list[LEDSignKeypoint]) -> None:
+		if (len(keypoints)*LEDSignKeypointList.BULK_INSERT_RATIO<self._size):
+			for x in keypoints:
+				self.insert(x)
+			return
+		for x in keypoints:
+			x._key=(x.end<<44)|self._index
+			self._index+=1
+		nodes=list(heapq.merge(self.iterate_all(),sorted(keypoints,key=lambda x:x._key),key=lambda x:x._key))
+		self._size=len(nodes)
+		self.root=self._build_subtree(nodes,0,len(nodes),0,(len(nodes).bit_length()-1 if (len(nodes)+1)&len(nodes) else -1),None)
+
+	def remove(self,x:LEDSignKeypoint) -> None:
+		self._size-=1
+		color=x._color
+		if (x._nodes[0] is None or x._nodes[1] is None):
+			y=x._nodes[x._nodes[0] is None]
+			parent=x._parent
+			self._replace_subtree(x,y)
+		else:
+			z=x._nodes[1]
+			while (z._nodes[0] is not None):
+				z=z._nodes[0]
+			color=z._color
+			y=z._nodes[1]
+			if (z._parent==x):
+				parent=z
+			else:
+				parent=z._parent
+				self._replace_subtree(z,y)
+				z._nodes[1]=x._nodes[1]
+				z._nodes[1]._parent=z
+			self._replace_subtree(x,z)
+			z._nodes[0]=x._nodes[0]
+			z._nodes[0]._parent=z
+			z._color=x._color
+		x._parent=None
+		x._nodes=[None,None]
+		x._subtree_mask=x.mask
+		x._color=0
+		z=parent
+		while (not color and y!=self.root and (y is None or not y._color)):
+			dir=int(y==parent._nodes[1])
+			w=parent._nodes[dir^1]
+			if (w._color):
+				w._color=0
+				parent._color=1
+				self._rotate_subtree(parent,dir)
+				w=parent._nodes[dir^1]
+			if ((w._nodes[0] is None or not w._nodes[0]._color) and (w._nodes[1] is None or not w._nodes[1]._color)):
+				w._color=1
+				y=parent
+				parent=y._parent
+				continue
+			if (w._nodes[dir^1] is None or not w._nodes[dir^1]._color):
+				w._nodes[dir]._color=0
+				w._color=1
+				self._rotate_subtree(w,dir^1)
+				w=parent._nodes[dir^1]
+			w._color=parent._color
+			parent._color=0
+			w._nodes[dir^1]._color=0
+			self._rotate_subtree(parent,dir)
+			y=self.root
+			break
+		if (not color and y is not None):
+			y._color=0
+		self._update_subtree_masks(z)
+
+	def update(self,x:LEDSignKeypoint,rgb:int,end:int,duration:int,mask:int) -> None:
+		x.rgb=rgb
+		x.duration=duration
+		if (end!=x.end):
+			self.remove(x)
+			x.end=end
+			x.mask=mask
+			self.insert(x)
+		elif (mask!=x.mask):
+			x.mask=mask
+			self._update_subtree_masks(x)
+
+	def iterate_all(self,reverse:bool=False) -> Iterator[LEDSignKeypoint]:
+		dir=int(reverse)
+		stack=[]
+		x=self.root
+		while (True):
+			while (x is not None):
+				stack.append(x)
+				x=x._nodes[dir]
+			if (not stack):
+				return
+			x=stack.pop()
+			yield x
+			x=x._nodes[dir^1]
+
 	def iterate(self,mask:int) -> Iterator[LEDSignKeypoint]:
 		entry=self.lookup_increasing(0,mask)
 		while (entry is not None):
 			yield entry
 			entry=self.lookup_increasing(entry._key+1,mask)
+
+
+
+class LEDSignCompactKeypointList(object):
+	"""
+	Memory-efficient alternative to :py:class:`LEDSignKeypointList`, used by programs created with :python:`compact=True` (see :py:class:`LEDSignProgram`). Keypoint fields and red-black tree links are stored row-wise in parallel :python:`array` columns, and :py:class:`LEDSignKeypoint` objects are only materialized (as detached copies) when returned by lookups or iterators. Subtree masks equal to a child's subtree mask share the same object, and source locations are interned.
+	"""
+
+	BULK_INSERT_RATIO:int=8
+
+	__slots__=["root","_index","_size","_rgbs","_ends","_durations","_indices","_masks","_subtree_masks","_frames","_frame_strings","_parents","_children","_colors","_free_rows"]
+
+	def __init__(self) -> None:
+		self._index=0
+		self.clear()
+
+	def _get_key(self,x:int) -> int:
+		return (self._ends[x]<<44)|self._indices[x]
+
+	def _get_keypoint(self,x:int) -> LEDSignKeypoint|None:
+		if (x==-1):
+			return None
+		out=LEDSignKeypoint.__new__(LEDSignKeypoint)
+		out.rgb=self._rgbs[x]
+		out.end=self._ends[x]
+		out.duration=self._durations[x]
+		out.mask=self._masks[x]
+		out._frame=self._frames[x]
+		out._key=(out.end<<44)|self._indices[x]
+		out._subtree_mask=out.mask
+		out._parent=None
+		out._color=0
+		out._nodes=[None,None]
+		return out
+
+	def _add_row(self,x:LEDSignKeypoint) -> int:
+		x._key=(x.end<<44)|self._index
+		if (self._free_rows):
+			out=self._free_rows.pop()
+			self._rgbs[out]=x.rgb
+			self._ends[out]=x.end
+			self._durations[out]=x.duration
+			self._indices[out]=self._index
+			self._masks[out]=x.mask
+			self._subtree_masks[out]=x.mask
+			self._frames[out]=self._frame_strings.setdefault(x._frame,x._frame)
+			self._parents[out]=-1
+			self._children[0][out]=-1
+			self._children[1][out]=-1
+			self._colors[out]=0
+		else:
+			out=len(self._masks)
+			self._rgbs.append(x.rgb)
+			self._ends.append(x.end)
+			self._durations.append(x.duration)
+			self._indices.append(self._index)
+			self._masks.append(x.mask)
+			self._subtree_masks.append(x.mask)
+			self._frames.append(self._frame_strings.setdefault(x._frame,x._frame))
+			self._parents.append(-1)
+			self._children[0].append(-1)
+			self._children[1].append(-1)
+			self._colors.append(0)
+		self._index+=1
+		self._size+=1
+		return out
+
+	def _find_row(self,key:int) -> int:
+		x=self.root
+		while (x!=-1):
+			x_key=self._get_key(x)
+			if (x_key==key):
+				return x
+			x=self._children[x_key<key][x]
+		return -1
+
+	def _update_subtree_masks(self,x:int) -> None:
+		while (x!=-1):
+			self._update_subtree_mask(x)
+			x=self._parents[x]
+
+	def _replace_subtree(self,x:int,y:int) -> None:
+		parent=self._parents[x]
+		if (parent==-1):
+			self.root=y
+		else:
+			self._children[x==self._children[1][parent]][parent]=y
+		if (y!=-1):
+			self._parents[y]=parent
+
+	def _remove_row(self,x:int) -> None:
+		children=self._children
+		parents=self._parents
+		colors=self._colors
+		self._size-=1
+		color=colors[x]
+		if (children[0][x]==-1 or children[1][x]==-1):
+			y=children[children[0][x]==-1][x]
+			parent=parents[x]
+			self._replace_subtree(x,y)
+		else:
+			z=children[1][x]
+			while (children[0][z]!=-1):
+				z=children[0][z]
+			color=colors[z]
+			y=children[1][z]
+			if (parents[z]==x):
+				parent=z
+			else:
+				parent=parents[z]
+				self._replace_subtree(z,y)
+				children[1][z]=children[1][x]
+				parents[children[1][z]]=z
+			self._replace_subtree(x,z)
+			children[0][z]=children[0][x]
+			parents[children[0][z]]=z
+			colors[z]=colors[x]
+		self._masks[x]=0
+		self._subtree_masks[x]=0
+		self._frames[x]=None
+		self._free_rows.append(x)
+		z=parent
+		while (not color and y!=self.root and (y==-1 or not colors[y])):
+			dir=int(y==children[1][parent])
+			w=children[dir^1][parent]
+			if (colors[w]):
+				colors[w]=0
+				colors[parent]=1
+				self._rotate_subtree(parent,dir)
+				w=children[dir^1][parent]
+			if ((children[0][w]==-1 or not colors[children[0][w]]) and (children[1][w]==-1 or not colors[children[1][w]])):
+				colors[w]=1
+				y=parent
+				parent=parents[y]
+				continue
+			if (children[dir^1][w]==-1 or not colors[children[dir^1][w]]):
+				colors[children[dir][w]]=0
+				colors[w]=1
+				self._rotate_subtree(w,dir^1)
+				w=children[dir^1][parent]
+			colors[w]=colors[parent]
+			colors[parent]=0
+			colors[children[dir^1][w]]=0
+			self._rotate_subtree(parent,dir)
+			y=self.root
+			break
+		if (not color and y!=-1):
+			colors[y]=0
+		self._update_subtree_masks(z)
+
+	def _update_subtree_mask(self,x:int) -> None:
+		out=self._masks[x]
+		for y in (self._children[0][x],self._children[1][x]):
+			if (y==-1):
+				continue
+			subtree_mask=self._subtree_masks[y]
+			merged_mask=out|subtree_mask
+			if (merged_mask!=out):
+				out=(subtree_mask if merged_mask==subtree_mask else merged_mask)
+		self._subtree_masks[x]=out
+
+	def _rotate_subtree(self,x:int,dir:int) -> None:
+		children=self._children
+		parents=self._parents
+		y=parents[x]
+		z=children[dir^1][x]
+		w=children[dir][z]
+		children[dir^1][x]=w
+		if (w!=-1):
+			parents[w]=x
+		children[dir][z]=x
+		parents[x]=z
+		parents[z]=y
+		self._update_subtree_mask(x)
+		self._update_subtree_mask(z)
+		if (y==-1):
+			self.root=z
+		else:
+			children[x==children[1][y]][y]=z
+			self._update_subtree_mask(y)
+
+	def _build_subtree(self,nodes:list[int],start:int,stop:int,depth:int,red_depth:int,parent:int) -> int:
+		if (start>=stop):
+			return -1
+		mid=(start+stop)>>1
+		x=nodes[mid]
+		self._parents[x]=parent
+		self._colors[x]=(depth==red_depth)
+		self._children[0][x]=self._build_subtree(nodes,start,mid,depth+1,red_depth,x)
+		self._children[1][x]=self._build_subtree(nodes,mid+1,stop,depth+1,red_depth,x)
+		self._update_subtree_mask(x)
+		return x
+
+	def _lookup_decreasing_row(self,key:int,mask:int) -> int:
+		ends=self._ends
+		indices=self._indices
+		masks=self._masks
+		subtree_masks=self._subtree_masks
+		parents=self._parents
+		left,right=self._children
+		x=self.root
+		while (x!=-1):
+			x_key=(ends[x]<<44)|indices[x]
+			if (x_key==key and (masks[x]&mask)):
+				break
+			if (key>x_key):
+				y=right[x]
+				if (y!=-1 and (subtree_masks[y]&mask)):
+					x=y
+					continue
+				if (masks[x]&mask):
+					return x
+			y=left[x]
+			if (y!=-1 and (subtree_masks[y]&mask)):
+				x=y
+				continue
+			while (True):
+				y=x
+				x=parents[x]
+				if (x==-1):
+					return -1
+				if (y==right[x]):
+					break
+			key=(ends[x]<<44)|indices[x]
+		return x
+
+	def _lookup_increasing_row(self,key:int,mask:int) -> int:
+		ends=self._ends
+		indices=self._indices
+		masks=self._masks
+		subtree_masks=self._subtree_masks
+		parents=self._parents
+		left,right=self._children
+		x=self.root
+		while (x!=-1):
+			x_key=(ends[x]<<44)|indices[x]
+			if (x_key==key and (masks[x]&mask)):
+				break
+			if (key<x_key):
+				y=left[x]
+				if (y!=-1 and (subtree_masks[y]&mask)):
+					x=y
+					continue
+				if (masks[x]&mask):
+					return x
+			y=right[x]
+			if (y!=-1 and (subtree_masks[y]&mask)):
+				x=y
+				continue
+			while (True):
+				y=x
+				x=parents[x]
+				if (x==-1):
+					return -1
+				if (y==left[x]):
+					break
+			key=(ends[x]<<44)|indices[x]
+		return x
+
+	def _iterate_rows(self,reverse:bool=False) -> Iterator[int]:
+		dir=int(reverse)
+		stack=[]
+		x=self.root
+		while (True):
+			while (x!=-1):
+				stack.append(x)
+				x=self._children[dir][x]
+			if (not stack):
+				return
+			x=stack.pop()
+			yield x
+			x=self._children[dir^1][x]
+
+	def clear(self) -> None:
+		self.root=-1
+		self._size=0
+		self._rgbs=array.array("I")
+		self._ends=array.array("I")
+		self._durations=array.array("I")
+		self._indices=array.array("Q")
+		self._masks=[]
+		self._subtree_masks=[]
+		self._frames=[]
+		self._frame_strings={}
+		self._parents=array.array("i")
+		self._children=(array.array("i"),array.array("i"))
+		self._colors=bytearray()
+		self._free_rows=[]
+
+	def contains(self,x:LEDSignKeypoint) -> bool:
+		if (x._key is None):
+			return False
+		y=self._find_row(x._key)
+		return (y!=-1 and self._rgbs[y]==x.rgb and self._durations[y]==x.duration and self._masks[y]==x.mask)
+
+	def lookup_decreasing(self,key:int,mask:int) -> LEDSignKeypoint|None:
+		return self._get_keypoint(self._lookup_decreasing_row(key,mask))
+
+	def lookup_increasing(self,key:int,mask:int) -> LEDSignKeypoint|None:
+		return self._get_keypoint(self._lookup_increasing_row(key,mask))
+
+	def insert(self,x:LEDSignKeypoint) -> None:
+		x=self._add_row(x)
+		if (self.root==-1):
+			self.root=x
+			return
+		children=self._children
+		parents=self._parents
+		colors=self._colors
+		colors[x]=1
+		key=self._get_key(x)
+		y=self.root
+		while (children[self._get_key(y)<key][y]!=-1):
+			y=children[self._get_key(y)<key][y]
+		parents[x]=y
+		children[self._get_key(y)<key][y]=x
+		while (y!=-1 and colors[y]):
+			self._update_subtree_mask(y)
+			z=parents[y]
+			if (z==-1):
+				colors[y]=0
+				break
+			self._update_subtree_mask(z)
+			dir=int(y==children[0][z])
+			w=children[dir][z]
+			if (w==-1 or not colors[w]):
+				if (x==children[dir][y]):
+					self._rotate_subtree(y,dir^1)
+					y=children[dir^1][z]
+				self._rotate_subtree(z,dir)
+				colors[y]=0
+				colors[z]=1
+				y=parents[parents[z]]
+				break
+			colors[y]=0
+			colors[z]=1
+			colors[w]=0
+			x=z
+			y=parents[x]
+		while (y!=-1):
+			self._update_subtree_mask(y)
+			y=parents[y]
+
+	def insert_many(self,keypoints:list[LEDSignKeypoint]) -> None:
+		if (len(keypoints)*LEDSignCompactKeypointList.BULK_INSERT_RATIO<self._size):
+			for x in keypoints:
+				self.insert(x)
+			return
+		rows=[self._add_row(x) for x in keypoints]
+		rows.sort(key=self._get_key)
+		nodes=list(heapq.merge(self._iterate_rows(),rows,key=self._get_key))
+		self.root=self._build_subtree(nodes,0,len(nodes),0,(len(nodes).bit_length()-1 if (len(nodes)+1)&len(nodes) else -1),-1)
+
+	def remove(self,x:LEDSignKeypoint) -> None:
+		self._remove_row(self._find_row(x._key))
+
+	def update(self,x:LEDSignKeypoint,rgb:int,end:int,duration:int,mask:int) -> None:
+		y=self._find_row(x._key)
+		x.rgb=rgb
+		x.duration=duration
+		x.mask=mask
+		x._subtree_mask=mask
+		self._rgbs[y]=rgb
+		self._durations[y]=duration
+		if (end!=x.end):
+			self._remove_row(y)
+			x.end=end
+			self.insert(x)
+		elif (mask!=self._masks[y]):
+			self._masks[y]=mask
+			self._update_subtree_masks(y)
+
+	def iterate_all(self,reverse:bool=False) -> Iterator[LEDSignKeypoint]:
+		for x in self._iterate_rows(reverse):
+			yield self._get_keypoint(x)
+
+	def iterate(self,mask:int) -> Iterator[LEDSignKeypoint]:
+		x=self._lookup_increasing_row(0,mask)
+		while (x!=-1):
+			yield self._get_keypoint(x)
+			x=self._lookup_increasing_row(self._get_key(x)+1,mask)
+
+
+
+class LEDSignPixelKeypointIndex(object):
+	"""
+	Inverted index of a keypoint list, used by programs created with :python:`pixel_index=True` (see :py:class:`LEDSignProgram`). For every pixel, the keypoints selecting it are stored in a list ordered by key, together with a parallel list of keys, so that the successor of a keypoint on a pixel is found in constant time, and any other lookup by a single bisection. Lookups by mask use the lowest pixel of the mask, and are therefore only valid for masks whose pixels have identical keypoint sequences (ie. single pixels or pixel classes). Lookups never modify the index, and pixels without any keypoints return empty lists, so the index is only changed by :py:func:`insert`, :py:func:`insert_many` and :py:func:`remove`.
+	"""
+
+	__slots__=["_pixels"]
+
+	def __init__(self,keypoint_list:"LEDSignKeypointList|LEDSignCompactKeypointList") -> None:
+		self._pixels={}
+		for x in keypoint_list.iterate_all():
+			mask=x.mask
+			while (mask):
+				keypoints,keys=self._get_pixel_entry(mask)
+				keypoints.append(x)
+				keys.append(x._key)
+				mask&=mask-1
+
+	def clear(self) -> None:
+		self._pixels={}
+
+	def _get_pixel_entry(self,mask:int) -> tuple[list[LEDSignKeypoint],list[int]]:
+		pixel=(mask&(-mask)).bit_length()-1
+		if (pixel not in self._pixels):
+			self._pixels[pixel]=([],[])
+		return self._pixels[pixel]
+
+	def get_pixel_keypoints(self,mask:int) -> tuple[list[LEDSignKeypoint],list[int]]:
+		return self._pixels.get((mask&(-mask)).bit_length()-1,([],[]))
+
+	def lookup_decreasing(self,key:int,mask:int) -> LEDSignKeypoint|None:
+		keypoints,keys=self.get_pixel_keypoints(mask)
+		i=bisect.bisect_right(keys,key)
+		return (keypoints[i-1] if i else None)
+
+	def lookup_increasing(self,key:int,mask:int) -> LEDSignKeypoint|None:
+		keypoints,keys=self.get_pixel_keypoints(mask)
+		i=bisect.bisect_left(keys,key)
+		return (keypoints[i] if i<len(keys) else None)
+
+	def insert(self,x:LEDSignKeypoint) -> None:
+		mask=x.mask
+		while (mask):
+			keypoints,keys=self._get_pixel_entry(mask)
+			if (not keys or keys[-1]<x._key):
+				keypoints.append(x)
+				keys.append(x._key)
+			else:
+				i=bisect.bisect_left(keys,x._key)
+				keypoints.insert(i,x)
+				keys.insert(i,x._key)
+			mask&=mask-1
+
+	def insert_many(self,keypoints:list[LEDSignKeypoint]) -> None:
+		unsorted_pixels=set()
+		for x in keypoints:
+			mask=x.mask
+			while (mask):
+				pixel_keypoints,keys=self._get_pixel_entry(mask)
+				if (keys and keys[-1]>x._key):
+					unsorted_pixels.add(mask&(-mask))
+				pixel_keypoints.append(x)
+				keys.append(x._key)
+				mask&=mask-1
+		for mask in unsorted_pixels:
+			pixel_keypoints,keys=self._get_pixel_entry(mask)
+			pixel_keypoints.sort(key=lambda x:x._key)
+			keys[:]=[x._key for x in pixel_keypoints]
+
+	def remove(self,x:LEDSignKeypoint) -> None:
+		mask=x.mask
+		while (mask):
+			keypoints,keys=self._get_pixel_entry(mask)
+			i=bisect.bisect_left(keys,x._key)
+			del keypoints[i]
+			del keys[i]
+			mask&=mask-1
@@ -0,0 +1,188 @@
+from collections.abc import Iterator
+try:
+	import numpy
+except ImportError:
+	numpy=None
+
+
+
+__all__=["LEDSignMask"]
+
+
+
+def _create_bit_table() -> list[tuple[int,...]]:
+	return [tuple([i for i in range(0,8) if (j>>i)&1]) for j in range(0,256)]
+
+
+
+class LEDSignMask(object):
+	"""
+	Fixed-width pixel mask stored in a little-endian byte buffer, in which bit :python:`i` selects pixel :python:`i`. Masks are created from plain :python:`int` masks, other :py:class:`LEDSignMask` objects or NumPy boolean arrays (see :py:func:`to_numpy`), and can be passed to every function accepting an :python:`int` mask. :python:`int(mask)` converts a mask back into an integer.
+
+	Bits beyond :python:`width` (which defaults to the bit length of the source mask) are discarded, so a :python:`width` is required for negative (ie. infinite) integer masks. In-place operators (:python:`&=`, :python:`|=` and :python:`^=`) update the existing buffer, using NumPy for masks of at least :py:attr:`NUMPY_MIN_WIDTH` pixels. Binary operators also accept plain integers, and return a new mask with the width of the :py:class:`LEDSignMask` operand.
+
+	.. autoattribute:: NUMPY_MIN_WIDTH
+	   :no-value:
+
+	   Minimum mask width for which in-place operators and :py:func:`iterate` are vectorized with NumPy (if installed).
+	"""
+
+	NUMPY_MIN_WIDTH:int=4096
+
+	BIT_TABLE:list[tuple[int,...]]=_create_bit_table()
+
+	__slots__=["_data","_width"]
+
+	def __init__(self,value:"int|LEDSignMask|numpy.ndarray"=0,width:int|None=None) -> None:
+		if (width is not None):
+			if (not isinstance(width,int)):
+				raise TypeError(f"Expected 'int', got '{width.__class__.__name__}'")
+			if (width<0):
+				raise ValueError(f"Invalid mask width '{width}'")
+		if (isinstance(value,LEDSignMask)):
+			if (width is None):
+				width=value._width
+			value=int(value)
+		elif (numpy is not None and isinstance(value,numpy.ndarray)):
+			if (value.ndim!=1):
+				raise ValueError(f"Invalid mask array shape '{value.shape}'")
+			if (width is None):
+				width=value.shape[0]
+			self._width=width
+			self._data=bytearray(numpy.packbits(value[:width].astype(bool),bitorder="little").tobytes())
+			self._data.extend(bytes(((width+7)>>3)-len(self._data)))
+			return
+		elif (not isinstance(value,int)):
+			raise TypeError(f"Expected 'int', 'LEDSignMask' or 'numpy.ndarray', got '{value.__class__.__name__}'")
+		if (width is None):
+			if (value<0):
+				raise ValueError(f"Invalid mask width for negative mask '{value}'")
+			width=value.bit_length()
+		self._width=width
+		self._data=bytearray((value&((1<<width)-1)).to_bytes((width+7)>>3,"little"))
+
+	def __repr__(self) -> str:
+		return f"<LEDSignMask width={self._width} count={self.get_count()}>"
+
+	def __int__(self) -> int:
+		return int.from_bytes(self._data,"little")
+
+	def __index__(self) -> int:
+		return int.from_bytes(self._data,"little")
+
+	def __bool__(self) -> bool:
+		return self._data.count(0)!=len(self._data)
+
+	def __eq__(self,other:object) -> bool:
+		if (isinstance(other,LEDSignMask)):
+			return self._data.rstrip(b"\x00")==other._data.rstrip(b"\x00")
+		if (isinstance(other,int)):
+			return int(self)==other
+		return NotImplemented
+
+	def __contains__(self,index:int) -> bool:
+		return self[index]
+
+	def __getitem__(self,index:int) -> bool:
+		if (not isinstance(index,int)):
+			raise TypeError(f"Expected 'int', got '{index.__class__.__name__}'")
+		return (0<=index<self._width and bool((self._data[index>>3]>>(index&7))&1))
+
+	def __setitem__(self,index:int,value:bool) -> None:
+		if (not isinstance(index,int)):
+			raise TypeError(f"Expected 'int', got '{index.__class__.__name__}'")
+		if (not (0<=index<self._width)):
+			raise IndexError("Mask index out of range")
+		if (value):
+			self._data[index>>3]|=1<<(index&7)
+		else:
+			self._data[index>>3]&=~(1<<(index&7))
+
+	def __iter__(self) -> Iterator[int]:
+		return self.iterate()
+
+	def __iand__(self,other:"int|LEDSignMask") -> "LEDSignMask":
+		return self._apply(other,0)
+
+	def __ior__(self,other:"int|LEDSignMask") -> "LEDSignMask":
+		return self._apply(other,1)
+
+	def __ixor__(self,other:"int|LEDSignMask") -> "LEDSignMask":
+		return self._apply(other,2)
+
+	def __and__(self,other:"int|LEDSignMask") -> "LEDSignMask":
+		return LEDSignMask(self)._apply(other,0)
+
+	def __or__(self,other:"int|LEDSignMask") -> "LEDSignMask":
+		return LEDSignMask(self)._apply(other,1)
+
+	def __xor__(self,other:"int|LEDSignMask") -> "LEDSignMask":
+		return LEDSignMask(self)._apply(other,2)
+
+	__rand__=__and__
+	__ror__=__or__
+	__rxor__=__xor__
+
+	def __invert__(self) -> "LEDSignMask":
+		return LEDSignMask(self)._apply(-1,2)
+
+	def _apply(self,other:"int|LEDSignMask",operation:int) -> "LEDSignMask":
+		if (isinstance(other,LEDSignMask)):
+			other_data=other._data
+			if (len(other_data)!=len(self._data)):
+				other_data=other_data[:len(self._data)]+bytes(max(len(self._data)-len(other_data),0))
+		elif (isinstance(other,int)):
+			other_data=(other&((1<<(len(self._data)<<3))-1)).to_bytes(len(self._data),"little")
+		else:
+			return NotImplemented
+		if (numpy is not None and self._width>=LEDSignMask.NUMPY_MIN_WIDTH):
+			data=numpy.frombuffer(self._data,dtype=numpy.uint8)
+			(numpy.bitwise_and,numpy.bitwise_or,numpy.bitwise_xor)[operation](data,numpy.frombuffer(other_data,dtype=numpy.uint8),out=data)
+		else:
+			a=int.from_bytes(self._data,"little")
+			b=int.from_bytes(other_data,"little")
+			self._data[:]=(a&b if operation==0 else (a|b if operation==1 else a^b)).to_bytes(len(self._data),"little")
+		if (self._width&7):
+			self._data[-1]&=(1<<(self._width&7))-1
+		return self
+
+	def get_width(self) -> int:
+		"""
+		Returns the number of pixels covered by the mask.
+		"""
+		return self._width
+
+	def get_count(self) -> int:
+		"""
+		Returns the number of selected pixels.
+		"""
+		return int.from_bytes(self._data,"little").bit_count()
+
+	def iterate(self) -> Iterator[int]:
+		"""
+		Iterates over the indices of all selected pixels in increasing order. Unselected bytes of the mask are skipped without inspecting their individual bits.
+		"""
+		if (numpy is not None and self._width>=LEDSignMask.NUMPY_MIN_WIDTH):
+			yield from numpy.flatnonzero(numpy.unpackbits(numpy.frombuffer(self._data,dtype=numpy.uint8),bitorder="little")).tolist()
+			return
+		table=LEDSignMask.BIT_TABLE
+		for i,value in enumerate(self._data):
+			if (value):
+				for j in table[value]:
+					yield (i<<3)+j
+
+	def to_numpy(self) -> "numpy.ndarray":
+		"""
+		Returns the mask as a NumPy boolean array of length :py:func:`get_width`. Raises :py:exc:`RuntimeError` if NumPy is not installed.
+		"""
+		if (numpy is None):
+			raise RuntimeError("NumPy mask conversion not available")
+		return numpy.unpackbits(numpy.frombuffer(self._data,dtype=numpy.uint8),count=self._width,bitorder="little").astype(bool)
+
+	@staticmethod
+	def _get_int(mask:"int|LEDSignMask") -> int:
+		if (isinstance(mask,LEDSignMask)):
+			return int(mask)
+		if (not isinstance(mask,int)):
+			raise TypeError(f"Expected 'int' or 'LEDSignMask', got '{mask.__class__.__name__}'")
+		return mask
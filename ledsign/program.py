@@ -1,11 +1,15 @@
-from collections.abc import Callable,Iterator
+from collections.abc import Callable,Iterable,Iterator
 from ledsign.checksum import LEDSignCRC
-from ledsign.keypoint_list import LEDSignKeypoint,LEDSignKeypointList
+from ledsign.keypoint_list import LEDSignCompactKeypointList,LEDSignKeypoint,LEDSignKeypointList,LEDSignPixelKeypointIndex
+from ledsign.mask import LEDSignMask
 from ledsign.program_io import LEDSignCompiledProgram,LEDSignProgramParser
 from ledsign.protocol import LEDSignProtocol
 from ledsign.proxy import LEDSignProtocolError
+from types import CodeType
 from typing import Union
+import bisect
 import ledsign.device
+import ledsign.program_io
 import os
 import struct
 import sys
@@ -14,7 +18,7 @@ import weakref
 
 
 
-__all__=["LEDSignProgramError","LEDSignProgram","LEDSignProgramBuilder"]
+__all__=["LEDSignProgramError","LEDSignKeypointOverlap","LEDSignProgram","LEDSignProgramBuilder"]
 
 
 
@@ -25,30 +29,241 @@ class LEDSignProgramError(Exception):
 
 
 
+class LEDSignKeypointOverlap(object):
+	"""
+	Describes a single error found by :py:func:`LEDSignProgram.verify`, in which :python:`keypoints[1]` starts before :python:`keypoints[0]` ends on the pixels selected by :python:`mask`. If :python:`keypoints[0]` is :python:`None`, :python:`keypoints[1]` starts before the start of the program instead. The :python:`duration` of the overlap is given in frames.
+	"""
+
+	__slots__=["keypoints","duration","mask"]
+
+	def __init__(self,keypoints:tuple[LEDSignKeypoint|None,LEDSignKeypoint],duration:int,mask:int) -> None:
+		self.keypoints=keypoints
+		self.duration=duration
+		self.mask=mask
+
+	def __repr__(self) -> str:
+		return f"<LEDSignKeypointOverlap duration={self.duration/60:.3f}s mask={self.mask:x}>"
+
+	def get_keypoints(self) -> tuple[LEDSignKeypoint|None,LEDSignKeypoint]:
+		"""
+		Returns the earlier and the later of the overlapping keypoints. The earlier keypoint is :python:`None` for keypoints which start before the start of the program.
+		"""
+		return self.keypoints
+
+	def get_duration(self) -> float:
+		"""
+		Returns the duration of the overlap.
+		"""
+		return self.duration/60
+
+	def get_mask(self) -> int:
+		"""
+		Returns the mask of pixels affected by the overlap.
+		"""
+		return self.mask
+
+
+
+def _get_keypoint_overlaps(keypoint_list:LEDSignKeypointList,pixels_mask:int,limit:int) -> list[tuple[LEDSignKeypoint|None,LEDSignKeypoint,int,int]]:
+	pixel_classes=ledsign.program_io._get_pixel_classes(keypoint_list,[1<<i for i in range(0,pixels_mask.bit_length()) if (pixels_mask>>i)&1])
+	class_indices={}
+	for i,(class_mask,_) in enumerate(pixel_classes):
+		while (class_mask):
+			class_indices[(class_mask&(-class_mask)).bit_length()-1]=i
+			class_mask&=class_mask-1
+	keypoints=list(keypoint_list.iterate_all())
+	starts=[kp.end-kp.duration for kp in keypoints]
+	ends=[kp.end for kp in keypoints]
+	class_keypoints=[[] for _ in pixel_classes]
+	keypoint_classes=[]
+	for i,kp in enumerate(keypoints):
+		classes=[]
+		mask=kp.mask
+		while (mask):
+			j=class_indices[(mask&(-mask)).bit_length()-1]
+			mask&=~pixel_classes[j][0]
+			classes.append((j,len(class_keypoints[j])))
+			class_keypoints[j].append(i)
+		keypoint_classes.append(classes)
+	class_bounds=[]
+	for indices in class_keypoints:
+		bounds=[0]*len(indices)
+		j=0
+		for k in sorted(range(0,len(indices)),key=lambda k:starts[indices[k]]):
+			start=starts[indices[k]]
+			while (j<len(indices) and ends[indices[j]]<=start):
+				j+=1
+			bounds[k]=j
+		class_bounds.append(bounds)
+	out=[]
+	for i,kp in enumerate(keypoints):
+		if (starts[i]<0):
+			out.append((None,kp,-starts[i],kp.mask))
+		classes=keypoint_classes[i]
+		if (len(classes)==1):
+			j,k=classes[0]
+			overlapping_keypoints=class_keypoints[j][class_bounds[j][k]:k]
+		else:
+			overlapping_keypoints=sorted({m for j,k in classes for m in class_keypoints[j][class_bounds[j][k]:k]})
+		for m in reversed(overlapping_keypoints):
+			out.append((keypoints[m],kp,ends[m]-starts[i],keypoints[m].mask&kp.mask))
+		if (len(out)>=limit):
+			return out[:limit]
+	return out
+
+
+
+def _get_changed_keypoint_overlaps(keypoint_list:LEDSignKeypointList,keypoints:list[LEDSignKeypoint],limit:int,pixel_index:LEDSignPixelKeypointIndex|None=None) -> list[tuple[LEDSignKeypoint|None,LEDSignKeypoint,int,int]]:
+	keypoints=sorted({kp._key:kp for kp in keypoints if keypoint_list.contains(kp)}.values(),key=lambda kp:kp._key)
+	keys={kp._key for kp in keypoints}
+	out=[]
+	for kp in keypoints:
+		start=kp.end-kp.duration
+		if (start<0):
+			out.append((None,kp,-start,kp.mask))
+		if (pixel_index is not None):
+			predecessors={}
+			successors={}
+			mask=kp.mask
+			while (mask):
+				pixel_keypoints,pixel_keys=pixel_index.get_pixel_keypoints(mask)
+				i=bisect.bisect_left(pixel_keys,kp._key)
+				j=i-1
+				while (j>=0 and pixel_keypoints[j].end>start):
+					predecessors[pixel_keys[j]]=pixel_keypoints[j]
+					j-=1
+				if (i+1<len(pixel_keys)):
+					successors[pixel_keys[i+1]]=pixel_keypoints[i+1]
+				mask&=mask-1
+			for key in sorted(predecessors,reverse=True):
+				entry=predecessors[key]
+				out.append((entry,kp,entry.end-start,entry.mask&kp.mask))
+			for key in sorted(successors):
+				entry=successors[key]
+				if (key not in keys and entry.end-entry.duration<kp.end):
+					out.append((kp,entry,kp.end-entry.end+entry.duration,kp.mask&entry.mask))
+		else:
+			entry=keypoint_list.lookup_decreasing(kp._key-1,kp.mask)
+			while (entry is not None and entry.end>start):
+				out.append((entry,kp,entry.end-start,entry.mask&kp.mask))
+				entry=keypoint_list.lookup_decreasing(entry._key-1,kp.mask)
+			mask=kp.mask
+			entry=keypoint_list.lookup_increasing(kp._key+1,mask)
+			while (entry is not None):
+				if (entry._key not in keys and entry.end-entry.duration<kp.end):
+					out.append((kp,entry,kp.end-entry.end+entry.duration,kp.mask&entry.mask))
+				mask&=~entry.mask
+				if (not mask):
+					break
+				entry=keypoint_list.lookup_increasing(entry._key+1,mask)
+		if (len(out)>=limit):
+			return out[:limit]
+	return out
+
+
+
 class LEDSignProgram(object):
 	"""
 	Contains information about a complete LED sign program compatible with :python:`device`. If the :python:`file_path` argument is given, the program is loaded from the specified file path.
 
+	If :python:`workers` is greater than 1, the frames of the loaded file are split into equal regions, which are decoded in parallel by a :py:class:`concurrent.futures.ProcessPoolExecutor`. Keypoints crossing region boundaries are stitched together, and the result is identical to a serial load.
+
+	If :python:`compact` is set, keypoints are stored in a column-oriented tree instead of as individual :py:class:`LEDSignKeypoint` objects, which uses several times less memory for programs with millions of keypoints. Keypoint objects returned by such programs (for example by :py:func:`get_keypoints`) are created on demand, and are therefore not identical between calls.
+
+	If :python:`pixel_index` is set, the program additionally maintains a per-pixel index of its keypoints, which is updated whenever keypoints are added, removed or updated. Compilation, :py:func:`sample` and incremental verification then find the next keypoint of every pixel in constant time, instead of searching the keypoint tree, at the cost of one list entry per keypoint and selected pixel.
+
+	The :python:`source_location` argument selects how the generator code location of every keypoint created by :py:class:`LEDSignProgramBuilder` is recorded (see :py:attr:`SOURCE_LOCATION_LAZY`). Source locations are only used to report errors found by :py:func:`verify` (see :py:func:`LEDSignKeypoint.get_source_location`).
+
 	An instance of this class can be used as a function decorator to generate programs dynamically (see :py:class:`LEDSignProgramBuilder` or :py:func:`__call__` for details).
+
+	.. autoattribute:: compilation_cache
+	   :no-value:
+
+	   Optional :py:class:`LEDSignCompilationCache` object shared by all programs. If set, :py:func:`compile` and :py:func:`save` return cached results for programs with identical keypoints, hardware, duration and compression layout, and store newly compiled programs in the cache. Set to :python:`None` by default, which disables the cache.
+
+	.. autoattribute:: auto_optimize
+	   :no-value:
+
+	   If set, :py:func:`compile` and :py:func:`save` call :py:func:`optimize` on every program whose keypoints were added or updated since its last optimization. Set to :python:`False` by default.
+
+	.. autoattribute:: VERIFY_ERROR_LIMIT
+	   :no-value:
+
+	   Maximum number of errors printed by :py:func:`verify`.
+
+	.. autoattribute:: INCREMENTAL_VERIFY_RATIO
+	   :no-value:
+
+	   Minimum ratio between the number of keypoints in the program and the number of keypoints changed since the last successful verification, for which :py:func:`verify` only checks the changed keypoints.
+
+	.. autoattribute:: SOURCE_LOCATION_NONE
+	   :no-value:
+
+	   Source locations are not recorded, and errors are reported with an :python:`"<unknown>"` location. Fastest option for large generated programs.
+
+	.. autoattribute:: SOURCE_LOCATION_LAZY
+	   :no-value:
+
+	   The code object and line number of every keypoint are recorded, and formatted into a string only when requested. Default mode.
+
+	.. autoattribute:: SOURCE_LOCATION_EAGER
+	   :no-value:
+
+	   Source locations are formatted into strings as soon as keypoints are created, which does not keep code objects alive.
 	"""
 
+	VERIFY_ERROR_LIMIT:int=64
+	INCREMENTAL_VERIFY_RATIO:int=8
+
+	SOURCE_LOCATION_NONE:int=0x00
+	SOURCE_LOCATION_LAZY:int=0x01
+	SOURCE_LOCATION_EAGER:int=0x02
+
+	SOURCE_LOCATION_MODES:dict[int,str]={
+		SOURCE_LOCATION_NONE: "none",
+		SOURCE_LOCATION_LAZY: "lazy",
+		SOURCE_LOCATION_EAGER: "eager",
+	}
+
 	error_output_file=sys.stderr
+	compilation_cache=None
+	auto_optimize=False
 
-	__slots__=["_hardware","_duration","_keypoint_list","_load_parameters","_builder_ready","_has_error"]
+	__slots__=["_hardware","_duration","_keypoint_list","_load_parameters","_source_parameters","_builder_ready","_has_error","_last_compilation","_dirty_keypoints","_timeline_index","_source_location","_unverified_keypoints","_pixel_index","_is_optimized"]
 
-	def __init__(self,device:"LEDSign",file_path:str|None=None) -> None:
+	def __init__(self,device:"LEDSign",file_path:str|None=None,workers:int=1,compact:bool=False,source_location:int=SOURCE_LOCATION_LAZY,pixel_index:bool=False) -> None:
 		if (not isinstance(device,ledsign.device.LEDSign)):
 			raise TypeError(f"Expected 'LEDSign', got '{device.__class__.__name__}'")
 		if (file_path is not None and not isinstance(file_path,str)):
 			raise TypeError(f"Expected 'str', got '{file_path.__class__.__name__}'")
+		if (not isinstance(workers,int)):
+			raise TypeError(f"Expected 'int', got '{workers.__class__.__name__}'")
+		if (not isinstance(compact,bool)):
+			raise TypeError(f"Expected 'bool', got '{compact.__class__.__name__}'")
+		if (not isinstance(source_location,int)):
+			raise TypeError(f"Expected 'int', got '{source_location.__class__.__name__}'")
+		if (not isinstance(pixel_index,bool)):
+			raise TypeError(f"Expected 'bool', got '{pixel_index.__class__.__name__}'")
+		if (workers<1):
+			raise ValueError(f"Invalid worker count '{workers}'")
+		if (source_location not in LEDSignProgram.SOURCE_LOCATION_MODES):
+			raise ValueError(f"Invalid source location mode '{source_location}'")
 		self._hardware=device._hardware
 		self._duration=1
-		self._keypoint_list=LEDSignKeypointList()
+		self._keypoint_list=(LEDSignCompactKeypointList() if compact else LEDSignKeypointList())
 		self._load_parameters=None
+		self._source_parameters=None
 		self._builder_ready=False
 		self._has_error=False
+		self._last_compilation=None
+		self._dirty_keypoints=[]
+		self._timeline_index=None
+		self._source_location=source_location
+		self._unverified_keypoints=[]
+		self._pixel_index=(LEDSignPixelKeypointIndex(self._keypoint_list) if pixel_index else None)
+		self._is_optimized=True
 		if (file_path is not None):
-			self._load_from_file(file_path)
+			self._load_from_file(file_path,workers)
 
 	def __repr__(self) -> str:
 		return f"<LEDSignProgram{('[unloaded]' if self._load_parameters is not None else '')} hardware={self._hardware.get_string()} duration={self._duration/60:.3f}s>"
@@ -113,20 +328,78 @@ class LEDSignProgram(object):
 			return None
 		out=LEDSignKeypoint(rgb,end,duration,mask,frame)
 		self._keypoint_list.insert(out)
+		if (self._pixel_index is not None):
+			self._pixel_index.insert(out)
+		self._timeline_index=None
+		self._is_optimized=False
+		if (self._last_compilation is not None):
+			self._dirty_keypoints.append(out)
+		self._add_unverified_keypoints([out])
 		return out
 
-	def _load_from_file(self,file_path:str) -> None:
+	def _add_raw_keypoints(self,keypoints:list[tuple[int,int,int,int,object]]) -> list[LEDSignKeypoint|None]:
+		out=[]
+		inserted_keypoints=[]
+		for rgb,end,duration,mask,frame in keypoints:
+			mask&=self._hardware._mask
+			if (not mask):
+				out.append(None)
+				continue
+			kp=LEDSignKeypoint(rgb,end,duration,mask,frame)
+			out.append(kp)
+			inserted_keypoints.append(kp)
+		self._keypoint_list.insert_many(inserted_keypoints)
+		if (self._pixel_index is not None):
+			self._pixel_index.insert_many(inserted_keypoints)
+		self._timeline_index=None
+		self._is_optimized=False
+		if (self._last_compilation is not None):
+			self._dirty_keypoints.extend(inserted_keypoints)
+		self._add_unverified_keypoints(inserted_keypoints)
+		return out
+
+	def _add_unverified_keypoints(self,keypoints:list[LEDSignKeypoint]) -> None:
+		if (self._unverified_keypoints is None):
+			return
+		self._unverified_keypoints.extend(keypoints)
+		if (len(self._unverified_keypoints)*LEDSignProgram.INCREMENTAL_VERIFY_RATIO>self._keypoint_list._size):
+			self._unverified_keypoints=None
+
+	def _prepare_keypoint_change(self,kp:LEDSignKeypoint) -> None:
+		if (not isinstance(kp,LEDSignKeypoint)):
+			raise TypeError(f"Expected 'LEDSignKeypoint', got '{kp.__class__.__name__}'")
+		self.load()
+		if (not self._keypoint_list.contains(kp)):
+			raise LEDSignProgramError("Keypoint not found")
+		self._timeline_index=None
+		if (self._pixel_index is not None):
+			self._pixel_index.remove(kp)
+		if (self._last_compilation is not None):
+			dirty_kp=LEDSignKeypoint(kp.rgb,kp.end,kp.duration,kp.mask,None)
+			dirty_kp._key=kp._key
+			self._dirty_keypoints.append(dirty_kp)
+
+	def _load_from_file(self,file_path:str,workers:int) -> None:
 		size=os.stat(file_path).st_size
 		if (size<8 or (size&3)):
 			raise LEDSignProgramError("Invalid program")
 		with open(file_path,"rb") as rf:
 			ctrl,crc=struct.unpack("<II",rf.read(8))
-			data=rf.read()
-		if ((ctrl&0xff)%3 or size!=((ctrl>>8)<<2)+8 or crc!=LEDSignCRC(data).value):
+			if (workers>1 and not ((ctrl&0xff)%3) and size==((ctrl>>8)<<2)+8 and size-8==((ctrl>>9)//max(ctrl&0xff,1))*(ctrl&0xff)*8 and size>8):
+				data=None
+			else:
+				data=rf.read()
+		if ((ctrl&0xff)%3 or size!=((ctrl>>8)<<2)+8 or (data is not None and crc!=LEDSignCRC(data).value)):
 			raise LEDSignProgramError("Invalid program")
 		if (((self._hardware._pixel_count+7)>>3)!=(ctrl&0xff)//3):
 			raise LEDSignProgramError("Program was compiled for different hardware")
 		self._duration=(ctrl>>9)//max(ctrl&0xff,1)
+		if (data is None):
+			received_crc,keypoints=ledsign.program_io._parse_file_parallel(self._hardware,file_path,(ctrl&0xff)//3,self._duration,workers)
+			if (received_crc!=crc):
+				raise LEDSignProgramError("Invalid program")
+			self._add_raw_keypoints([(rgb,end,duration,mask,None) for rgb,end,duration,mask in keypoints])
+			return
 		parser=LEDSignProgramParser(self,(ctrl&0xff)//3,True)
 		parser.update(data)
 		parser.terminate()
@@ -143,25 +416,115 @@ class LEDSignProgram(object):
 		"""
 		return self._duration/60
 
-	def compile(self,bypass_errors:bool=False) -> LEDSignCompiledProgram:
+	def _check_compilation_options(self,engine:int,workers:int,streaming:bool,memory_mapped:bool) -> None:
+		if (not isinstance(engine,int)):
+			raise TypeError(f"Expected 'int', got '{engine.__class__.__name__}'")
+		if (not isinstance(workers,int)):
+			raise TypeError(f"Expected 'int', got '{workers.__class__.__name__}'")
+		if (not isinstance(streaming,bool)):
+			raise TypeError(f"Expected 'bool', got '{streaming.__class__.__name__}'")
+		if (not isinstance(memory_mapped,bool)):
+			raise TypeError(f"Expected 'bool', got '{memory_mapped.__class__.__name__}'")
+		if (engine not in LEDSignCompiledProgram.ENGINES):
+			raise ValueError(f"Invalid compilation engine '{engine}'")
+		if (workers<1):
+			raise ValueError(f"Invalid worker count '{workers}'")
+		if (workers>1 and engine==LEDSignCompiledProgram.ENGINE_PYTHON):
+			raise ValueError("Parallel compilation is not supported by the 'python' engine")
+		if (streaming and engine==LEDSignCompiledProgram.ENGINE_PYTHON):
+			raise ValueError("Streaming compilation is not supported by the 'python' engine")
+		if (streaming and workers>1):
+			raise ValueError("Streaming compilation cannot be parallelized")
+		if (streaming and memory_mapped):
+			raise ValueError("Streaming compilation cannot be memory-mapped")
+
+	def _get_dirty_frame_ranges(self) -> list[tuple[int,int]]:
+		ranges=[]
+		for kp in self._dirty_keypoints:
+			start=max(kp.end-kp.duration,0)
+			end=self._duration
+			mask=kp.mask
+			entry=self._keypoint_list.lookup_increasing(kp._key+1,mask)
+			while (entry is not None):
+				mask&=~entry.mask
+				if (not mask):
+					end=min(entry.end,end)
+					break
+				entry=self._keypoint_list.lookup_increasing(entry._key+1,mask)
+			if (start<end):
+				ranges.append((start,end))
+		ranges.sort()
+		out=[]
+		for start,end in ranges:
+			if (out and start<=out[-1][1]):
+				out[-1]=(out[-1][0],max(out[-1][1],end))
+			else:
+				out.append((start,end))
+		return out
+
+	def _compile(self,is_compressed:bool,engine:int,workers:int,streaming:bool,memory_mapped:bool=False,file_path:str|None=None) -> LEDSignCompiledProgram:
+		if (LEDSignProgram.auto_optimize and not self._is_optimized):
+			self.optimize()
+		if (streaming or memory_mapped):
+			return LEDSignCompiledProgram(self,is_compressed,engine,workers,streaming,memory_mapped,file_path)
+		compilation_cache=LEDSignProgram.compilation_cache
+		key=None
+		out=None
+		if (compilation_cache is not None):
+			key=compilation_cache._get_key(self,is_compressed)
+			out=compilation_cache._load(key,self,is_compressed,engine)
+		if (out is None):
+			last_compilation=self._last_compilation
+			if (last_compilation is not None and last_compilation[0]==is_compressed and last_compilation[1]==engine and last_compilation[2]==workers and engine!=LEDSignCompiledProgram.ENGINE_PYTHON and not self._has_error and len(last_compilation[3]._data)==self._duration*last_compilation[3]._led_depth*24):
+				frame_ranges=self._get_dirty_frame_ranges()
+				if (sum([end-start for start,end in frame_ranges])<=(self._duration>>1)):
+					out=last_compilation[3]._recompile(self,frame_ranges)
+			if (out is None):
+				out=LEDSignCompiledProgram(self,is_compressed,engine,workers)
+			if (key is not None):
+				compilation_cache._store(key,out)
+		self._last_compilation=(is_compressed,engine,workers,out)
+		self._dirty_keypoints=[]
+		return out
+
+	def compile(self,bypass_errors:bool=False,engine:int=LEDSignCompiledProgram.ENGINE_AUTO,workers:int=1,streaming:bool=False,memory_mapped:bool=False) -> LEDSignCompiledProgram:
 		"""
 		Compiles the program and returns a :py:class:`LEDSignCompiledProgram` object, and optionally bypasses error verification if the :python:`bypass_errors` flag is set. Raises :py:exc:`LEDSignProgramError` if the program contains unresolved errors.
+
+		The :python:`engine` argument selects the compilation backend (see :py:attr:`LEDSignCompiledProgram.ENGINE_AUTO` for details). All engines produce byte-identical results for programs without unresolved errors.
+
+		If :python:`workers` is greater than 1, the program duration is split into equal frame ranges, which are compiled in parallel by a :py:class:`concurrent.futures.ProcessPoolExecutor` and stitched back together. The result is identical to a serial compilation. Parallel compilation is not supported by :py:attr:`LEDSignCompiledProgram.ENGINE_PYTHON`.
+
+		Frames in which no keypoint is interpolating are identical to the preceding frame, and are copied in bulk instead of being rendered pixel-by-pixel (unless the program contains unresolved errors). The number of rendered and copied frames is reported by :py:func:`LEDSignCompiledProgram.get_stats`.
+
+		If :py:attr:`compilation_cache` is set, identical programs compiled earlier (possibly by another process) are loaded from the on-disk cache instead of being compiled.
+
+		The most recent compilation result is kept by the program. If the program has no unresolved errors and its keypoints were only added, removed or updated since then, the next compilation with the same :python:`engine` and :python:`workers` re-renders just the frames affected by the changed keypoints and updates the checksum accordingly, instead of rebuilding the whole program.
+
+		If the :python:`streaming` flag is set, no program data is generated up front. Instead, frames are compiled in blocks of :py:attr:`LEDSignCompiledProgram.STREAM_BLOCK_SIZE` bytes whenever they are requested by :py:func:`LEDSign.upload_program`, which bounds memory usage by the block size instead of the program duration. The checksum is accumulated over an additional pass before the first upload. Streamed programs reference the source program, which must not be modified until they are no longer in use.
+
+		If the :python:`memory_mapped` flag is set, the compiled data is backed by a memory-mapped temporary file instead of process memory. Serial compilation writes blocks of :py:attr:`LEDSignCompiledProgram.STREAM_BLOCK_SIZE` bytes directly into the mapping, and uploads read from it without copying the whole program. Memory-mapped compilation cannot be combined with :python:`streaming`, and bypasses both the :py:attr:`compilation_cache` and incremental recompilation.
 		"""
+		self._check_compilation_options(engine,workers,streaming,memory_mapped)
 		self.load()
 		if (self._has_error and not bypass_errors):
 			raise LEDSignProgramError("Unresolved program errors")
-		return LEDSignCompiledProgram(self,False)
+		return self._compile(False,engine,workers,streaming,memory_mapped)
 
-	def save(self,file_path:str,bypass_errors:bool=False) -> None:
+	def save(self,file_path:str,bypass_errors:bool=False,engine:int=LEDSignCompiledProgram.ENGINE_AUTO,workers:int=1,streaming:bool=False,memory_mapped:bool=False) -> None:
 		"""
-		Writes the program to a file pointed to by the :python:`file_path`. Optionally bypasses error verification (if the :python:`bypass_errors` flag is set), or raises :py:exc:`LEDSignProgramError` if the program contains unresolved errors.
+		Writes the program to a file pointed to by the :python:`file_path`. Optionally bypasses error verification (if the :python:`bypass_errors` flag is set), or raises :py:exc:`LEDSignProgramError` if the program contains unresolved errors. The :python:`engine`, :python:`workers`, :python:`streaming` and :python:`memory_mapped` arguments are the same as in :py:func:`compile`. Streamed programs are written to the file block-by-block in a single pass, and memory-mapped programs are compiled directly into a mapping of the target file.
 		"""
 		if (not isinstance(file_path,str)):
 			raise TypeError(f"Expected 'str', got '{file_path.__class__.__name__}'")
+		self._check_compilation_options(engine,workers,streaming,memory_mapped)
 		self.load()
 		if (self._has_error and not bypass_errors):
 			raise LEDSignProgramError("Unresolved program errors")
-		LEDSignCompiledProgram(self,True)._save_to_file(file_path)
+		if (memory_mapped):
+			self._compile(True,engine,workers,False,True,file_path)._close_mapping()
+			return
+		self._compile(True,engine,workers,streaming)._save_to_file(file_path)
 
 	def load(self) -> None:
 		"""
@@ -187,52 +550,231 @@ class LEDSignProgram(object):
 		received_crc=LEDSignCRC()
 		offset=0
 		while (offset<program_size):
-			availbale_chunk_size=LEDSignProtocol.process_packet(device._handle,LEDSignProtocol.PACKET_TYPE_PROGRAM_CHUNK_RESPONSE,LEDSignProtocol.PACKET_TYPE_PROGRAM_CHUNK_REQUEST,offset,chunk_size)[0]
+			availbale_chunk_size=LEDSignProtocol.process_packet(device._handle,LEDSignProtocol.PACKET_TYPE_PROGRAM_CHUNK_RESPONSE,LEDSignProtocol.PACKET_TYPE_PROGRAM_CHUNK_REQUEST,offset,min(chunk_size,program_size-offset))[0]
 			chunk=LEDSignProtocol.process_extended_read(device._handle,availbale_chunk_size)
 			received_crc.update(chunk)
 			parser.update(chunk)
 			offset+=availbale_chunk_size
 		if (received_crc.value!=load_parameters[2]):
 			self._keypoint_list.clear()
+			if (self._pixel_index is not None):
+				self._pixel_index.clear()
 			self._has_error=True
 			raise LEDSignProgramError("Mismatched program checksum")
 		parser.terminate()
 
-	def get_keypoints(self,mask:int=-1) -> Iterator[LEDSignKeypoint]:
+	def load_window(self,start:int|float,end:int|float) -> "LEDSignProgram":
+		"""
+		Downloads and decodes only the device program frames between timestamps :python:`start` (inclusive) and :python:`end` (exclusive), and returns them as a new :py:class:`LEDSignProgram` with the same duration. The download starts at the chunk offset of the frame preceding the window, so its cost is proportional to the window length instead of the program duration. The current program is not loaded by this method.
+
+		The frame preceding the window seeds the parser state, so that keypoints are extracted as they would be from the whole program. Its colors are represented by keypoints with a duration of a single frame ending on it, so that compiling the returned program reproduces the frames of the window. Keypoints which start before the window are shortened to start on its preceding frame, and keypoints which end after the window are cut off at its last frame. The program checksum only covers the whole program, and is therefore not verified.
+
+		Raises :py:exc:`LEDSignProgramError` if the program was not sourced from a :py:class:`LEDSign` device, and :py:exc:`LEDSignProtocolError` or :py:exc:`LEDSignProgramError` if the device was closed or modified.
+		"""
+		if (not isinstance(start,int) and not isinstance(start,float)):
+			raise TypeError(f"Expected 'int' or 'float', got '{start.__class__.__name__}'")
+		if (not isinstance(end,int) and not isinstance(end,float)):
+			raise TypeError(f"Expected 'int' or 'float', got '{end.__class__.__name__}'")
+		if (self._source_parameters is None):
+			raise LEDSignProgramError("Program was not sourced from a device")
+		device=self._source_parameters[0]()
+		if (device is None or device._path is None):
+			raise LEDSignProtocolError("Device disconnected")
+		ctrl=self._source_parameters[1]
+		if ((ctrl>>8) and (ctrl&0xff)//3!=self._hardware._led_depth):
+			raise LEDSignProgramError("Mismatched program hardware")
+		start_frame=min(max(round(start*60),0),self._duration)
+		end_frame=min(max(round(end*60),start_frame),self._duration)
+		out=LEDSignProgram(device,compact=isinstance(self._keypoint_list,LEDSignCompactKeypointList),pixel_index=self._pixel_index is not None)
+		out._duration=self._duration
+		if (not (ctrl>>8)):
+			return out
+		stride=self._hardware._led_depth*24
+		offset=start_frame*stride
+		window_end=min(end_frame*stride,(ctrl>>8)<<2)
+		seed_end=offset
+		if (start_frame and offset<window_end):
+			offset-=stride
+		parser=LEDSignProgramParser(out,self._hardware._led_depth,False,None,offset//stride)
+		chunk_size=min(max(window_end-offset,64),65536)
+		chunk_size-=chunk_size%12
+		while (offset<window_end):
+			availbale_chunk_size=LEDSignProtocol.process_packet(device._handle,LEDSignProtocol.PACKET_TYPE_PROGRAM_CHUNK_RESPONSE,LEDSignProtocol.PACKET_TYPE_PROGRAM_CHUNK_REQUEST,offset,min(chunk_size,(seed_end if offset<seed_end else window_end)-offset))[0]
+			if (not availbale_chunk_size):
+				raise LEDSignProgramError("Truncated program")
+			parser.update(LEDSignProtocol.process_extended_read(device._handle,availbale_chunk_size))
+			offset+=availbale_chunk_size
+			if (offset==seed_end):
+				parser._split_states()
+		parser.terminate()
+		return out
+
+	def get_keypoints(self,mask:int|LEDSignMask=-1) -> Iterator[LEDSignKeypoint]:
 		"""
 		Iterates over all keypoints containing any pixels selected by :python:`mask`. If no mask is given, all keypoints are iterated over.
 		"""
-		if (not isinstance(mask,int)):
-			raise TypeError(f"Expected 'int', got '{mask.__class__.__name__}'")
+		mask=LEDSignMask._get_int(mask)
 		self.load()
 		return self._keypoint_list.iterate(mask)
 
-	def verify(self) -> bool:
+	def remove_keypoint(self,kp:LEDSignKeypoint) -> None:
+		"""
+		Removes keypoint :python:`kp` (as returned by :py:func:`get_keypoints` or :py:func:`LEDSignProgramBuilder.command_keypoint`) from the program, in logarithmic time. Raises :py:exc:`LEDSignProgramError` if the keypoint does not belong to the program.
+		"""
+		self._prepare_keypoint_change(kp)
+		self._keypoint_list.remove(kp)
+
+	def update_keypoint(self,kp:LEDSignKeypoint,rgb:int|str|None=None,mask:int|LEDSignMask|None=None,duration:int|float|None=None,time:int|float|None=None,bypass_errors:bool=False) -> None:
 		"""
-		Verifies the program, and reports any encountered errors. Returns :python:`True` if no errors have been found, and :python:`False` otherwise.
+		Modifies keypoint :python:`kp` in place, in logarithmic time. Arguments set to :python:`None` are left unchanged, and all others have the same meaning as in :py:func:`LEDSignProgramBuilder.command_keypoint`. A keypoint whose end time is changed is ordered after all existing keypoints ending at the same time. Raises :py:exc:`LEDSignProgramError` if the keypoint does not belong to the program, and :py:exc:`ValueError` if the new mask does not select any pixels.
+
+		The program is verified after the update, unless the :python:`bypass_errors` flag is set (see :py:func:`__call__`).
 		"""
+		if (rgb is not None):
+			rgb=LEDSignProgramBuilder._parse_color(rgb)
+		if (mask is not None):
+			mask=LEDSignMask._get_int(mask)
+		if (duration is not None):
+			if (not isinstance(duration,int) and not isinstance(duration,float)):
+				raise TypeError(f"Expected 'int' or 'float', got '{duration.__class__.__name__}'")
+			duration=max(round(duration*60),1)
+		if (time is not None):
+			if (not isinstance(time,int) and not isinstance(time,float)):
+				raise TypeError(f"Expected 'int' or 'float', got '{time.__class__.__name__}'")
+			time=max(round(time*60),1)
+		if (mask is not None):
+			mask&=self._hardware._mask
+			if (not mask):
+				raise ValueError("Empty keypoint mask")
+		self._prepare_keypoint_change(kp)
+		self._keypoint_list.update(kp,(kp.rgb if rgb is None else rgb),(kp.end if time is None else time),(kp.duration if duration is None else duration),(kp.mask if mask is None else mask))
+		if (self._pixel_index is not None):
+			self._pixel_index.insert(kp)
+		self._is_optimized=False
+		if (self._last_compilation is not None):
+			self._dirty_keypoints.append(kp)
+		self._add_unverified_keypoints([kp])
+		if (bypass_errors):
+			self._has_error=True
+		else:
+			self.verify()
+
+	def sample(self,time:int|float,mask:int|LEDSignMask=-1) -> list[int]:
+		"""
+		Returns the colors of all pixels selected by :python:`mask` at the given :python:`time`, as they would be displayed by the compiled program. Colors are returned in increasing pixel order (ie. the same order as :py:func:`LEDSignSelector.get_pixels`). The time is rounded to the nearest frame and clamped to the program duration.
+
+		The active and previous keypoint of every pixel are located through a timeline index, which caches keypoint lookups at the start of every 256 frames. Repeated queries near the same time are therefore much cheaper than the first one. The index is discarded whenever keypoints are modified.
+		"""
+		return self.sample_many((time,),mask)[0]
+
+	def sample_many(self,times:tuple[int|float,...]|list[int|float],mask:int|LEDSignMask=-1) -> list[list[int]]:
+		"""
+		Batched version of :py:func:`sample`, which returns a list of pixel colors for every timestamp in :python:`times`. Timestamps are processed in increasing order, so that keypoint lookups are shared between nearby timestamps.
+		"""
+		if (not isinstance(times,tuple) and not isinstance(times,list)):
+			raise TypeError(f"Expected 'list' or 'tuple', got '{times.__class__.__name__}'")
+		mask=LEDSignMask._get_int(mask)
+		frames=[]
+		for time in times:
+			if (not isinstance(time,int) and not isinstance(time,float)):
+				raise TypeError(f"Expected 'int' or 'float', got '{time.__class__.__name__}'")
+			frames.append(min(max(round(time*60),0),self._duration-1))
 		self.load()
-		self._has_error=False
-		kp=self._keypoint_list.lookup_increasing(0,-1)
-		while (kp is not None):
-			start=kp.end-kp.duration
-			if (start<0):
-				print(f"Keypoint overlap: ({-start/60:.3f}s)\n  <timeline_start>\n  {kp._frame}",file=LEDSignProgram.error_output_file)
-				self._has_error=True
-			entry=self._keypoint_list.lookup_decreasing(kp._key-1,kp.mask)
-			while (entry is not None and entry.end>start):
-				print(f"Keypoint overlap: ({(entry.end-start)/60:.3f}s)\n  {entry._frame}\n  {kp._frame}",file=LEDSignProgram.error_output_file)
-				self._has_error=True
-				entry=self._keypoint_list.lookup_decreasing(entry._key-1,kp.mask)
-			kp=self._keypoint_list.lookup_increasing(kp._key+1,-1)
+		if (self._timeline_index is None):
+			self._timeline_index=ledsign.program_io.LEDSignTimelineIndex(self._keypoint_list,self._pixel_index)
+		mask&=self._hardware._mask
+		return self._timeline_index.sample([i for i in range(0,mask.bit_length()) if (mask>>i)&1],frames)
+
+	def optimize(self) -> int:
+		"""
+		Coalesces keypoints with identical color, end time and duration into a single keypoint selecting all of their pixels, and returns the number of removed keypoints. Programs generated pixel-by-pixel (for example through :py:func:`LEDSignSelector.get_pixels`) often contain many such keypoints, and shrink considerably, which speeds up verification, compilation and sampling. The compiled program is not affected, unless it contains unresolved errors (see :py:func:`verify`).
+
+		Keypoints are grouped through a hash index on their color and duration, which is reset whenever the end time changes, so the whole pass takes linear time in the number of keypoints. Keypoints selecting a pixel already selected by their group start a new group instead, so overlapping keypoints are never merged, and are still reported by :py:func:`verify`. From every group, the keypoint created first is kept (together with its source location), and all others are removed from the program. See :py:attr:`auto_optimize` for running this pass automatically before every compilation.
+		"""
+		self.load()
+		groups=[]
+		end=-1
+		index={}
+		for kp in self._keypoint_list.iterate_all():
+			if (kp.end!=end):
+				end=kp.end
+				index={}
+			key=(kp.rgb,kp.duration)
+			entry=index.get(key)
+			if (entry is None or (entry[0]&kp.mask)):
+				index[key]=[kp.mask,[kp]]
+				continue
+			entry[0]|=kp.mask
+			group=entry[1]
+			if (len(group)==1):
+				groups.append(group)
+			group.append(kp)
+		unverified_keys=({kp._key for kp in self._unverified_keypoints} if self._unverified_keypoints else set())
+		out=0
+		for group in groups:
+			mask=0
+			for kp in group:
+				mask|=kp.mask
+				if (self._pixel_index is not None):
+					self._pixel_index.remove(kp)
+			for kp in group[1:]:
+				self._keypoint_list.remove(kp)
+			self._keypoint_list.update(group[0],group[0].rgb,group[0].end,group[0].duration,mask)
+			if (self._pixel_index is not None):
+				self._pixel_index.insert(group[0])
+			if (any([kp._key in unverified_keys for kp in group])):
+				self._add_unverified_keypoints(group[:1])
+			out+=len(group)-1
+		if (out):
+			self._timeline_index=None
+		self._is_optimized=True
+		return out
+
+	def get_overlaps(self,limit:int=VERIFY_ERROR_LIMIT) -> list[LEDSignKeypointOverlap]:
+		"""
+		Returns up to :python:`limit` keypoint overlaps (see :py:class:`LEDSignKeypointOverlap`), ordered by the later keypoint, and for each later keypoint by decreasing end time of the earlier one.
+
+		Overlaps are found by a sweep over the start and end times of every group of pixels with identical keypoints, so the cost of verification is proportional to the number of keypoints and reported overlaps, instead of requiring a tree lookup for every overlapping pair.
+		"""
+		if (not isinstance(limit,int)):
+			raise TypeError(f"Expected 'int', got '{limit.__class__.__name__}'")
+		if (limit<0):
+			raise ValueError(f"Invalid overlap limit '{limit}'")
+		self.load()
+		if (not limit):
+			return []
+		return [LEDSignKeypointOverlap((entry,kp),duration,mask) for entry,kp,duration,mask in _get_keypoint_overlaps(self._keypoint_list,self._hardware._mask,limit)]
+
+	def verify(self,full:bool=False) -> bool:
+		"""
+		Verifies the program, and reports the first :py:attr:`VERIFY_ERROR_LIMIT` encountered errors (see :py:func:`get_overlaps`). Returns :python:`True` if no errors have been found, and :python:`False` otherwise.
+
+		Unless the :python:`full` flag is set, only keypoints added or updated since the last successful verification are checked, against their neighbouring keypoints on the same pixels. Programs stitched from multiple generator functions (see :py:func:`__call__`) are therefore verified in time proportional to the size of each part. The whole program is verified whenever the changed keypoints make up a large part of it (see :py:attr:`INCREMENTAL_VERIFY_RATIO`). Incremental verification detects the same errors, but may report fewer overlaps per error than a full verification.
+		"""
+		if (not isinstance(full,bool)):
+			raise TypeError(f"Expected 'bool', got '{full.__class__.__name__}'")
+		self.load()
+		if (full or self._unverified_keypoints is None):
+			overlaps=self.get_overlaps(LEDSignProgram.VERIFY_ERROR_LIMIT+1)
+		else:
+			overlaps=[LEDSignKeypointOverlap((entry,kp),duration,mask) for entry,kp,duration,mask in _get_changed_keypoint_overlaps(self._keypoint_list,self._unverified_keypoints,LEDSignProgram.VERIFY_ERROR_LIMIT+1,self._pixel_index)]
+		for overlap in overlaps[:LEDSignProgram.VERIFY_ERROR_LIMIT]:
+			entry,kp=overlap.keypoints
+			print(f"Keypoint overlap: ({overlap.duration/60:.3f}s)\n  {('<timeline_start>' if entry is None else entry.get_source_location())}\n  {kp.get_source_location()}",file=LEDSignProgram.error_output_file)
+		if (len(overlaps)>LEDSignProgram.VERIFY_ERROR_LIMIT):
+			print("Further keypoint overlaps omitted",file=LEDSignProgram.error_output_file)
+		self._has_error=bool(overlaps)
+		if (not self._has_error):
+			self._unverified_keypoints=[]
 		return not self._has_error
 
 	@staticmethod
 	def _create_unloaded_from_device(device:"LEDSign",ctrl:int,crc:int) -> "LEDSignProgram":
 		out=LEDSignProgram(device)
 		out._duration=(ctrl>>9)//max(ctrl&0xff,1)
+		out._source_parameters=(weakref.ref(device),ctrl,crc)
 		if (ctrl>>8):
-			out._load_parameters=(weakref.ref(device),ctrl,crc)
+			out._load_parameters=out._source_parameters
 		return out
 
 
@@ -262,6 +804,8 @@ class LEDSignProgramBuilder(object):
 	+--------------------+-------------+-------------------------------+
 	| :func:`keypoint`   | :func:`kp`  | :py:func:`command_keypoint`   |
 	+--------------------+-------------+-------------------------------+
+	| :func:`keypoints`  | :func:`kps` | :py:func:`command_keypoints`  |
+	+--------------------+-------------+-------------------------------+
 	| :func:`rgb`        | ---         | :py:func:`command_rgb`        |
 	+--------------------+-------------+-------------------------------+
 	| :func:`time`       | :func:`tm`  | :py:func:`command_time`       |
@@ -297,6 +841,7 @@ class LEDSignProgramBuilder(object):
 		"hsv": "hsv",
 		"hw": "hardware",
 		"kp": "keypoint",
+		"kps": "keypoints",
 		"rgb": "rgb",
 		"tm": "time"
 	}
@@ -327,7 +872,8 @@ class LEDSignProgramBuilder(object):
 			if (k!=v):
 				yield (v,func)
 
-	def _parse_color(self,rgb:int|str) -> int:
+	@staticmethod
+	def _parse_color(rgb:int|str) -> int:
 		if (isinstance(rgb,int)):
 			rgb&=0xffffff
 		elif (isinstance(rgb,str) and len(rgb)==7 and rgb[0]=="#"):
@@ -336,6 +882,32 @@ class LEDSignProgramBuilder(object):
 			raise TypeError(f"Expected 'int' or 'hex-color', got '{rgb.__class__.__name__}'")
 		return rgb
 
+	def _parse_keypoint(self,rgb:int|str,mask:int|LEDSignMask=-1,duration:int|float|None=None,time:int|float|None=None) -> tuple[int,int,int,int]:
+		rgb=self._parse_color(rgb)
+		mask=LEDSignMask._get_int(mask)
+		if (duration is None):
+			duration=1
+		elif (isinstance(duration,int) or isinstance(duration,float)):
+			duration=max(round(duration*60),1)
+		else:
+			raise TypeError(f"Expected 'int' or 'float', got '{duration.__class__.__name__}'")
+		if (time is None):
+			time=self.time
+		elif (isinstance(time,int) or isinstance(time,float)):
+			time=max(round(time*60),1)
+		else:
+			raise TypeError(f"Expected 'int' or 'float', got '{time.__class__.__name__}'")
+		return (rgb,time,duration,mask)
+
+	def _get_source_location(self) -> tuple[CodeType,int]|str|None:
+		mode=self.program._source_location
+		if (mode==LEDSignProgram.SOURCE_LOCATION_NONE or not hasattr(sys,"_getframe")):
+			return None
+		frame=sys._getframe(2)
+		if (mode==LEDSignProgram.SOURCE_LOCATION_LAZY):
+			return (frame.f_code,frame.f_lineno)
+		return LEDSignKeypoint._format_source_location(frame.f_code,frame.f_lineno)
+
 	def command_at(self,time:int|float) -> float:
 		"""
 		Sets the current timestamp to :python:`time` (in seconds), and returns this new value. Negative values are clamped to :python:`0.0`.
@@ -372,7 +944,7 @@ class LEDSignProgramBuilder(object):
 		"""
 		return self.program._hardware
 
-	def command_keypoint(self,rgb:int|str,mask:int=-1,duration:int|float|None=None,time:int|float|None=None) -> LEDSignKeypoint:
+	def command_keypoint(self,rgb:int|str,mask:int|LEDSignMask=-1,duration:int|float|None=None,time:int|float|None=None) -> LEDSignKeypoint:
 		"""
 		Creates an :python:`rgb`-colored keypoint. Both integer (:code:`0xrrggbb`) and HTML (:python:`"#rrggbb"`) colors are supported. For other color formats, convert their respective arguments using :py:func:`command_rgb` or :py:func:`command_hsv`.
 
@@ -392,22 +964,22 @@ class LEDSignProgramBuilder(object):
 
 			However, for increased performance, these error-checking functions can be postponed or disabled altogether by setting the :python:`bypass_errors` flag in relevant :py:class:`LEDSignProgram` functions.
 		"""
-		rgb=self._parse_color(rgb)
-		if (not isinstance(mask,int)):
-			raise TypeError(f"Expected 'int', got '{mask.__class__.__name__}'")
-		if (duration is None):
-			duration=1
-		elif (isinstance(duration,int) or isinstance(duration,float)):
-			duration=max(round(duration*60),1)
-		else:
-			raise TypeError(f"Expected 'int' or 'float', got '{duration.__class__.__name__}'")
-		if (time is None):
-			time=self.time
-		elif (isinstance(time,int) or isinstance(time,float)):
-			time=max(round(time*60),1)
-		else:
-			raise TypeError(f"Expected 'int' or 'float', got '{time.__class__.__name__}'")
-		return self.program._add_raw_keypoint(rgb,time,duration,mask,(sys._getframe(1) if hasattr(sys,"_getframe") else None))
+		rgb,time,duration,mask=self._parse_keypoint(rgb,mask,duration,time)
+		return self.program._add_raw_keypoint(rgb,time,duration,mask,self._get_source_location())
+
+	def command_keypoints(self,keypoints:Iterable[tuple]) -> list[LEDSignKeypoint|None]:
+		"""
+		Creates multiple keypoints at once, and returns them in a list (with :python:`None` in place of keypoints which do not select any pixels). Each element of :python:`keypoints` is a tuple of arguments accepted by :py:func:`command_keypoint`, ie. :python:`(rgb, mask, duration, time)`, where all elements except :python:`rgb` are optional.
+
+		All keypoints are inserted into the program in a single bulk operation, which sorts them and rebuilds the program's keypoint tree in linear time, instead of rebalancing it after every keypoint. Large generated batches are therefore considerably faster to create than through repeated calls to :py:func:`command_keypoint`.
+		"""
+		frame=self._get_source_location()
+		raw_keypoints=[]
+		for args in keypoints:
+			if (not isinstance(args,tuple) or not (1<=len(args)<=4)):
+				raise TypeError(f"Expected 'tuple', got '{args.__class__.__name__}'")
+			raw_keypoints.append(self._parse_keypoint(*args)+(frame,))
+		return self.program._add_raw_keypoints(raw_keypoints)
 
 	def command_end(self) -> None:
 		"""
@@ -1,9 +1,18 @@
-from collections.abc import Callable
+from collections.abc import Callable,Iterator
 from ledsign.checksum import LEDSignCRC
+from ledsign.codec import LEDSignFrameCodec
 from ledsign.protocol import LEDSignProtocol
+import bisect
+import concurrent.futures
 import ledsign.program
+import mmap
 import struct
+import tempfile
 import time
+try:
+	import numpy
+except ImportError:
+	numpy=None
 
 
 
@@ -11,106 +20,629 @@ __all__=["LEDSignProgramParser","LEDSignCompiledProgram"]
 
 
 
-def _bit_permute_step(a,b,c):
-	t=((a>>c)^a)&b
-	return (a^t)^(t<<c)
+def _create_pixel_cursor(keypoint_list:"LEDSignKeypointList",mask:int,start:int,pixel_index:"LEDSignPixelKeypointIndex|None"=None) -> list:
+	if (not mask):
+		return [start,0,None,None,0]
+	if (pixel_index is not None):
+		keypoints,keys=pixel_index.get_pixel_keypoints(mask)
+		i=(bisect.bisect_left(keys,(start+1)<<44) if start else 0)
+		return [start,(keypoints[i-1].rgb if i else 0),(keypoints[i] if i<len(keypoints) else None),keypoints,i]
+	if (not start):
+		return [0,0,keypoint_list.lookup_increasing(0,mask),None,0]
+	prev_kp=keypoint_list.lookup_decreasing(((start+1)<<44)-1,mask)
+	return [start,(0 if prev_kp is None else prev_kp.rgb),keypoint_list.lookup_increasing((start+1)<<44,mask),None,0]
+
+
+
+def _advance_pixel_cursor(keypoint_list:"LEDSignKeypointList",cursor:list,mask:int,stop:int) -> list[tuple[int,int,int,int,int,int]]:
+	out=[]
+	i,prev,kp,keypoints,j=cursor
+	while (i<stop):
+		if (kp is not None and kp.end<=i):
+			prev=kp.rgb
+			if (keypoints is None):
+				kp=keypoint_list.lookup_increasing(kp._key+1,mask)
+			else:
+				j+=1
+				kp=(keypoints[j] if j<len(keypoints) else None)
+		if (kp is None):
+			out.append((i,stop,prev,prev,0,1))
+			i=stop
+			break
+		next_i=min(max(kp.end,i+1),stop)
+		out.append((i,next_i,prev,kp.rgb,kp.end,kp.duration))
+		i=next_i
+	cursor[0]=i
+	cursor[1]=prev
+	cursor[2]=kp
+	cursor[4]=j
+	return out
+
+
+
+def _get_pixel_segments(keypoint_list:"LEDSignKeypointList",mask:int,duration:int,start:int=0,pixel_index:"LEDSignPixelKeypointIndex|None"=None) -> list[tuple[int,int,int,int,int,int]]:
+	return _advance_pixel_cursor(keypoint_list,_create_pixel_cursor(keypoint_list,mask,start,pixel_index),mask,duration)
+
+
+
+def _get_pixel_classes(keypoint_list:"LEDSignKeypointList",pixel_masks:list[int]) -> list[tuple[int,list[int]]]:
+	pixels_mask=0
+	for mask in pixel_masks:
+		pixels_mask|=mask
+	pixel_count=bin(pixels_mask).count("1")
+	class_masks=[pixels_mask]
+	class_indices={i:0 for i in range(0,pixels_mask.bit_length()) if (pixels_mask>>i)&1}
+	if (pixel_count>1):
+		for kp in keypoint_list.iterate(-1):
+			mask=kp.mask&pixels_mask
+			while (mask):
+				j=class_indices[(mask&(-mask)).bit_length()-1]
+				class_mask=class_masks[j]
+				mask&=~class_mask
+				inside=class_mask&kp.mask
+				if (inside==class_mask):
+					continue
+				outside=class_mask^inside
+				if (bin(inside).count("1")>bin(outside).count("1")):
+					inside,outside=outside,inside
+				class_masks[j]=outside
+				while (inside):
+					class_indices[(inside&(-inside)).bit_length()-1]=len(class_masks)
+					inside&=inside-1
+				class_masks.append(class_mask^outside)
+			if (len(class_masks)==pixel_count):
+				break
+	out=[(class_mask,[]) for class_mask in class_masks]
+	for i,mask in enumerate(pixel_masks):
+		if (not mask):
+			if (out[-1][0]):
+				out.append((0,[]))
+			out[-1][1].append(i)
+		else:
+			out[class_indices[mask.bit_length()-1]][1].append(i)
+	return [pixel_class for pixel_class in out if pixel_class[1]]
+
+
+
+def _clip_pixel_segments(segments:list[tuple[int,int,int,int,int,int]],start:int,stop:int) -> list[tuple[int,int,int,int,int,int]]:
+	out=[]
+	for segment in segments:
+		if (segment[1]<=start):
+			continue
+		if (segment[0]>=stop):
+			break
+		out.append((max(segment[0],start),min(segment[1],stop))+segment[2:])
+	return out
+
+
+
+def _get_rendered_frame_ranges(keypoint_list:"LEDSignKeypointList",duration:int) -> list[tuple[int,int]]:
+	out=[]
+	start=duration
+	stop=duration
+	for kp in keypoint_list.iterate_all(True):
+		if (kp.end-kp.duration>=duration):
+			continue
+		if (kp.end<start):
+			if (start<stop):
+				out.append((start,stop))
+			stop=min(kp.end,duration)
+			start=stop
+		start=max(min(start,kp.end-kp.duration),0)
+	if (start<stop):
+		out.append((start,stop))
+	out.reverse()
+	return out
+
+
+
+def _clip_frame_ranges(frame_ranges:list[tuple[int,int]],start:int,stop:int) -> list[tuple[int,int]]:
+	out=[(start,min(start+1,stop))]
+	for range_start,range_stop in frame_ranges:
+		if (range_stop<=start):
+			continue
+		if (range_start>=stop):
+			break
+		range_start=max(range_start,start)
+		if (range_start<=out[-1][1]):
+			out[-1]=(out[-1][0],max(out[-1][1],min(range_stop,stop)))
+		else:
+			out.append((range_start,min(range_stop,stop)))
+	return out
+
+
+
+def _get_pixel_spans(segments:list[tuple[int,int,int,int,int,int]]) -> tuple[list[int],list[int]]:
+	frames=[]
+	values=[]
+	for start,end,prev,rgb,kp_end,kp_duration in segments:
+		if (prev==rgb or kp_end-kp_duration>start):
+			if (not values or values[-1]!=prev):
+				frames.append(start)
+				values.append(prev)
+			if (prev==rgb):
+				continue
+		prev_r=(prev>>16)&0xff
+		prev_g=(prev>>8)&0xff
+		prev_b=prev&0xff
+		delta_r=((rgb>>16)&0xff)-prev_r
+		delta_g=((rgb>>8)&0xff)-prev_g
+		delta_b=(rgb&0xff)-prev_b
+		for i in range(max(start,kp_end-kp_duration),end):
+			t=max((i-kp_end+1)/kp_duration+1,0)
+			value=(round(prev_r+t*delta_r)<<16)|(round(prev_g+t*delta_g)<<8)|round(prev_b+t*delta_b)
+			if (not values or value!=values[-1]):
+				frames.append(i)
+				values.append(value)
+	return (frames,values)
+
+
+
+def _render_numpy(pixel_classes:list[tuple[list[int],list[tuple[int,int,int,int,int,int]]]],led_depth:int,start:int,stop:int,frame_ranges:list[tuple[int,int]]|None) -> bytearray:
+	frames=(numpy.arange(start,stop,dtype=numpy.int64) if frame_ranges is None else numpy.concatenate([numpy.arange(range_start,range_stop,dtype=numpy.int64) for range_start,range_stop in frame_ranges]))
+	pixels=numpy.zeros((frames.shape[0],led_depth<<3,3),dtype=numpy.uint8)
+	for slots,segments in pixel_classes:
+		segments=numpy.array(segments,dtype=numpy.int64).reshape(-1,6)
+		if (not segments.shape[0]):
+			continue
+		if (frames.shape[0]==stop-start):
+			segments=numpy.repeat(segments,segments[:,1]-segments[:,0],axis=0)
+		else:
+			segments=segments[numpy.searchsorted(segments[:,0],frames,side="right")-1]
+		t=numpy.maximum((frames-segments[:,4]+1)/segments[:,5]+1,0)
+		values=(pixels[:,slots[0]] if len(slots)==1 else numpy.empty((frames.shape[0],3),dtype=numpy.uint8))
+		for j in range(0,3):
+			shift=16-(j<<3)
+			prev=(segments[:,2]>>shift)&0xff
+			values[:,j]=numpy.rint(prev+t*(((segments[:,3]>>shift)&0xff)-prev))
+		if (len(slots)>1):
+			pixels[:,slots]=values[:,None]
+	out=LEDSignFrameCodec._pack_frame_channels_numpy(pixels,led_depth)
+	if (not led_depth or frames.shape[0]==stop-start):
+		return out
+	sources=numpy.searchsorted(frames,numpy.arange(start,stop,dtype=numpy.int64),side="right")-1
+	return bytearray(numpy.frombuffer(out,dtype=numpy.uint8).reshape(-1,led_depth*24)[sources])
+
+
+
+def _render_span(pixel_classes:list[tuple[list[int],list[tuple[int,int,int,int,int,int]]]],led_depth:int,start:int,stop:int,frame_ranges:list[tuple[int,int]]|None) -> bytearray:
+	out=bytearray((stop-start)*led_depth*24)
+	pixel_spans=[None for _ in range(0,led_depth<<3)]
+	for slots,segments in pixel_classes:
+		spans=_get_pixel_spans(segments)
+		for slot in slots:
+			pixel_spans[slot]=spans
+	stride=led_depth*24
+	for i in range(0,led_depth<<1):
+		spans=[pixel_spans[(i%led_depth)+(j+(i//led_depth)*4)*led_depth] for j in range(0,4)]
+		indices=[0,0,0,0]
+		values=[0,0,0,0]
+		frames=sorted({frame for span_frames,_ in spans for frame in span_frames})
+		column=[]
+		for j,frame in enumerate(frames):
+			for k in range(0,4):
+				span_frames,span_values=spans[k]
+				if (indices[k]<len(span_frames) and span_frames[indices[k]]==frame):
+					values[k]=span_values[indices[k]]
+					indices[k]+=1
+			column.append(LEDSignFrameCodec.pack_word(*values)*((frames[j+1] if j+1<len(frames) else stop)-frame))
+		column=b"".join(column)
+		for j in range(0,12):
+			out[i*12+j::stride]=column[j::12]
+	return out
+
+
+
+def _render_frame_range(engine:int,pixel_classes:list[tuple[list[int],list[tuple[int,int,int,int,int,int]]]],led_depth:int,start:int,stop:int,frame_ranges:list[tuple[int,int]]|None=None) -> tuple[bytearray,int]:
+	if (frame_ranges is not None):
+		frame_ranges=_clip_frame_ranges(frame_ranges,start,stop)
+	data=(_render_numpy if engine==LEDSignCompiledProgram.ENGINE_NUMPY else _render_span)(pixel_classes,led_depth,start,stop,frame_ranges)
+	return (data,LEDSignCRC(data).value)
+
+
+
+class LEDSignTimelineIndex(object):
+	BUCKET_SIZE:int=256
+
+	__slots__=["_keypoint_list","_pixel_index","_buckets"]
+
+	def __init__(self,keypoint_list:"LEDSignKeypointList",pixel_index:"LEDSignPixelKeypointIndex|None"=None) -> None:
+		self._keypoint_list=keypoint_list
+		self._pixel_index=pixel_index
+		self._buckets={}
+
+	def _get_cursor(self,pixel:int,frame:int) -> list:
+		index=frame//LEDSignTimelineIndex.BUCKET_SIZE
+		if (index not in self._buckets):
+			self._buckets[index]={}
+		bucket=self._buckets[index]
+		if (pixel not in bucket):
+			bucket[pixel]=_create_pixel_cursor(self._keypoint_list,1<<pixel,index*LEDSignTimelineIndex.BUCKET_SIZE,self._pixel_index)
+		return list(bucket[pixel])
+
+	def sample(self,pixels:list[int],frames:list[int]) -> list[list[int]]:
+		out=[[0 for _ in range(0,len(pixels))] for _ in range(0,len(frames))]
+		order=sorted(range(0,len(frames)),key=lambda i:frames[i])
+		for i,pixel in enumerate(pixels):
+			mask=1<<pixel
+			cursor=None
+			value=0
+			for j in order:
+				frame=frames[j]
+				if (cursor is None or frame>=cursor[0]):
+					if (cursor is None or frame//LEDSignTimelineIndex.BUCKET_SIZE!=(cursor[0]-1)//LEDSignTimelineIndex.BUCKET_SIZE):
+						cursor=self._get_cursor(pixel,frame)
+					_,_,prev,rgb,kp_end,kp_duration=_advance_pixel_cursor(self._keypoint_list,cursor,mask,frame+1)[-1]
+					if (prev==rgb):
+						value=prev
+					else:
+						t=max((frame-kp_end+1)/kp_duration+1,0)
+						value=(round(((prev>>16)&0xff)+t*(((rgb>>16)&0xff)-((prev>>16)&0xff)))<<16)|(round(((prev>>8)&0xff)+t*(((rgb>>8)&0xff)-((prev>>8)&0xff)))<<8)|round((prev&0xff)+t*((rgb&0xff)-(prev&0xff)))
+				out[j][i]=value
+		return out
 
 
 
 class LEDSignProgramParser(object):
 	MAX_LINE_EXTRACTION_ERROR=2
+	NUMPY_MIN_PIXEL_COUNT=64
 
-	__slots__=["_program","_frame_length","_offset","_stride","_pixel_prev_states","_pixel_curr_states","_pixel_update_stack","_pixel_update_stack_length","_pixel_masks"]
+	__slots__=["_program","_frame_length","_offset","_stride","_pixel_prev_states","_pixel_curr_states","_pixel_update_stack","_pixel_masks","_use_numpy","_buffer","_frame_offset","_keypoints"]
 
-	def __init__(self,program:"LEDSignProgram",frame_length:int,is_compressed:bool) -> None:
+	def __init__(self,program:"LEDSignProgram",frame_length:int,is_compressed:bool,use_numpy:bool|None=None,frame_offset:int=0) -> None:
 		self._program=program
 		self._frame_length=frame_length
 		self._offset=0
 		self._stride=frame_length*12
-		self._pixel_prev_states=[0 for _ in range(0,frame_length<<3)]
-		self._pixel_curr_states=[0 for _ in range(0,frame_length<<3)]
-		self._pixel_update_stack=[0 for _ in range(0,frame_length<<3)]
-		self._pixel_update_stack_length=0
-		self._pixel_masks=[]
-		if (is_compressed):
-			for i,pixel in enumerate(program._hardware._pixels):
-				if (pixel is None):
-					continue
-				self._pixel_masks.append(1<<i)
-			while (len(self._pixel_masks)<(frame_length<<3)):
-				self._pixel_masks.append(0)
+		self._pixel_update_stack=[]
+		self._pixel_masks=LEDSignProgramParser._get_pixel_masks(program._hardware,frame_length,is_compressed)
+		if (use_numpy is None):
+			use_numpy=(numpy is not None and (frame_length<<3)>=LEDSignProgramParser.NUMPY_MIN_PIXEL_COUNT)
+		if (use_numpy and numpy is None):
+			raise ledsign.program.LEDSignProgramError("NumPy parser not available")
+		self._use_numpy=use_numpy
+		self._buffer=b""
+		self._frame_offset=frame_offset
+		self._keypoints=[]
+		if (use_numpy):
+			self._pixel_prev_states=[numpy.zeros(frame_length<<3,dtype=numpy.int64) for _ in range(0,3)]+[numpy.zeros((frame_length<<3,3),dtype=numpy.int64)]
+			self._pixel_curr_states=[numpy.zeros(frame_length<<3,dtype=numpy.int64) for _ in range(0,3)]+[numpy.zeros((frame_length<<3,3),dtype=numpy.int64)]
+		else:
+			self._pixel_prev_states=[0 for _ in range(0,frame_length<<3)]
+			self._pixel_curr_states=[0 for _ in range(0,frame_length<<3)]
+
+	@staticmethod
+	def _get_pixel_masks(hardware:"LEDSignHardware",frame_length:int,is_compressed:bool) -> list[int]:
+		if (not is_compressed):
+			return [1<<i for i in range(0,frame_length<<3)]
+		out=[]
+		for i,pixel in enumerate(hardware._pixels):
+			if (pixel is None):
+				continue
+			out.append(1<<i)
+		while (len(out)<(frame_length<<3)):
+			out.append(0)
+		return out
+
+	def _get_states(self) -> tuple[list[int],list[int]]:
+		offset=self._frame_offset<<44
+		if (not self._use_numpy):
+			return ([(state+offset if state else 0) for state in self._pixel_prev_states],[(state+offset if state else 0) for state in self._pixel_curr_states])
+		out=[]
+		for end,duration,rgb,_ in (self._pixel_prev_states,self._pixel_curr_states):
+			out.append(numpy.where(end!=0,((end+self._frame_offset)<<44)|(duration<<24)|rgb,0).tolist())
+		return tuple(out)
+
+	def _add_keypoints(self,indices:list[int],ends:list[int],durations:list[int],colors:list[int]) -> None:
+		groups={}
+		for i,end,duration,rgb in zip(indices,ends,durations,colors):
+			key=(end,duration,rgb)
+			if (key in groups):
+				groups[key]|=self._pixel_masks[i]
+			else:
+				groups[key]=self._pixel_masks[i]
+		for (end,duration,rgb),mask in groups.items():
+			self._keypoints.append((rgb,end+self._frame_offset,duration,mask,None))
+
+	def _flush_update_stack(self,states:list[int]) -> None:
+		groups={}
+		for i in self._pixel_update_stack:
+			value=states[i]
+			if (value in groups):
+				groups[value]|=self._pixel_masks[i]
+			else:
+				groups[value]=self._pixel_masks[i]
+		self._pixel_update_stack.clear()
+		for value,mask in groups.items():
+			self._keypoints.append((value&0xffffff,(value>>44)+self._frame_offset,(value>>24)&0xfffff,mask,None))
+
+	def _split_states(self) -> None:
+		if (self._use_numpy):
+			curr_end,_,curr_rgb,_=self._pixel_curr_states
+			indices=numpy.flatnonzero(curr_rgb)
+			self._add_keypoints(indices.tolist(),curr_end[indices].tolist(),[1]*indices.shape[0],curr_rgb[indices].tolist())
+			for prev,curr in zip(self._pixel_prev_states,self._pixel_curr_states):
+				prev[:]=curr
+			self._pixel_curr_states[1][:]=0
+			return
+		indices=[i for i,curr in enumerate(self._pixel_curr_states) if curr&0xffffff]
+		self._add_keypoints(indices,[self._pixel_curr_states[i]>>44 for i in indices],[1]*len(indices),[self._pixel_curr_states[i]&0xffffff for i in indices])
+		for i,curr in enumerate(self._pixel_curr_states):
+			self._pixel_prev_states[i]=curr
+			self._pixel_curr_states[i]=curr&0xfffff00000ffffff
+
+	def _flush_keypoints(self) -> None:
+		self._program._add_raw_keypoints(self._keypoints)
+		self._keypoints=[]
+
+	def _update_numpy(self,pixels:"numpy.ndarray",selection:"numpy.ndarray|None"=None) -> "numpy.ndarray":
+		prev_end,prev_duration,prev_rgb,prev_channels=self._pixel_prev_states
+		curr_end,curr_duration,curr_rgb,curr_channels=self._pixel_curr_states
+		channels=numpy.stack(((pixels>>16)&0xff,(pixels>>8)&0xff,pixels&0xff),axis=1)
+		split=numpy.abs(channels*curr_duration[:,None]-curr_channels*(curr_duration+1)[:,None]+prev_channels).sum(axis=1)>curr_duration*LEDSignProgramParser.MAX_LINE_EXTRACTION_ERROR
+		split|=prev_end==0
+		if (selection is not None):
+			split&=selection
+		update=split&(curr_end!=0)&((prev_end==0)|(curr_rgb!=prev_rgb))
+		if (split.any()):
+			prev_end[split]=curr_end[split]
+			prev_duration[split]=curr_duration[split]
+			prev_rgb[split]=curr_rgb[split]
+			prev_channels[split]=curr_channels[split]
+			curr_duration[split]=0
+		if (selection is None):
+			curr_end+=1
+			curr_duration+=1
+			curr_rgb[:]=pixels
+			curr_channels[:]=channels
 		else:
-			for i in range(0,frame_length<<3):
-				self._pixel_masks.append(1<<i)
+			curr_end[selection]+=1
+			curr_duration[selection]+=1
+			curr_rgb[selection]=pixels[selection]
+			curr_channels[selection]=channels[selection]
+		return update
 
 	def update(self,data:bytearray) -> None:
+		if (self._use_numpy):
+			frame_size=self._stride<<1
+			if (self._buffer):
+				data=self._buffer+data
+			frame_count=len(data)//frame_size
+			self._buffer=bytes(data[frame_count*frame_size:])
+			if (not frame_count):
+				return
+			prev_end,prev_duration,prev_rgb,_=self._pixel_prev_states
+			frames=LEDSignFrameCodec._unpack_frames_numpy(bytes(data[:frame_count*frame_size]),self._frame_length).astype(numpy.int64).reshape(frame_count,-1)
+			for pixels in frames:
+				update=self._update_numpy(pixels)
+				if (update.any()):
+					indices=numpy.flatnonzero(update)
+					self._add_keypoints(indices.tolist(),prev_end[indices].tolist(),prev_duration[indices].tolist(),prev_rgb[indices].tolist())
+			return
+		pixels=LEDSignFrameCodec.unpack_words(data)
 		for i in range(0,len(data),12):
-			gvec,rvec,bvec=struct.unpack("<III",data[i:i+12])
-			rvec=_bit_permute_step(rvec,0x0a0a0a0a,3)
-			gvec=_bit_permute_step(gvec,0x0a0a0a0a,3)
-			bvec=_bit_permute_step(bvec,0x0a0a0a0a,3)
-			rvec=_bit_permute_step(rvec,0x00cc00cc,6)
-			gvec=_bit_permute_step(gvec,0x00cc00cc,6)
-			bvec=_bit_permute_step(bvec,0x00cc00cc,6)
-			rvec=_bit_permute_step(rvec,0x0000f0f0,12)
-			gvec=_bit_permute_step(gvec,0x0000f0f0,12)
-			bvec=_bit_permute_step(bvec,0x0000f0f0,12)
-			rvec=_bit_permute_step(rvec,0x0000ff00,8)
-			gvec=_bit_permute_step(gvec,0x0000ff00,8)
-			bvec=_bit_permute_step(bvec,0x0000ff00,8)
 			j=(self._offset+i)%(self._stride<<1)
 			j=j//12+3*self._frame_length*(j>=self._stride)
 			for k in range(0,4):
+				rgb=pixels[i//3+k]
 				prev=self._pixel_prev_states[j]
 				curr=self._pixel_curr_states[j]
 				d=(curr>>24)&0xfffff
-				err_r=(rvec&0xff)*d-((curr>>16)&0xff)*(d+1)+((prev>>16)&0xff)
-				err_g=(gvec&0xff)*d-((curr>>8)&0xff)*(d+1)+((prev>>8)&0xff)
-				err_b=(bvec&0xff)*d-(curr&0xff)*(d+1)+(prev&0xff)
+				err_r=((rgb>>16)&0xff)*d-((curr>>16)&0xff)*(d+1)+((prev>>16)&0xff)
+				err_g=((rgb>>8)&0xff)*d-((curr>>8)&0xff)*(d+1)+((prev>>8)&0xff)
+				err_b=(rgb&0xff)*d-(curr&0xff)*(d+1)+(prev&0xff)
 				if (not prev or abs(err_r)+abs(err_g)+abs(err_b)>d*LEDSignProgramParser.MAX_LINE_EXTRACTION_ERROR):
 					self._pixel_prev_states[j]=curr;
 					if (curr and (not prev or ((curr^prev)&0xffffff))):
-						self._pixel_update_stack[self._pixel_update_stack_length]=j
-						self._pixel_update_stack_length+=1
+						self._pixel_update_stack.append(j)
 					curr&=0xfffff00000000000
-				self._pixel_curr_states[j]=(curr&0xffffffffff000000)+((rvec&0xff)<<16)+((gvec&0xff)<<8)+(bvec&0xff)+0x0000100001000000
-				rvec>>=8
-				gvec>>=8
-				bvec>>=8
+				self._pixel_curr_states[j]=(curr&0xffffffffff000000)+rgb+0x0000100001000000
 				j+=self._frame_length
 			if ((self._offset+i+12)%(self._stride<<1)):
 				continue
-			while (self._pixel_update_stack_length):
-				value=self._pixel_prev_states[self._pixel_update_stack[0]]
-				mask=0
-				j=0
-				while (j<self._pixel_update_stack_length):
-					if (self._pixel_prev_states[self._pixel_update_stack[j]]==value):
-						mask|=self._pixel_masks[self._pixel_update_stack[j]]
-						self._pixel_update_stack_length-=1
-						self._pixel_update_stack[j]=self._pixel_update_stack[self._pixel_update_stack_length]
-					else:
-						j+=1
-				self._program._add_raw_keypoint(value&0xffffff,value>>44,(value>>24)&0xfffff,mask,None)
+			if (self._pixel_update_stack):
+				self._flush_update_stack(self._pixel_prev_states)
 		self._offset+=len(data)
 
 	def terminate(self) -> None:
+		if (self._use_numpy):
+			_,_,prev_rgb,_=self._pixel_prev_states
+			curr_end,curr_duration,curr_rgb,_=self._pixel_curr_states
+			update=numpy.zeros(self._frame_length<<3,dtype=bool)
+			word_count=len(self._buffer)//12
+			if (word_count):
+				slots=numpy.arange(0,self._frame_length<<3)
+				words=slots%self._frame_length+(slots//(self._frame_length<<2))*self._frame_length
+				pixels=LEDSignFrameCodec._unpack_frames_numpy(self._buffer[:word_count*12]+bytes((self._stride<<1)-word_count*12),self._frame_length).astype(numpy.int64)
+				update=self._update_numpy(pixels,words<word_count)
+			self._buffer=b""
+			indices=numpy.flatnonzero(update|(prev_rgb!=curr_rgb))
+			self._add_keypoints(indices.tolist(),curr_end[indices].tolist(),curr_duration[indices].tolist(),curr_rgb[indices].tolist())
+			self._flush_keypoints()
+			return
 		for i in range(0,self._frame_length<<3):
 			if ((self._pixel_prev_states[i]^self._pixel_curr_states[i])&0xffffff):
-				self._pixel_update_stack[self._pixel_update_stack_length]=i
-				self._pixel_update_stack_length+=1
-		while (self._pixel_update_stack_length):
-			value=self._pixel_curr_states[self._pixel_update_stack[0]]
-			mask=0
+				self._pixel_update_stack.append(i)
+		self._flush_update_stack(self._pixel_curr_states)
+		self._flush_keypoints()
+
+
+
+class LEDSignParsedRegion(object):
+	__slots__=["_hardware","keypoints"]
+
+	def __init__(self,hardware:"LEDSignHardware") -> None:
+		self._hardware=hardware
+		self.keypoints=[]
+
+	def _add_raw_keypoints(self,keypoints:list[tuple[int,int,int,int,object]]) -> None:
+		self.keypoints.extend([(rgb,end,duration,mask) for rgb,end,duration,mask,_ in keypoints])
+
+
+
+def _parse_file_region(hardware:"LEDSignHardware",file_path:str,frame_length:int,start:int,stop:int) -> tuple[int,list[tuple[int,int,int,int]],list[int],list[int]]:
+	frame_size=frame_length*24
+	with open(file_path,"rb") as rf:
+		rf.seek(8+start*frame_size)
+		data=rf.read((stop-start)*frame_size)
+	region=LEDSignParsedRegion(hardware)
+	parser=LEDSignProgramParser(region,frame_length,True,None,start)
+	parser.update(data)
+	parser._flush_keypoints()
+	return (LEDSignCRC(data).value,region.keypoints)+parser._get_states()
+
+
+
+def _parse_file_parallel(hardware:"LEDSignHardware",file_path:str,frame_length:int,frame_count:int,workers:int) -> tuple[int,list[tuple[int,int,int,int]]]:
+	frame_size=frame_length*24
+	pixel_masks=LEDSignProgramParser._get_pixel_masks(hardware,frame_length,True)
+	workers=max(min(workers,frame_count),1)
+	groups={}
+	crc=0
+	prev_states=None
+	curr_states=None
+	with concurrent.futures.ProcessPoolExecutor(workers) as executor,open(file_path,"rb") as rf:
+		futures=[]
+		for i in range(0,workers):
+			start=frame_count*i//workers
+			stop=frame_count*(i+1)//workers
+			futures.append((start,stop,executor.submit(_parse_file_region,hardware,file_path,frame_length,start,stop)))
+		for start,stop,future in futures:
+			region_crc,keypoints,region_prev_states,region_curr_states=future.result()
+			crc=LEDSignCRC.combine(crc,region_crc,(stop-start)*frame_size)
+			if (prev_states is None):
+				for rgb,end,duration,mask in keypoints:
+					groups[(rgb,end,duration)]=groups.get((rgb,end,duration),0)|mask
+				prev_states=region_prev_states
+				curr_states=region_curr_states
+				continue
+			region_breaks={}
+			for _,end,_,mask in keypoints:
+				region_breaks[end]=region_breaks.get(end,0)|mask
+			cutoffs={}
+			pixels=[i for i in range(0,frame_length<<3) if pixel_masks[i]]
+			frame=start
+			rf.seek(8+start*frame_size)
+			while (pixels and frame<stop):
+				frame_pixels=LEDSignFrameCodec.unpack(rf.read(frame_size),frame_length)
+				frame_breaks=region_breaks.get(frame,0)
+				next_pixels=[]
+				for i in pixels:
+					rgb=frame_pixels[i]
+					prev=prev_states[i]
+					curr=curr_states[i]
+					d=(curr>>24)&0xfffff
+					err_r=((rgb>>16)&0xff)*d-((curr>>16)&0xff)*(d+1)+((prev>>16)&0xff)
+					err_g=((rgb>>8)&0xff)*d-((curr>>8)&0xff)*(d+1)+((prev>>8)&0xff)
+					err_b=(rgb&0xff)*d-(curr&0xff)*(d+1)+(prev&0xff)
+					if (not prev or abs(err_r)+abs(err_g)+abs(err_b)>d*LEDSignProgramParser.MAX_LINE_EXTRACTION_ERROR):
+						if (curr and (not prev or ((curr^prev)&0xffffff))):
+							key=(curr&0xffffff,curr>>44,(curr>>24)&0xfffff)
+							groups[key]=groups.get(key,0)|pixel_masks[i]
+						if (frame_breaks&pixel_masks[i]):
+							cutoffs[frame]=cutoffs.get(frame,0)|pixel_masks[i]
+							prev_states[i]=region_prev_states[i]
+							curr_states[i]=region_curr_states[i]
+							continue
+						prev_states[i]=curr
+						curr&=0xfffff00000000000
+					curr_states[i]=(curr&0xffffffffff000000)+rgb+0x0000100001000000
+					next_pixels.append(i)
+				pixels=next_pixels
+				frame+=1
+			dropped_mask=0
+			for i in pixels:
+				dropped_mask|=pixel_masks[i]
+			cutoffs=sorted(cutoffs.items(),reverse=True)
 			i=0
-			while (i<self._pixel_update_stack_length):
-				if (self._pixel_curr_states[self._pixel_update_stack[i]]==value):
-					mask|=self._pixel_masks[self._pixel_update_stack[i]]
-					self._pixel_update_stack_length-=1
-					self._pixel_update_stack[i]=self._pixel_update_stack[self._pixel_update_stack_length]
-				else:
+			for rgb,end,duration,mask in sorted(keypoints,key=lambda kp:kp[1],reverse=True):
+				while (i<len(cutoffs) and cutoffs[i][0]>=end):
+					dropped_mask|=cutoffs[i][1]
 					i+=1
-			self._program._add_raw_keypoint(value&0xffffff,value>>44,(value>>24)&0xfffff,mask,None)
+				mask&=~dropped_mask
+				if (mask):
+					groups[(rgb,end,duration)]=groups.get((rgb,end,duration),0)|mask
+	for i in range(0,frame_length<<3):
+		if ((prev_states[i]^curr_states[i])&0xffffff):
+			key=(curr_states[i]&0xffffff,curr_states[i]>>44,(curr_states[i]>>24)&0xfffff)
+			groups[key]=groups.get(key,0)|pixel_masks[i]
+	use_numpy=(numpy is not None and (frame_length<<3)>=LEDSignProgramParser.NUMPY_MIN_PIXEL_COUNT)
+	mask_orders={}
+	empty_order=frame_length<<3
+	for i in range(0,frame_length<<3):
+		order=(i if use_numpy else (i//(frame_length<<2))*(frame_length<<2)+(i%frame_length)*4+(i%(frame_length<<2))//frame_length)
+		if (pixel_masks[i]):
+			mask_orders[pixel_masks[i]]=(order,i)
+		else:
+			empty_order=min(order,empty_order)
+	keypoints=[]
+	for (rgb,end,duration),mask in groups.items():
+		order=(empty_order if (rgb,end,duration)==(0,1,1) else frame_length<<3)
+		while (mask):
+			order=min(mask_orders[mask&(-mask)][end==frame_count],order)
+			mask&=mask-1
+		keypoints.append((end,order,rgb,duration,groups[(rgb,end,duration)]))
+	keypoints.sort()
+	return (crc,[(rgb,end,duration,mask) for end,_,rgb,duration,mask in keypoints])
+
+
+
+class LEDSignCompilationStream(object):
+	__slots__=["_keypoint_list","_pixel_index","_pixel_classes","_led_depth","_duration","_engine","_frame_ranges","_block_length","_cursors","_frame","_block","_block_offset"]
+
+	def __init__(self,keypoint_list:"LEDSignKeypointList",pixel_masks:list[int],led_depth:int,duration:int,engine:int,frame_ranges:list[tuple[int,int]],block_size:int,pixel_index:"LEDSignPixelKeypointIndex|None"=None) -> None:
+		self._keypoint_list=keypoint_list
+		self._pixel_index=pixel_index
+		self._pixel_classes=_get_pixel_classes(keypoint_list,pixel_masks)
+		self._led_depth=led_depth
+		self._duration=duration
+		self._engine=engine
+		self._frame_ranges=frame_ranges
+		self._block_length=max(block_size//max(led_depth*24,1),1)
+		self._cursors=None
+		self._frame=0
+		self._block=bytearray()
+		self._block_offset=0
+
+	def _reset(self) -> None:
+		self._cursors=[_create_pixel_cursor(self._keypoint_list,mask,0,self._pixel_index) for mask,_ in self._pixel_classes]
+		self._frame=0
+		self._block=bytearray()
+		self._block_offset=0
+
+	def _next_block(self) -> bool:
+		if (self._frame>=self._duration):
+			return False
+		start=self._frame
+		stop=min(start+self._block_length,self._duration)
+		pixel_classes=[(slots,_advance_pixel_cursor(self._keypoint_list,cursor,mask,stop)) for cursor,(mask,slots) in zip(self._cursors,self._pixel_classes)]
+		self._block_offset+=len(self._block)
+		self._block=_render_frame_range(self._engine,pixel_classes,self._led_depth,start,stop,self._frame_ranges)[0]
+		self._frame=stop
+		return True
+
+	def _get_rendered_frame_count(self) -> int:
+		return sum([stop-start for i in range(0,self._duration,self._block_length) for start,stop in _clip_frame_ranges(self._frame_ranges,i,min(i+self._block_length,self._duration))])
+
+	def iterate(self) -> Iterator[bytearray]:
+		self._reset()
+		while (self._next_block()):
+			yield self._block
+
+	def read(self,offset:int,size:int) -> bytearray:
+		if (self._cursors is None or offset<self._block_offset):
+			self._reset()
+		out=bytearray()
+		while (size):
+			if (offset>=self._block_offset+len(self._block)):
+				if (not self._next_block()):
+					break
+				continue
+			chunk=self._block[offset-self._block_offset:offset-self._block_offset+size]
+			out+=chunk
+			offset+=len(chunk)
+			size-=len(chunk)
+		return out
 
 
 
@@ -132,102 +664,270 @@ class LEDSignCompilationPixel(object):
 class LEDSignCompiledProgram(object):
 	"""
 	Represents a compiled :py:class:`LEDSignProgram` object, returned by :py:func:`LEDSignProgram.compile`.
+
+	.. autoattribute:: ENGINE_AUTO
+	   :no-value:
+
+	   Selects the fastest available compilation engine: :py:attr:`ENGINE_NUMPY` if NumPy is installed, and :py:attr:`ENGINE_SPAN` otherwise. Programs with unresolved errors (compiled with :python:`bypass_errors`) are compiled serially by :py:attr:`ENGINE_PYTHON` instead, as only the frame-by-frame engine reproduces the colors extrapolated by overlapping keypoints. Streamed compilation keeps using the fastest engine.
+
+	.. autoattribute:: ENGINE_PYTHON
+	   :no-value:
+
+	   Pure-Python compilation engine, which processes the program frame-by-frame. Always available.
+
+	.. autoattribute:: ENGINE_NUMPY
+	   :no-value:
+
+	   Vectorized compilation engine, which interpolates and packs whole pixel timelines at once. Requires NumPy.
+
+	.. autoattribute:: ENGINE_SPAN
+	   :no-value:
+
+	   Pure-Python compilation engine, which walks the keypoints of each pixel once and only packs frames in which the pixel's color changes. Compilation time scales with the number of keypoints and animated frames instead of the program duration, which makes it well suited for mostly static programs. Always available.
 	"""
 
-	__slots__=["_data","_led_depth","_max_offset","_offset_divisor","_ctrl","_crc"]
+	ENGINE_AUTO:int=0x00
+	ENGINE_PYTHON:int=0x01
+	ENGINE_NUMPY:int=0x02
+	ENGINE_SPAN:int=0x03
+
+	ENGINES:dict[int,str]={
+		ENGINE_AUTO: "auto",
+		ENGINE_PYTHON: "python",
+		ENGINE_NUMPY: "numpy",
+		ENGINE_SPAN: "span",
+	}
 
-	def __init__(self,program:"LEDSignProgram",is_compressed:bool) -> None:
-		pixel_states=[]
+	STREAM_BLOCK_SIZE:int=1<<20
+
+	__slots__=["_data","_led_depth","_max_offset","_offset_divisor","_ctrl","_crc","_engine","_pixel_masks","_stream","_mapping","_rendered_frame_count"]
+
+	def __init__(self,program:"LEDSignProgram",is_compressed:bool,engine:int=ENGINE_AUTO,workers:int=1,streaming:bool=False,memory_mapped:bool=False,file_path:str|None=None) -> None:
+		self._init_layout(program,is_compressed,engine)
+		engine=self._engine
+		pixel_masks=self._pixel_masks
+		frame_ranges=([(0,program._duration)] if program._has_error else _get_rendered_frame_ranges(program._keypoint_list,program._duration))
+		if (streaming):
+			if (engine==LEDSignCompiledProgram.ENGINE_PYTHON):
+				engine=(LEDSignCompiledProgram.ENGINE_SPAN if numpy is None else LEDSignCompiledProgram.ENGINE_NUMPY)
+			self._data=None
+			self._crc=None
+			self._stream=LEDSignCompilationStream(program._keypoint_list,pixel_masks,self._led_depth,program._duration,engine,frame_ranges,LEDSignCompiledProgram.STREAM_BLOCK_SIZE,program._pixel_index)
+			self._rendered_frame_count=self._stream._get_rendered_frame_count()
+			return
+		if (memory_mapped):
+			self._create_mapping(file_path)
+		if (engine==LEDSignCompiledProgram.ENGINE_PYTHON):
+			frame_ranges=_clip_frame_ranges(frame_ranges,0,program._duration)
+			if (self._mapping is None):
+				self._data=bytearray((self._ctrl>>8)<<2)
+			self._compile_python(program,pixel_masks,frame_ranges)
+			self._crc=LEDSignCRC(self._data).value
+			self._rendered_frame_count=sum([stop-start for start,stop in frame_ranges])
+			self._write_mapping_header()
+			return
+		workers=min(workers,program._duration)
+		if (workers<=1 and self._mapping is not None):
+			stream=LEDSignCompilationStream(program._keypoint_list,pixel_masks,self._led_depth,program._duration,engine,frame_ranges,LEDSignCompiledProgram.STREAM_BLOCK_SIZE,program._pixel_index)
+			crc=LEDSignCRC()
+			offset=0
+			for block in stream.iterate():
+				self._data[offset:offset+len(block)]=block
+				crc.update(block)
+				offset+=len(block)
+			self._crc=crc.value
+			self._rendered_frame_count=stream._get_rendered_frame_count()
+			self._write_mapping_header()
+			return
+		pixel_classes=[(slots,_get_pixel_segments(program._keypoint_list,mask,program._duration,0,program._pixel_index)) for mask,slots in _get_pixel_classes(program._keypoint_list,pixel_masks)]
+		if (workers<=1):
+			self._data,self._crc=_render_frame_range(engine,pixel_classes,self._led_depth,0,program._duration,frame_ranges)
+			self._rendered_frame_count=sum([stop-start for start,stop in _clip_frame_ranges(frame_ranges,0,program._duration)])
+			return
+		self._rendered_frame_count=0
+		if (self._mapping is None):
+			self._data=bytearray((self._ctrl>>8)<<2)
+		self._crc=0
+		stride=self._led_depth*24
+		with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+			futures=[]
+			for i in range(0,workers):
+				start=program._duration*i//workers
+				stop=program._duration*(i+1)//workers
+				futures.append((start,executor.submit(_render_frame_range,engine,[(slots,_clip_pixel_segments(segments,start,stop)) for slots,segments in pixel_classes],self._led_depth,start,stop,frame_ranges)))
+				self._rendered_frame_count+=sum([range_stop-range_start for range_start,range_stop in _clip_frame_ranges(frame_ranges,start,stop)])
+			for start,future in futures:
+				data,crc=future.result()
+				self._data[start*stride:start*stride+len(data)]=data
+				self._crc=LEDSignCRC.combine(self._crc,crc,len(data))
+		self._write_mapping_header()
+
+	def _create_mapping(self,file_path:str|None) -> None:
+		size=((self._ctrl>>8)<<2)+8
+		with (tempfile.TemporaryFile() if file_path is None else open(file_path,"w+b")) as wf:
+			wf.truncate(size)
+			self._mapping=mmap.mmap(wf.fileno(),size)
+		self._data=memoryview(self._mapping)[8:]
+
+	def _write_mapping_header(self) -> None:
+		if (self._mapping is None):
+			return
+		self._mapping[:8]=struct.pack("<II",self._ctrl,self._crc)
+		self._mapping.flush()
+
+	def _close_mapping(self) -> None:
+		if (self._mapping is None):
+			return
+		self._data.release()
+		self._data=None
+		self._mapping.close()
+		self._mapping=None
+
+	def _init_layout(self,program:"LEDSignProgram",is_compressed:bool,engine:int) -> None:
+		pixel_masks=[]
 		if (is_compressed):
 			self._led_depth=(program._hardware._pixel_count+7)>>3
 			for i,pixel in enumerate(program._hardware._pixels):
 				if (pixel is None):
 					continue
-				pixel_states.append(LEDSignCompilationPixel(1<<i,program._keypoint_list.lookup_increasing(0,1<<i)))
-			while (len(pixel_states)<(self._led_depth<<3)):
-				pixel_states.append(LEDSignCompilationPixel(0,None))
+				pixel_masks.append(1<<i)
+			while (len(pixel_masks)<(self._led_depth<<3)):
+				pixel_masks.append(0)
 		else:
 			self._led_depth=program._hardware._led_depth
-			for i in range(self._led_depth<<3):
-				pixel_states.append(LEDSignCompilationPixel(1<<i,program._keypoint_list.lookup_increasing(0,1<<i)))
-		self._data=bytearray(program._duration*self._led_depth*24)
-		self._max_offset=max(len(self._data)>>2,1)
+			for i in range(0,self._led_depth<<3):
+				pixel_masks.append(1<<i)
+		size=program._duration*self._led_depth*24
+		self._max_offset=max(size>>2,1)
 		self._offset_divisor=max(6*self._led_depth,1)*60
-		self._ctrl=(3*self._led_depth)|(len(self._data)<<6)
-		for i in range(0,program._duration):
-			for j in range(0,self._led_depth<<3):
-				pixel=pixel_states[j]
-				kp=pixel.kp
-				if (kp is None):
-					continue
-				if (kp.end<=i):
-					pixel.r=(kp.rgb>>16)&0xff
-					pixel.g=(kp.rgb>>8)&0xff
-					pixel.b=kp.rgb&0xff
-					pixel.prev_r=(kp.rgb>>16)&0xff
-					pixel.prev_g=(kp.rgb>>8)&0xff
-					pixel.prev_b=kp.rgb&0xff
-					kp=program._keypoint_list.lookup_increasing(kp._key+1,pixel.mask)
-					pixel.kp=kp
+		self._ctrl=(3*self._led_depth)|(size<<6)
+		if (engine==LEDSignCompiledProgram.ENGINE_AUTO):
+			engine=(LEDSignCompiledProgram.ENGINE_PYTHON if program._has_error else (LEDSignCompiledProgram.ENGINE_SPAN if numpy is None else LEDSignCompiledProgram.ENGINE_NUMPY))
+		if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and numpy is None):
+			raise ledsign.program.LEDSignProgramError("NumPy compilation engine not available")
+		self._engine=engine
+		self._pixel_masks=pixel_masks
+		self._stream=None
+		self._mapping=None
+
+	@staticmethod
+	def _from_payload(program:"LEDSignProgram",is_compressed:bool,engine:int,crc:int,data:bytearray) -> "LEDSignCompiledProgram|None":
+		out=LEDSignCompiledProgram.__new__(LEDSignCompiledProgram)
+		out._init_layout(program,is_compressed,engine)
+		if (len(data)!=(out._ctrl>>8)<<2 or crc!=LEDSignCRC(data).value):
+			return None
+		out._data=data
+		out._crc=crc
+		out._rendered_frame_count=0
+		return out
+
+	def _recompile(self,program:"LEDSignProgram",frame_ranges:list[tuple[int,int]]) -> "LEDSignCompiledProgram":
+		if (not frame_ranges):
+			return self
+		out=LEDSignCompiledProgram.__new__(LEDSignCompiledProgram)
+		out._data=bytearray(self._data)
+		out._led_depth=self._led_depth
+		out._max_offset=self._max_offset
+		out._offset_divisor=self._offset_divisor
+		out._ctrl=self._ctrl
+		out._crc=self._crc
+		out._engine=self._engine
+		out._pixel_masks=self._pixel_masks
+		out._stream=None
+		out._mapping=None
+		out._rendered_frame_count=sum([stop-start for start,stop in frame_ranges])
+		stride=self._led_depth*24
+		for start,stop in frame_ranges:
+			data,crc=_render_frame_range(self._engine,[([i],_get_pixel_segments(program._keypoint_list,mask,stop,start,program._pixel_index)) for i,mask in enumerate(self._pixel_masks)],self._led_depth,start,stop)
+			crc^=LEDSignCRC(out._data[start*stride:stop*stride]).value
+			out._crc^=LEDSignCRC.combine(crc,0,len(out._data)-stop*stride)
+			out._data[start*stride:stop*stride]=data
+		return out
+
+	def _compile_python(self,program:"LEDSignProgram",pixel_masks:list[int],frame_ranges:list[tuple[int,int]]) -> None:
+		pixel_states=[LEDSignCompilationPixel(mask,(program._keypoint_list.lookup_increasing(0,mask) if mask else None)) for mask in pixel_masks]
+		stride=self._led_depth*24
+		prev_stop=0
+		for start,stop in frame_ranges:
+			if (start>prev_stop):
+				self._data[prev_stop*stride:start*stride]=bytes(self._data[(prev_stop-1)*stride:prev_stop*stride])*(start-prev_stop)
+			prev_stop=stop
+			for i in range(start,stop):
+				for j in range(0,self._led_depth<<3):
+					pixel=pixel_states[j]
+					kp=pixel.kp
 					if (kp is None):
 						continue
-				t=max((i-kp.end+1)/kp.duration+1,0)
-				pixel.r=round(pixel.prev_r+t*(((kp.rgb>>16)&0xff)-pixel.prev_r))
-				pixel.g=round(pixel.prev_g+t*(((kp.rgb>>8)&0xff)-pixel.prev_g))
-				pixel.b=round(pixel.prev_b+t*((kp.rgb&0xff)-pixel.prev_b))
-			for j in range(0,self._led_depth):
-				rveclo=0
-				gveclo=0
-				bveclo=0
-				rvechi=0
-				gvechi=0
-				bvechi=0
-				for k in range(0,4):
-					l=k<<3
-					pixel=pixel_states[j+k*self._led_depth]
-					rveclo|=pixel.r<<l
-					gveclo|=pixel.g<<l
-					bveclo|=pixel.b<<l
-					pixel=pixel_states[j+(k+4)*self._led_depth]
-					rvechi|=pixel.r<<l
-					gvechi|=pixel.g<<l
-					bvechi|=pixel.b<<l
-				rveclo=_bit_permute_step(rveclo,0x00aa00aa,7)
-				gveclo=_bit_permute_step(gveclo,0x00aa00aa,7)
-				bveclo=_bit_permute_step(bveclo,0x00aa00aa,7)
-				rvechi=_bit_permute_step(rvechi,0x00aa00aa,7)
-				gvechi=_bit_permute_step(gvechi,0x00aa00aa,7)
-				bvechi=_bit_permute_step(bvechi,0x00aa00aa,7)
-				rveclo=_bit_permute_step(rveclo,0x0000cccc,14)
-				gveclo=_bit_permute_step(gveclo,0x0000cccc,14)
-				bveclo=_bit_permute_step(bveclo,0x0000cccc,14)
-				rvechi=_bit_permute_step(rvechi,0x0000cccc,14)
-				gvechi=_bit_permute_step(gvechi,0x0000cccc,14)
-				bvechi=_bit_permute_step(bvechi,0x0000cccc,14)
-				rveclo=_bit_permute_step(rveclo,0x00f000f0,4)
-				gveclo=_bit_permute_step(gveclo,0x00f000f0,4)
-				bveclo=_bit_permute_step(bveclo,0x00f000f0,4)
-				rvechi=_bit_permute_step(rvechi,0x00f000f0,4)
-				gvechi=_bit_permute_step(gvechi,0x00f000f0,4)
-				bvechi=_bit_permute_step(bvechi,0x00f000f0,4)
-				rveclo=_bit_permute_step(rveclo,0x0000ff00,8)
-				gveclo=_bit_permute_step(gveclo,0x0000ff00,8)
-				bveclo=_bit_permute_step(bveclo,0x0000ff00,8)
-				rvechi=_bit_permute_step(rvechi,0x0000ff00,8)
-				gvechi=_bit_permute_step(gvechi,0x0000ff00,8)
-				bvechi=_bit_permute_step(bvechi,0x0000ff00,8)
-				k=i*self._led_depth*24+j*12
-				self._data[k:k+12]=struct.pack("<III",gveclo,rveclo,bveclo)
-				k+=12*self._led_depth
-				self._data[k:k+12]=struct.pack("<III",gvechi,rvechi,bvechi)
-		self._crc=LEDSignCRC(self._data).value
+					if (kp.end<=i):
+						pixel.r=(kp.rgb>>16)&0xff
+						pixel.g=(kp.rgb>>8)&0xff
+						pixel.b=kp.rgb&0xff
+						pixel.prev_r=(kp.rgb>>16)&0xff
+						pixel.prev_g=(kp.rgb>>8)&0xff
+						pixel.prev_b=kp.rgb&0xff
+						kp=program._keypoint_list.lookup_increasing(kp._key+1,pixel.mask)
+						pixel.kp=kp
+						if (kp is None):
+							continue
+					t=max((i-kp.end+1)/kp.duration+1,0)
+					pixel.r=round(pixel.prev_r+t*(((kp.rgb>>16)&0xff)-pixel.prev_r))
+					pixel.g=round(pixel.prev_g+t*(((kp.rgb>>8)&0xff)-pixel.prev_g))
+					pixel.b=round(pixel.prev_b+t*((kp.rgb&0xff)-pixel.prev_b))
+				self._data[i*stride:(i+1)*stride]=LEDSignFrameCodec._pack_channels_python([(pixel.r,pixel.g,pixel.b) for pixel in pixel_states],self._led_depth)
+		if (program._duration>prev_stop):
+			self._data[prev_stop*stride:]=bytes(self._data[(prev_stop-1)*stride:prev_stop*stride])*(program._duration-prev_stop)
 
 	def __repr__(self) -> str:
-		return f"<LEDSignCompiledProgram size={len(self._data)} B>"
+		return f"<LEDSignCompiledProgram{('[streaming]' if self._stream is not None else '')}{('[memory-mapped]' if self._mapping is not None else '')} size={(self._ctrl>>8)<<2} B>"
+
+	def get_stats(self) -> dict[str,int]:
+		"""
+		Returns compilation statistics as a dictionary with the total number of frames (:python:`"frames"`), the number of frames rendered from the keypoints (:python:`"rendered_frames"`), and the number of static frames, in which no pixel is interpolating, that were copied in bulk from the preceding frame (:python:`"copied_frames"`). For incrementally recompiled programs, only the re-rendered frames are counted as rendered, and programs loaded from a :py:class:`LEDSignCompilationCache` report no rendered frames.
+		"""
+		frame_count=(((self._ctrl>>8)<<2)//(self._led_depth*24) if self._led_depth else 0)
+		return {
+			"frames": frame_count,
+			"rendered_frames": self._rendered_frame_count,
+			"copied_frames": frame_count-self._rendered_frame_count
+		}
+
+	def decode_frames(self,start:int=0,stop:int|None=None) -> "numpy.ndarray|memoryview":
+		"""
+		Decodes the compiled frames between indices :python:`start` (inclusive) and :python:`stop` (exclusive, defaults to the total number of frames, see :py:func:`get_stats`) back to pixel colors, without extracting any keypoints. Returns a :python:`(frames, pixels, 3)` array of :python:`uint8` RGB channels, where :python:`pixels` is eight times the compiled LED depth and pixels are ordered in the same way as their compiled data.
+
+		If NumPy is installed, a :py:class:`numpy.ndarray` is returned, and the frames are decoded in bulk directly from the compiled data (or its memory mapping) without intermediate copies. Otherwise, a :py:class:`memoryview` with the same shape is returned. Frames of streamed programs are compiled on demand.
+		"""
+		frame_count=(((self._ctrl>>8)<<2)//(self._led_depth*24) if self._led_depth else 0)
+		if (stop is None):
+			stop=frame_count
+		if (not isinstance(start,int)):
+			raise TypeError(f"Expected 'int', got '{start.__class__.__name__}'")
+		if (not isinstance(stop,int)):
+			raise TypeError(f"Expected 'int', got '{stop.__class__.__name__}'")
+		if (start<0 or start>stop or stop>frame_count):
+			raise ValueError(f"Invalid frame range: {start}-{stop}")
+		stride=self._led_depth*24
+		data=(memoryview(self._data)[start*stride:stop*stride] if self._stream is None else self._stream.read(start*stride,(stop-start)*stride))
+		if (numpy is not None):
+			return LEDSignFrameCodec._unpack_frame_channels_numpy(data,self._led_depth)
+		pixels=LEDSignFrameCodec.unpack(data,self._led_depth,LEDSignFrameCodec.CODEC_PYTHON)
+		out=bytearray(len(pixels)*3)
+		out[0::3]=bytes([pixel>>16 for pixel in pixels])
+		out[1::3]=bytes([(pixel>>8)&0xff for pixel in pixels])
+		out[2::3]=bytes([pixel&0xff for pixel in pixels])
+		if (not out):
+			return memoryview(out)
+		return memoryview(out).cast("B",(stop-start,self._led_depth<<3,3))
 
 	def _upload_to_device(self,device:"LEDSign",callback:Callable[[float,bool],None]|None=None) -> None:
 		if (device._hardware._led_depth!=self._led_depth):
 			raise ledsign.program.LEDSignProgramError("Mismatched program hardware")
+		size=(self._ctrl>>8)<<2
+		if (self._crc is None):
+			crc=LEDSignCRC()
+			for block in self._stream.iterate():
+				crc.update(block)
+			self._crc=crc.value
 		result=LEDSignProtocol.process_packet(device._handle,LEDSignProtocol.PACKET_TYPE_PROGRAM_CHUNK_REQUEST_DEVICE,LEDSignProtocol.PACKET_TYPE_PROGRAM_SETUP,self._ctrl,self._crc)
 		clear_progress_active=True
 		prev_clear_progress=0
@@ -241,12 +941,12 @@ class LEDSignCompiledProgram(object):
 				if (clear_progress_active):
 					clear_progress_active=False
 				if (callback is not None):
-					callback(min(result[0]/len(self._data),1.0),True)
-				LEDSignProtocol.process_extended_write(device._handle,self._data[result[0]:result[0]+result[1]])
+					callback(min(result[0]/size,1.0),True)
+				LEDSignProtocol.process_extended_write(device._handle,(self._data[result[0]:result[0]+result[1]] if self._stream is None else self._stream.read(result[0],result[1])))
 			result=LEDSignProtocol.process_packet(device._handle,LEDSignProtocol.PACKET_TYPE_PROGRAM_CHUNK_REQUEST_DEVICE,LEDSignProtocol.PACKET_TYPE_PROGRAM_UPLOAD_STATUS)
 			if (clear_progress_active and callback is not None and result[2]!=prev_clear_progress):
 				prev_clear_progress=result[2]
-				callback(min(result[2]/len(self._data),1.0),False)
+				callback(min(result[2]/size,1.0),False)
 		if (callback is not None):
 			callback(1.0,True)
 		device._driver_program_offset_divisor=self._offset_divisor
@@ -255,5 +955,15 @@ class LEDSignCompiledProgram(object):
 
 	def _save_to_file(self,file_path:str) -> None:
 		with open(file_path,"wb") as wf:
+			if (self._stream is None):
+				wf.write(struct.pack("<II",self._ctrl,self._crc))
+				wf.write(self._data)
+				return
+			wf.write(struct.pack("<II",self._ctrl,0))
+			crc=LEDSignCRC()
+			for block in self._stream.iterate():
+				crc.update(block)
+				wf.write(block)
+			self._crc=crc.value
+			wf.seek(0)
 			wf.write(struct.pack("<II",self._ctrl,self._crc))
-			wf.write(self._data)
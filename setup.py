@@ -33,6 +33,9 @@ setuptools.setup(
 	],
 	license="BSD-3-Clause",
 	install_requires=[],
+	extras_require={
+		"numpy": ["numpy"]
+	},
 	project_urls={
 		"Source Code": "https://github.com/krzem5/ledsign",
 		"Documentation": "https://ledsign.readthedocs.io/en/latest/",
@@ -1,8 +1,13 @@
 from ledsign import *
 from ledsign.checksum import LEDSignCRC
+from ledsign.codec import LEDSignFrameCodec
 from ledsign.protocol import LEDSignProtocol
 import io
+import ledsign.program
+import ledsign.program_io as program_io
+import os
 import random
+import shutil
 import struct
 import sys
 import time
@@ -857,6 +862,85 @@ def test_selector_pixels():
 
 
 
+@test
+def test_mask():
+	test.exception(lambda:LEDSignMask("wrong_type"),TypeError)
+	test.exception(lambda:LEDSignMask(0,"wrong_type"),TypeError)
+	test.exception(lambda:LEDSignMask(0,-1),ValueError)
+	test.exception(lambda:LEDSignMask(-1),ValueError)
+	test.exception(lambda:LEDSignMask(1)["wrong_type"],TypeError)
+	test.exception(lambda:LEDSignMask(1).__setitem__(1,True),IndexError)
+	test.exception(lambda:LEDSignMask(1)&"wrong_type",TypeError)
+	test.equal(int(LEDSignMask()),0)
+	test.equal(LEDSignMask().get_width(),0)
+	test.equal(int(LEDSignMask(-1,10)),1023)
+	test.equal(LEDSignMask(0x1ff,4).get_width(),4)
+	test.equal(int(LEDSignMask(LEDSignMask(0x1ff),4)),15)
+	test.equal(LEDSignMask(5)==LEDSignMask(5,100),True)
+	test.equal(LEDSignMask(5)==4,False)
+	test.equal(bool(LEDSignMask(0,100)),False)
+	test.equal(list(LEDSignMask(0x8101)),[0,8,15])
+	test.equal(int(LEDSignMask(5,8)&LEDSignMask(0xff0f,100)),5)
+	test.equal(int(LEDSignMask(5,8)|LEDSignMask(-1,100)),255)
+	mask=LEDSignMask(0x81,8)
+	mask^=LEDSignMask((1<<90)|1,100)
+	test.equal((int(mask),mask.get_width()),(0x80,8))
+	if (program_io.numpy):
+		test.exception(lambda:LEDSignMask(program_io.numpy.zeros((2,2),dtype=bool)),ValueError)
+	else:
+		test.exception(lambda:LEDSignMask(1).to_numpy(),RuntimeError)
+	for width in (1,7,8,63,200,LEDSignMask.NUMPY_MIN_WIDTH,LEDSignMask.NUMPY_MIN_WIDTH*3+5):
+		for _ in range(0,8):
+			value=random.getrandbits(width)&random.getrandbits(width)
+			other=random.getrandbits(max(width+random.randint(-5,5),0))
+			mask=LEDSignMask(value,width)
+			test.equal(int(mask),value)
+			test.equal(mask.get_width(),width)
+			test.equal(mask.get_count(),bin(value).count("1"))
+			test.equal(list(mask.iterate()),[i for i in range(0,width) if (value>>i)&1])
+			test.equal(bool(mask),bool(value))
+			test.equal(mask==value,True)
+			index=random.randint(0,width-1)
+			test.equal(mask[index],bool((value>>index)&1))
+			test.equal(index in mask,bool((value>>index)&1))
+			test.equal(mask[width],False)
+			test.equal(int(~mask),value^((1<<width)-1))
+			for other_mask in (other,LEDSignMask(other)):
+				test.equal(int(mask&other_mask),value&other)
+				test.equal(int(mask|other_mask),(value|other)&((1<<width)-1))
+				test.equal(int(mask^other_mask),(value^other)&((1<<width)-1))
+				test.equal(int(other_mask&mask),value&other)
+			copy=LEDSignMask(mask)
+			copy|=other
+			copy^=value
+			copy&=LEDSignMask(other)
+			test.equal(int(copy),((value|other)^value)&other&((1<<width)-1))
+			test.equal(mask==copy,int(mask)==int(copy))
+			copy[index]=True
+			test.equal(copy[index],True)
+			copy[index]=False
+			test.equal(copy[index],False)
+			if (program_io.numpy):
+				array=mask.to_numpy()
+				test.equal(array.tolist(),[bool((value>>i)&1) for i in range(0,width)])
+				test.equal(int(LEDSignMask(array)),value)
+				test.equal(int(LEDSignMask(array,width+9)),value)
+				test.equal(int(LEDSignMask(array,3)),value&7)
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00A\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2}}})
+	device=LEDSign.open()
+	@LEDSignProgram(device)
+	def program():
+		test.equal(LEDSignSelector.get_bounding_box(mask=LEDSignMask(3)),(0.0,0.0,1.0,0.0))
+		test.equal(LEDSignSelector.get_center(mask=LEDSignMask(1<<18|1<<20),weighted=True),(2.5,0.5))
+		test.equal(tuple(LEDSignSelector.get_pixels(mask=LEDSignMask(6))),((1.0,0.0,2),(1.0,1.0,4)))
+		test.equal(LEDSignSelector.get_circle_mask(1.0,0.0,1.0,mask=LEDSignMask(3)),3)
+		kp(0xff0000,LEDSignMask(LEDSignSelector.get_letter_mask(1)))
+	test.equal([(x.rgb,x.mask) for x in program.get_keypoints(LEDSignMask(1<<19))],[(0xff0000,7<<18)])
+	test.equal(program.sample(0,LEDSignMask(5<<18)),[0xff0000,0xff0000])
+	device.close()
+
+
+
 def _test_keypoint(keypoint,rgb,mask,duration,end):
 	test.equal(keypoint.get_duration(),duration)
 	test.equal(keypoint.get_end(),end)
@@ -872,6 +956,11 @@ def test_program_exceptions():
 	TestBackend()
 	test.exception(lambda:LEDSignProgram("wrong_type"),TypeError)
 	test.exception(lambda:LEDSignProgram(LEDSign.open(),12345),TypeError)
+	test.exception(lambda:LEDSignProgram(LEDSign.open(),None,"wrong_type"),TypeError)
+	test.exception(lambda:LEDSignProgram(LEDSign.open(),None,0),ValueError)
+	test.exception(lambda:LEDSignProgram(LEDSign.open(),None,1,"wrong_type"),TypeError)
+	test.exception(lambda:LEDSignProgram(LEDSign.open(),None,1,False,"wrong_type"),TypeError)
+	test.exception(lambda:LEDSignProgram(LEDSign.open(),None,1,False,3),ValueError)
 	test.exception(lambda:LEDSignProgramBuilder("wrong_type"),TypeError)
 	test.exception(lambda:LEDSignProgramBuilder(LEDSignProgram(LEDSign.open())),TypeError)
 
@@ -944,6 +1033,29 @@ def test_program_save_and_load():
 
 
 
+@test
+def test_program_load_parallel():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:kp(0))
+	for _ in range(0,5):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,),bypass_errors=True)
+		program.save("build/temp.led",bypass_errors=True)
+		reference=[(kp.end,kp.duration,kp.rgb,kp.mask) for kp in LEDSignProgram(device,"build/temp.led").get_keypoints()]
+		for workers in (2,3,random.randint(4,16)):
+			parallel_program=LEDSignProgram(device,"build/temp.led",workers)
+			test.equal(parallel_program.get_duration(),program.get_duration())
+			test.equal([(kp.end,kp.duration,kp.rgb,kp.mask) for kp in parallel_program.get_keypoints()],reference)
+	with open("build/temp.led","rb") as rf:
+		invalid_saved_program_data=bytearray(rf.read())
+	invalid_saved_program_data[-1]^=1
+	with open("build/temp.led","wb") as wf:
+		wf.write(invalid_saved_program_data)
+	test.exception(lambda:LEDSignProgram(device,"build/temp.led",2),LEDSignProgramError)
+	device.close()
+
+
+
 @test
 def test_program_generate():
 	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
@@ -980,6 +1092,531 @@ def test_program_compile():
 
 
 
+def _reference_pack_word(a,b,c,d):
+	out=[]
+	for shift in (8,16,0):
+		value=0
+		for i,pixel in enumerate((a,b,c,d)):
+			for j in range(0,8):
+				value|=((pixel>>(shift+j))&1)<<((j<<2)+i)
+		out.append(value)
+	return struct.pack("<III",*out)
+
+
+
+def _reference_compile(program):
+	led_depth=program._hardware._led_depth
+	pixels=[[0,0,0,0,0,0,program._keypoint_list.lookup_increasing(0,1<<i)] for i in range(0,led_depth<<3)]
+	out=bytearray()
+	for i in range(0,program._duration):
+		for pixel,mask in zip(pixels,[1<<j for j in range(0,led_depth<<3)]):
+			kp=pixel[6]
+			if (kp is None):
+				continue
+			if (kp.end<=i):
+				pixel[:6]=[(kp.rgb>>16)&0xff,(kp.rgb>>8)&0xff,kp.rgb&0xff]*2
+				kp=program._keypoint_list.lookup_increasing(kp._key+1,mask)
+				pixel[6]=kp
+				if (kp is None):
+					continue
+			t=max((i-kp.end+1)/kp.duration+1,0)
+			pixel[:3]=[round(pixel[j+3]+t*(((kp.rgb>>(16-(j<<3)))&0xff)-pixel[j+3])) for j in range(0,3)]
+		for j in range(0,led_depth<<3,led_depth<<2):
+			for k in range(j,j+led_depth):
+				vectors=[0,0,0]
+				for l in range(0,4):
+					for m in range(0,3):
+						vectors[m]|=pixels[k+l*led_depth][m]<<(l<<3)
+				words=[]
+				for m in (1,0,2):
+					value=vectors[m]
+					for mask,shift in ((0x00aa00aa,7),(0x0000cccc,14),(0x00f000f0,4),(0x0000ff00,8)):
+						t=((value>>shift)^value)&mask
+						value^=t^(t<<shift)
+					words.append(value)
+				out+=struct.pack("<III",*words)
+	return out
+
+
+
+@test
+def test_codec():
+	for _ in range(0,64):
+		pixels=[random.getrandbits(24) for _ in range(0,4)]
+		test.equal(LEDSignFrameCodec.pack_word(*pixels),_reference_pack_word(*pixels))
+	codecs=[LEDSignFrameCodec.CODEC_AUTO,LEDSignFrameCodec.CODEC_PYTHON]
+	if (program_io.numpy):
+		codecs.append(LEDSignFrameCodec.CODEC_NUMPY)
+	else:
+		test.exception(lambda:LEDSignFrameCodec.pack([0]*8,1,LEDSignFrameCodec.CODEC_NUMPY),LEDSignProgramError)
+	for led_depth in (0,1,3,60):
+		for frame_count in (0,1,7):
+			pixels=[random.getrandbits(24) for _ in range(0,frame_count*(led_depth<<3))]
+			reference=LEDSignFrameCodec.pack(pixels,led_depth,LEDSignFrameCodec.CODEC_PYTHON)
+			test.equal(len(reference),frame_count*led_depth*24)
+			for codec in codecs:
+				data=LEDSignFrameCodec.pack(pixels,led_depth,codec)
+				test.equal(data,reference)
+				test.equal(LEDSignFrameCodec.unpack(data,led_depth,codec),pixels)
+				test.equal(LEDSignFrameCodec.unpack_words(LEDSignFrameCodec.pack_words(pixels,codec),codec),pixels)
+			test.equal(LEDSignFrameCodec.pack_words([pixel|(random.getrandbits(8)<<24) for pixel in pixels],LEDSignFrameCodec.CODEC_PYTHON),LEDSignFrameCodec.pack_words(pixels,LEDSignFrameCodec.CODEC_PYTHON))
+			for j in range(0,frame_count*(led_depth<<3),4):
+				test.equal(LEDSignFrameCodec.pack_word(*pixels[j:j+4]),bytes(LEDSignFrameCodec.pack_words(pixels,LEDSignFrameCodec.CODEC_PYTHON)[j*3:j*3+12]))
+				if (j>=64):
+					break
+
+
+
+def _generate_random_program(program,group_count=4,keypoint_count=12):
+	masks=[0 for _ in range(0,group_count)]
+	for _,_,mask in LEDSignSelector.get_pixels():
+		masks[random.randint(0,group_count-1)]|=mask
+	for mask in masks:
+		at(random.random())
+		for _ in range(0,keypoint_count):
+			duration=random.choice((0,0,random.random()))
+			af(duration)
+			kp(random.getrandbits(24),mask,duration=duration)
+			af(random.random()/2+dt())
+	af(random.random())
+	end()
+
+
+
+def _generate_random_overlapping_program():
+	for _ in range(0,3):
+		mask=random.getrandbits(48)
+		at(random.random()*3)
+		for _ in range(0,6):
+			duration=random.choice((0,0,random.random()))
+			af(duration)
+			kp(random.getrandbits(24),mask,duration=duration)
+			af(random.random()/3+dt())
+	af(random.random())
+	end()
+
+
+
+@test
+def test_program_compile_engines():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:kp(0))
+	test.exception(lambda:program.compile(engine="wrong_type"),TypeError)
+	test.exception(lambda:program.compile(engine=-1),ValueError)
+	test.exception(lambda:program.save("build/temp.led",engine="wrong_type"),TypeError)
+	for _ in range(0,10):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,))
+		reference=program.compile(engine=LEDSignCompiledProgram.ENGINE_PYTHON)
+		for engine in LEDSignCompiledProgram.ENGINES:
+			if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy):
+				test.exception(lambda:program.compile(engine=engine),LEDSignProgramError)
+				continue
+			compiled_program=program.compile(engine=engine)
+			test.equal(compiled_program._data,reference._data)
+			test.equal(compiled_program._crc,reference._crc)
+			test.equal(compiled_program._crc,LEDSignCRC(reference._data).value)
+	for _ in range(0,20):
+		program=LEDSignProgram(device)(_generate_random_overlapping_program,bypass_errors=True)
+		try:
+			reference=_reference_compile(program)
+		except struct.error:
+			test.exception(lambda:program.compile(bypass_errors=True,engine=LEDSignCompiledProgram.ENGINE_PYTHON),struct.error)
+			test.exception(lambda:program.compile(bypass_errors=True),struct.error)
+			continue
+		test.equal(program.compile(bypass_errors=True,engine=LEDSignCompiledProgram.ENGINE_PYTHON)._data,reference)
+		test.equal(program.compile(bypass_errors=True)._data,reference)
+		test.equal(program.compile(bypass_errors=True,workers=2)._data,reference)
+	device.close()
+
+
+
+def _generate_chained_fade_program(mask,start,count):
+	prev_end=start
+	kp(random.getrandbits(24),mask,duration=0,time=prev_end/60)
+	for _ in range(0,count):
+		duration=random.randint(1,30)
+		kp(random.getrandbits(24),mask,duration=duration/60,time=(prev_end+duration)/60)
+		prev_end+=duration+random.choice((0,random.randint(1,10)))
+	end()
+
+
+
+@test
+def test_program_compile_span():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	programs=[LEDSignProgram(device)(lambda:(kp(0x102030,duration=0,time=0.5),kp(0xff8000,duration=0.5,time=1),end()))]
+	for _ in range(0,10):
+		programs.append(LEDSignProgram(device)(_generate_chained_fade_program,args=(random.getrandbits(48),random.randint(1,30),random.randint(1,8))))
+		programs.append(LEDSignProgram(device)(_generate_random_program,args=(programs[-1],)))
+	for program in programs:
+		reference=program.compile(engine=LEDSignCompiledProgram.ENGINE_PYTHON)
+		for workers in (1,3):
+			program._last_compilation=None
+			compiled_program=program.compile(engine=LEDSignCompiledProgram.ENGINE_SPAN,workers=workers)
+			test.equal(compiled_program._data,reference._data)
+			test.equal(compiled_program._crc,reference._crc)
+	device.close()
+
+
+
+@test
+def test_program_compile_pixel_classes():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:kp(0))
+	for _ in range(0,10):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,random.randint(1,6),random.randint(0,5)))
+		for pixel_masks in ([1<<i for i in range(0,program._hardware._led_depth<<3)],[1<<i for i,pixel in enumerate(program._hardware._pixels) if pixel is not None]+[0,0]):
+			pixel_classes=program_io._get_pixel_classes(program._keypoint_list,pixel_masks)
+			test.equal(sorted([slot for _,slots in pixel_classes for slot in slots]),list(range(0,len(pixel_masks))))
+			signatures=set()
+			for class_mask,slots in pixel_classes:
+				signature=None
+				for slot in slots:
+					test.equal(pixel_masks[slot]&class_mask,pixel_masks[slot])
+					slot_signature=tuple([kp._key for kp in program._keypoint_list.iterate(pixel_masks[slot])] if pixel_masks[slot] else [None])
+					if (signature is None):
+						signature=slot_signature
+					test.equal(slot_signature,signature)
+				test.equal(signature in signatures,False)
+				signatures.add(signature)
+	device.close()
+
+
+
+@test
+def test_program_compile_workers():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	@LEDSignProgram(device)
+	def program():
+		at(0.5)
+		kp("#ff0000",duration=0.5)
+		af(0.5)
+		kp("#00ff00",duration=0.5)
+		af(dt())
+		kp("#0000ff",duration=dt())
+		af(1)
+		end()
+	test.exception(lambda:program.compile(workers="wrong_type"),TypeError)
+	test.exception(lambda:program.compile(workers=0),ValueError)
+	test.exception(lambda:program.compile(engine=LEDSignCompiledProgram.ENGINE_PYTHON,workers=2),ValueError)
+	test.exception(lambda:program.save("build/temp.led",workers="wrong_type"),TypeError)
+	programs=[program]+[LEDSignProgram(device)(_generate_random_program,args=(program,)) for _ in range(0,3)]
+	for program in programs:
+		reference=program.compile(engine=LEDSignCompiledProgram.ENGINE_PYTHON)
+		for engine in (LEDSignCompiledProgram.ENGINE_NUMPY,LEDSignCompiledProgram.ENGINE_SPAN):
+			if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy):
+				continue
+			test.equal(program.compile(engine=engine)._data,reference._data)
+			for workers in (2,3):
+				program._last_compilation=None
+				compiled_program=program.compile(engine=engine,workers=workers)
+				test.equal(compiled_program._data,reference._data)
+				test.equal(compiled_program._crc,reference._crc)
+				test.equal(compiled_program._ctrl,reference._ctrl)
+	program.save("build/temp.led",workers=2)
+	with open("build/temp.led","rb") as rf:
+		data=rf.read()
+	program._last_compilation=None
+	program.save("build/temp.led")
+	with open("build/temp.led","rb") as rf:
+		test.equal(rf.read(),data)
+	device.close()
+
+
+
+@test
+def test_program_compile_streaming():
+	device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","access_mode":0x02,"program_upload":TestBackendDeviceContextProgramUpload(),"hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}}
+	TestBackend(device_config=device_config)
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:kp(0))
+	test.exception(lambda:program.compile(streaming="wrong_type"),TypeError)
+	test.exception(lambda:program.compile(engine=LEDSignCompiledProgram.ENGINE_PYTHON,streaming=True),ValueError)
+	test.exception(lambda:program.compile(workers=2,streaming=True),ValueError)
+	test.exception(lambda:program.save("build/temp.led",streaming="wrong_type"),TypeError)
+	block_size=LEDSignCompiledProgram.STREAM_BLOCK_SIZE
+	for _ in range(0,2):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,))
+		reference=program.compile(engine=LEDSignCompiledProgram.ENGINE_PYTHON)
+		for engine in (LEDSignCompiledProgram.ENGINE_NUMPY,LEDSignCompiledProgram.ENGINE_SPAN):
+			if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy):
+				continue
+			for stream_block_size in (1000,1<<20):
+				LEDSignCompiledProgram.STREAM_BLOCK_SIZE=stream_block_size
+				compiled_program=program.compile(engine=engine,streaming=True)
+				test.equal(compiled_program._data,None)
+				test.equal(compiled_program._crc,None)
+				test.equal(b"".join(compiled_program._stream.iterate()),bytes(reference._data))
+				test.equal(compiled_program._stream.read(4000,5000),reference._data[4000:9000])
+				test.equal(compiled_program._stream.read(12,1000),reference._data[12:1012])
+				test.equal(compiled_program._stream.read(len(reference._data)-10,100),reference._data[-10:])
+				device.upload_program(compiled_program)
+				test.equal(compiled_program._crc,reference._crc)
+				test.equal(device_config["program_upload"].ctrl,reference._ctrl)
+				test.equal(device_config["program_upload"].data,reference._data)
+				program.save("build/temp.led",engine=engine,streaming=True)
+				with open("build/temp.led","rb") as rf:
+					data=rf.read()
+				program._last_compilation=None
+				program.save("build/temp.led",engine=engine)
+				with open("build/temp.led","rb") as rf:
+					test.equal(rf.read(),data)
+	LEDSignCompiledProgram.STREAM_BLOCK_SIZE=block_size
+	device.close()
+
+
+
+@test
+def test_program_compile_cache():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	shutil.rmtree("build/cache",ignore_errors=True)
+	test.exception(lambda:LEDSignCompilationCache(None),TypeError)
+	test.exception(lambda:LEDSignCompilationCache("build/cache","wrong_type"),TypeError)
+	test.exception(lambda:LEDSignCompilationCache("build/cache",-1),ValueError)
+	cache=LEDSignCompilationCache("build/cache")
+	test.equal(cache.get_directory(),"build/cache")
+	test.equal(cache.get_max_size(),LEDSignCompilationCache.DEFAULT_MAX_SIZE)
+	test.equal(cache.get_size(),0)
+	LEDSignProgram.compilation_cache=cache
+	try:
+		seed=random.getrandbits(32)
+		random.seed(seed)
+		program=LEDSignProgram(device)(_generate_random_program,args=(None,),bypass_errors=True)
+		reference=program.compile(bypass_errors=True)
+		test.equal(cache.get_hit_count(),0)
+		test.equal(cache.get_miss_count(),1)
+		test.equal(cache.get_size(),len(reference._data)+8)
+		random.seed(seed)
+		program=LEDSignProgram(device)(_generate_random_program,args=(None,),bypass_errors=True)
+		compiled_program=program.compile(bypass_errors=True)
+		test.equal(cache.get_hit_count(),1)
+		test.equal(compiled_program._data,reference._data)
+		test.equal(compiled_program._crc,reference._crc)
+		test.equal(compiled_program._ctrl,reference._ctrl)
+		test.equal(compiled_program.get_stats()["rendered_frames"],0)
+		program.save("build/temp.led",bypass_errors=True)
+		test.equal(cache.get_miss_count(),2)
+		with open("build/temp.led","rb") as rf:
+			data=rf.read()
+		program._last_compilation=None
+		program.save("build/temp.led",bypass_errors=True)
+		test.equal(cache.get_hit_count(),2)
+		with open("build/temp.led","rb") as rf:
+			test.equal(rf.read(),data)
+		program._last_compilation=None
+		program.compile(bypass_errors=True,streaming=True)
+		test.equal((cache.get_hit_count(),cache.get_miss_count()),(2,2))
+		program=LEDSignProgram(device)(_generate_random_program,args=(None,),bypass_errors=True)
+		program.compile(bypass_errors=True)
+		test.equal(cache.get_miss_count(),3)
+		for entry in os.scandir("build/cache"):
+			with open(entry.path,"r+b") as wf:
+				wf.seek(12)
+				wf.write(b"\xff\x00\xff\x00")
+		random.seed(seed)
+		program=LEDSignProgram(device)(_generate_random_program,args=(None,),bypass_errors=True)
+		test.equal(program.compile(bypass_errors=True)._data,reference._data)
+		test.equal(cache.get_miss_count(),4)
+		cache.clear()
+		test.equal(cache.get_size(),0)
+		LEDSignProgram.compilation_cache=None
+		entry_size=len(LEDSignProgram(device)(lambda:(kp(0),end())).compile()._data)+8
+		LEDSignProgram.compilation_cache=LEDSignCompilationCache("build/cache",entry_size*2)
+		for i in range(0,4):
+			program=LEDSignProgram(device)(lambda:(kp(i),end()))
+			program.compile()
+			test.equal(len(os.listdir("build/cache")),min(i+1,2))
+		program.compile()
+		test.equal(LEDSignProgram.compilation_cache.get_hit_count(),1)
+		program=LEDSignProgram(device)(lambda:(kp(0),end()))
+		program.compile()
+		test.equal(LEDSignProgram.compilation_cache.get_miss_count(),5)
+	finally:
+		LEDSignProgram.compilation_cache=None
+	device.close()
+
+
+
+@test
+def test_program_compile_memory_mapped():
+	device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","access_mode":0x02,"program_upload":TestBackendDeviceContextProgramUpload(),"hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}}
+	TestBackend(device_config=device_config)
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:kp(0))
+	test.exception(lambda:program.compile(memory_mapped="wrong_type"),TypeError)
+	test.exception(lambda:program.compile(streaming=True,memory_mapped=True),ValueError)
+	test.exception(lambda:program.save("build/temp.led",memory_mapped="wrong_type"),TypeError)
+	block_size=LEDSignCompiledProgram.STREAM_BLOCK_SIZE
+	LEDSignCompiledProgram.STREAM_BLOCK_SIZE=1000
+	for _ in range(0,2):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,),bypass_errors=True)
+		reference=program.compile(bypass_errors=True,engine=LEDSignCompiledProgram.ENGINE_PYTHON)
+		program.save("build/temp.led",bypass_errors=True,engine=LEDSignCompiledProgram.ENGINE_PYTHON)
+		with open("build/temp.led","rb") as rf:
+			data=rf.read()
+		for engine in (LEDSignCompiledProgram.ENGINE_PYTHON,LEDSignCompiledProgram.ENGINE_NUMPY,LEDSignCompiledProgram.ENGINE_SPAN):
+			if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy):
+				continue
+			for workers in ((1,) if engine==LEDSignCompiledProgram.ENGINE_PYTHON else (1,2)):
+				compiled_program=program.compile(bypass_errors=True,engine=engine,workers=workers,memory_mapped=True)
+				test.equal(compiled_program._mapping is not None,True)
+				test.equal(repr(compiled_program).startswith("<LEDSignCompiledProgram[memory-mapped]"),True)
+				test.equal(bytes(compiled_program._data),bytes(reference._data))
+				test.equal(compiled_program._crc,reference._crc)
+				test.equal(compiled_program._mapping[:8],struct.pack("<II",reference._ctrl,reference._crc))
+				test.equal(compiled_program.get_stats(),reference.get_stats())
+				device.upload_program(compiled_program)
+				test.equal(device_config["program_upload"].data,reference._data)
+				compiled_program._close_mapping()
+				program.save("build/temp2.led",bypass_errors=True,engine=engine,workers=workers,memory_mapped=True)
+				with open("build/temp2.led","rb") as rf:
+					test.equal(rf.read(),data)
+	LEDSignCompiledProgram.STREAM_BLOCK_SIZE=block_size
+	device.close()
+
+
+
+@test
+def test_program_compiled_decode_frames():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:kp(0))
+	compiled_program=program.compile()
+	test.exception(lambda:compiled_program.decode_frames(None),TypeError)
+	test.exception(lambda:compiled_program.decode_frames(0,"wrong_type"),TypeError)
+	test.exception(lambda:compiled_program.decode_frames(-1),ValueError)
+	test.exception(lambda:compiled_program.decode_frames(1,0),ValueError)
+	test.exception(lambda:compiled_program.decode_frames(0,2),ValueError)
+	test.equal(len(compiled_program.decode_frames(1,1)),0)
+	for _ in range(0,5):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,),bypass_errors=True)
+		for compiled_program in (program.compile(bypass_errors=True),program.compile(bypass_errors=True,streaming=True),program.compile(bypass_errors=True,memory_mapped=True)):
+			led_depth=compiled_program._led_depth
+			start=random.randint(0,program._duration-1)
+			stop=random.randint(start,program._duration)
+			stride=led_depth*24
+			pixels=LEDSignFrameCodec.unpack(bytes(compiled_program._data[start*stride:stop*stride] if compiled_program._data is not None else compiled_program._stream.read(start*stride,(stop-start)*stride)),led_depth,LEDSignFrameCodec.CODEC_PYTHON)
+			frames=compiled_program.decode_frames(start,stop)
+			test.equal(len(frames),stop-start)
+			test.equal([[(int(frames[i,j,0])<<16)|(int(frames[i,j,1])<<8)|int(frames[i,j,2]) for j in range(0,led_depth<<3)] for i in range(0,stop-start)],[pixels[i*(led_depth<<3):(i+1)*(led_depth<<3)] for i in range(0,stop-start)])
+			test.equal(len(compiled_program.decode_frames()),program._duration)
+			compiled_program._close_mapping()
+	device.close()
+
+
+@test
+def test_program_compile_static_frames():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	@LEDSignProgram(device)
+	def program():
+		at(1)
+		kp("#ff0000",duration=0.5)
+		at(2)
+		kp("#00ff00",duration=0.25)
+		at(4)
+		end()
+	test.equal(program_io._get_rendered_frame_ranges(program._keypoint_list,program._duration),[(30,60),(105,120)])
+	test.equal(program_io._clip_frame_ranges([(30,60),(105,120)],0,240),[(0,1),(30,60),(105,120)])
+	test.equal(program_io._clip_frame_ranges([(30,60),(105,120)],40,110),[(40,60),(105,110)])
+	test.equal(program_io._clip_frame_ranges([(30,60),(105,120)],60,100),[(60,61)])
+	for engine in (LEDSignCompiledProgram.ENGINE_PYTHON,LEDSignCompiledProgram.ENGINE_NUMPY,LEDSignCompiledProgram.ENGINE_SPAN):
+		if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy):
+			continue
+		program._last_compilation=None
+		test.equal(program.compile(engine=engine).get_stats(),{"frames":240,"rendered_frames":46,"copied_frames":194})
+	program=LEDSignProgram(device)(lambda:kp(0))
+	for _ in range(0,10):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,))
+		if (program._has_error):
+			continue
+		stride=program._hardware._led_depth*24
+		reference=program_io._render_frame_range(LEDSignCompiledProgram.ENGINE_SPAN,[([i],program_io._get_pixel_segments(program._keypoint_list,1<<i,program._duration)) for i in range(0,program._hardware._led_depth<<3)],program._hardware._led_depth,0,program._duration)[0]
+		frame_ranges=program_io._clip_frame_ranges(program_io._get_rendered_frame_ranges(program._keypoint_list,program._duration),0,program._duration)
+		for i in range(1,program._duration):
+			if (not any([start<=i<stop for start,stop in frame_ranges])):
+				test.equal(reference[i*stride:(i+1)*stride],reference[(i-1)*stride:i*stride])
+		for engine in (LEDSignCompiledProgram.ENGINE_PYTHON,LEDSignCompiledProgram.ENGINE_NUMPY):
+			if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy):
+				continue
+			for workers in ((1,) if engine==LEDSignCompiledProgram.ENGINE_PYTHON else (1,3)):
+				program._last_compilation=None
+				compiled_program=program.compile(engine=engine,workers=workers)
+				test.equal(compiled_program._data,reference)
+				stats=compiled_program.get_stats()
+				test.equal(stats["frames"],program._duration)
+				test.equal(stats["rendered_frames"]+stats["copied_frames"],program._duration)
+	device.close()
+
+
+
+def _add_keypoints(keypoints,duration):
+	for rgb,mask,kp_duration,time in keypoints:
+		kp(rgb,mask,duration=kp_duration,time=time)
+	at(duration)
+	end()
+
+
+
+@test
+def test_program_compile_incremental():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	for _ in range(0,5):
+		masks=[0,0,0]
+		for _,_,mask in LEDSignSelector.get_pixels(hardware=device.get_hardware()):
+			masks[random.randint(0,2)]|=mask
+		keypoints=[]
+		for mask in masks:
+			time=random.randint(1,60)
+			for _ in range(0,10):
+				duration=random.choice((0,random.randint(1,60)))
+				time+=duration
+				keypoints.append((random.getrandbits(24),mask,duration/60,time/60))
+				time+=random.choice((0,random.randint(0,30)))+1
+		random.shuffle(keypoints)
+		duration=max([time for _,_,_,time in keypoints])+random.random()
+		for engine in LEDSignCompiledProgram.ENGINES:
+			if (engine==LEDSignCompiledProgram.ENGINE_PYTHON or (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy)):
+				continue
+			program=LEDSignProgram(device)(_add_keypoints,args=(keypoints[:10],duration))
+			compiled_program=program.compile(engine=engine)
+			test.equal(program.compile(engine=engine) is compiled_program,True)
+			parallel_compiled_program=program.compile(engine=engine,workers=2)
+			test.equal(parallel_compiled_program is compiled_program,False)
+			test.equal(parallel_compiled_program._data,compiled_program._data)
+			compiled_program=program.compile(engine=engine)
+			for i in range(10,len(keypoints),5):
+				data=bytes(compiled_program._data)
+				program(_add_keypoints,args=(keypoints[i:i+5],duration))
+				next_compiled_program=program.compile(engine=engine)
+				test.equal(bytes(compiled_program._data),data)
+				compiled_program=next_compiled_program
+				reference=program.compile(engine=LEDSignCompiledProgram.ENGINE_PYTHON)
+				test.equal(compiled_program._data,reference._data)
+				test.equal(compiled_program._crc,reference._crc)
+				program.compile(engine=engine)
+		program=LEDSignProgram(device)(_add_keypoints,args=(keypoints[:10],duration))
+		program.save("build/temp.led")
+		program(_add_keypoints,args=(keypoints[10:11],duration))
+		program.save("build/temp.led")
+		with open("build/temp.led","rb") as rf:
+			data=rf.read()
+		LEDSignProgram(device)(_add_keypoints,args=(keypoints[:11],duration)).save("build/temp.led")
+		with open("build/temp.led","rb") as rf:
+			test.equal(rf.read(),data)
+		program(_add_keypoints,args=(keypoints[11:12],duration),bypass_errors=True)
+		reference=program.compile(engine=LEDSignCompiledProgram.ENGINE_PYTHON,bypass_errors=True)
+		test.equal(program.compile(bypass_errors=True)._data,reference._data)
+	device.close()
+
+
+
 @test
 def test_program_keypoints():
 	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
@@ -1064,6 +1701,220 @@ def test_program_load():
 
 
 
+@test
+def test_program_load_window():
+	device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}}
+	TestBackend(device_config=device_config)
+	device=LEDSign.open()
+	test.exception(lambda:LEDSignProgram(device).load_window(0,1),LEDSignProgramError)
+	test.equal(tuple(device.get_program().load_window(0,1).get_keypoints()),())
+	device.close()
+	@LEDSignProgram(LEDSign.open())
+	def program():
+		kp("#ff0000")
+		af(1)
+		kp("#00ff00",5)
+		af(1)
+		kp("#0000ff",duration=0.5)
+		af(1)
+		end()
+	compiled_program=program.compile()
+	device_config["program_ctrl"]=compiled_program._ctrl
+	device_config["program_crc"]=compiled_program._crc
+	device_config["program_data"]=compiled_program._data
+	TestBackend(device_config=device_config)
+	device=LEDSign.open()
+	program=device.get_program()
+	test.exception(lambda:program.load_window(None,1),TypeError)
+	test.exception(lambda:program.load_window(0,None),TypeError)
+	window=program.load_window(0,10)
+	test.equal(program.is_unloaded(),True)
+	test.equal(window.is_unloaded(),False)
+	test.equal(window.get_duration(),program.get_duration())
+	keypoints=tuple(window.get_keypoints())
+	test.equal(len(keypoints),3)
+	_test_keypoint(keypoints[0],0xff0000,LEDSignSelector.get_mask(hardware=device.get_hardware()),1/60,1/60)
+	_test_keypoint(keypoints[1],0x00ff00,5,1/60,61/60)
+	_test_keypoint(keypoints[2],0x0000ff,LEDSignSelector.get_mask(hardware=device.get_hardware()),30/60,121/60)
+	window=program.load_window(1.25,2.25)
+	test.equal(program.is_unloaded(),True)
+	keypoints=tuple(window.get_keypoints())
+	test.equal(len(keypoints),3)
+	_test_keypoint(keypoints[0],0x00ff00,5,1/60,75/60)
+	_test_keypoint(keypoints[1],0xff0000,LEDSignSelector.get_mask(hardware=device.get_hardware())&(~5),1/60,75/60)
+	_test_keypoint(keypoints[2],0x0000ff,LEDSignSelector.get_mask(hardware=device.get_hardware()),30/60,121/60)
+	stride=compiled_program._led_depth*24
+	test.equal(window.compile()._data[75*stride:135*stride],compiled_program._data[75*stride:135*stride])
+	window=program.load_window(1.75,3)
+	keypoints=tuple(window.get_keypoints())
+	test.equal(len(keypoints),3)
+	_test_keypoint(keypoints[2],0x0000ff,LEDSignSelector.get_mask(hardware=device.get_hardware()),16/60,121/60)
+	keypoints=tuple(program.load_window(2.5,5).get_keypoints())
+	test.equal(len(keypoints),1)
+	_test_keypoint(keypoints[0],0x0000ff,LEDSignSelector.get_mask(hardware=device.get_hardware()),1/60,150/60)
+	keypoints=tuple(program.load_window(1/60,3).get_keypoints())
+	test.equal(len(keypoints),3)
+	_test_keypoint(keypoints[0],0xff0000,LEDSignSelector.get_mask(hardware=device.get_hardware()),1/60,1/60)
+	_test_keypoint(keypoints[1],0x00ff00,5,1/60,61/60)
+	_test_keypoint(keypoints[2],0x0000ff,LEDSignSelector.get_mask(hardware=device.get_hardware()),30/60,121/60)
+	test.equal(tuple(program.load_window(2,1).get_keypoints()),())
+	test.equal(len(tuple(program.get_keypoints())),3)
+	test.equal(len(tuple(program.load_window(0,1).get_keypoints())),1)
+	device.close()
+	test.exception(lambda:program.load_window(0,1),LEDSignProtocolError)
+	for _ in range(0,10):
+		TestBackend(device_config={"hardware":device_config["hardware"],"hardware_data":device_config["hardware_data"]})
+		compiled_program=LEDSignProgram(LEDSign.open())(_generate_random_program,args=(None,)).compile()
+		device_config["program_ctrl"]=compiled_program._ctrl
+		device_config["program_crc"]=compiled_program._crc
+		device_config["program_data"]=compiled_program._data
+		TestBackend(device_config=device_config)
+		device=LEDSign.open()
+		program=device.get_program()
+		program.load()
+		compiled_program=program.compile()
+		for _ in range(0,10):
+			start_frame=random.randint(0,program._duration)
+			end_frame=random.randint(start_frame,program._duration)
+			frames=bytes(program.load_window(start_frame/60,end_frame/60).compile().decode_frames(start_frame,end_frame))
+			test.equal(max([0]+[abs(a-b) for a,b in zip(frames,bytes(compiled_program.decode_frames(start_frame,end_frame)))])<=(program_io.LEDSignProgramParser.MAX_LINE_EXTRACTION_ERROR<<4),True)
+		device.close()
+
+
+
+@test
+def test_program_parser():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	if (not program_io.numpy):
+		test.exception(lambda:program_io.LEDSignProgramParser(LEDSignProgram(device),1,False,True),LEDSignProgramError)
+		device.close()
+		return
+	def _parse(data,led_depth,is_compressed,use_numpy,chunk_size):
+		out=LEDSignProgram(device)
+		parser=program_io.LEDSignProgramParser(out,led_depth,is_compressed,use_numpy)
+		for i in range(0,len(data),chunk_size):
+			parser.update(data[i:i+chunk_size])
+		parser.terminate()
+		return sorted([(kp.end,kp.duration,kp.rgb,kp.mask) for kp in out._keypoint_list.iterate_all()])
+	program=LEDSignProgram(device)(lambda:kp(0))
+	for _ in range(0,10):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,),bypass_errors=True)
+		for is_compressed in (False,True):
+			compiled_program=program._compile(is_compressed,LEDSignCompiledProgram.ENGINE_AUTO,1,False)
+			data=bytes(compiled_program._data)
+			for size in (len(data),len(data)-random.randint(1,compiled_program._led_depth*2)*12):
+				chunk_size=random.randint(1,compiled_program._led_depth*8)*12
+				test.equal(_parse(data[:size],compiled_program._led_depth,is_compressed,True,chunk_size),_parse(data[:size],compiled_program._led_depth,is_compressed,False,chunk_size))
+	device.close()
+
+
+@test
+def test_program_remove_and_update_keypoint():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00\x00\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2}}})
+	LEDSignProgram.error_output_file=io.StringIO()
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:kp(0,1))
+	program_keypoint=next(program.get_keypoints())
+	test.exception(lambda:program.remove_keypoint("wrong_type"),TypeError)
+	test.exception(lambda:program.remove_keypoint(next(LEDSignProgram(device)(lambda:kp(0,1)).get_keypoints())),LEDSignProgramError)
+	test.exception(lambda:program.update_keypoint("wrong_type"),TypeError)
+	test.exception(lambda:program.update_keypoint(program_keypoint,rgb=None,mask="wrong_type"),TypeError)
+	test.exception(lambda:program.update_keypoint(program_keypoint,duration="wrong_type"),TypeError)
+	test.exception(lambda:program.update_keypoint(program_keypoint,time="wrong_type"),TypeError)
+	test.exception(lambda:program.update_keypoint(program_keypoint,mask=8),ValueError)
+	program.update_keypoint(program_keypoint,"#ff0000",6,2/60,1)
+	test.equal(program.verify(),True)
+	_test_keypoint(next(program.get_keypoints()),0xff0000,6,2/60,60/60)
+	program.remove_keypoint(program_keypoint)
+	test.equal(tuple(program.get_keypoints()),())
+	test.exception(lambda:program.remove_keypoint(program_keypoint),LEDSignProgramError)
+	random.seed(0)
+	for compact in (False,True):
+		for _ in range(0,10):
+			arguments=[(random.getrandbits(24),random.randint(1,7),random.random(),random.random()*10) for _ in range(0,random.randint(1,200))]
+			program=LEDSignProgram(device,compact=compact)(lambda:kps(arguments),bypass_errors=True)
+			expected_keypoints=sorted([(x.rgb,x.end,x.duration,x.mask) for x in program.get_keypoints()])
+			for _ in range(0,random.randint(1,len(arguments))):
+				program_keypoint=random.choice(list(program.get_keypoints()))
+				expected_keypoints.remove((program_keypoint.rgb,program_keypoint.end,program_keypoint.duration,program_keypoint.mask))
+				if (random.random()<0.5):
+					program.remove_keypoint(program_keypoint)
+				else:
+					rgb=random.choice((None,random.getrandbits(24)))
+					mask=random.choice((None,random.randint(1,7)))
+					duration=random.choice((None,random.randint(1,60)))
+					end_time=random.choice((None,random.randint(1,600)))
+					program.update_keypoint(program_keypoint,rgb,mask,(None if duration is None else duration/60),(None if end_time is None else end_time/60),bypass_errors=True)
+					expected_keypoints.append((program_keypoint.rgb,program_keypoint.end,program_keypoint.duration,program_keypoint.mask))
+					test.equal(expected_keypoints[-1],((program_keypoint.rgb if rgb is None else rgb),(program_keypoint.end if end_time is None else end_time),(program_keypoint.duration if duration is None else duration),(program_keypoint.mask if mask is None else mask)))
+				program_keypoints=[(x.rgb,x.end,x.duration,x.mask) for x in program.get_keypoints()]
+				test.equal(program_keypoints,sorted(program_keypoints,key=lambda x:x[1]))
+				test.equal(sorted(program_keypoints),sorted(expected_keypoints))
+				if (compact):
+					_test_compact_keypoint_subtree(program._keypoint_list,program._keypoint_list.root,-1)
+				else:
+					_test_keypoint_subtree(program._keypoint_list.root,None)
+		for engine in (LEDSignCompiledProgram.ENGINE_SPAN,LEDSignCompiledProgram.ENGINE_NUMPY):
+			if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy):
+				continue
+			program=LEDSignProgram(device,compact=compact)(lambda:[kp(random.getrandbits(24),1<<(i%3),0.5,i//3+1) for i in range(0,30)]+[at(11),end()])
+			program.compile(engine=engine)
+			program_keypoints=list(program.get_keypoints())
+			program.remove_keypoint(program_keypoints[4])
+			program.update_keypoint(program_keypoints[10],0x123456,duration=0.25)
+			program.update_keypoint(program_keypoints[20],time=10.5)
+			test.equal(program._has_error,False)
+			reference=LEDSignProgram(device)(lambda:kps([(x.rgb,x.mask,x.duration/60,x.end/60) for x in program.get_keypoints()]))
+			reference(lambda:(at(11),end()))
+			test.equal(program.compile(engine=engine)._data,reference.compile(engine=engine)._data)
+			test.equal(program.compile(engine=engine).get_stats()["rendered_frames"]<program._duration,True)
+	device.close()
+
+
+
+@test
+def test_program_sample():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:kp(0))
+	test.exception(lambda:program.sample(None),TypeError)
+	test.exception(lambda:program.sample(0,None),TypeError)
+	test.exception(lambda:program.sample_many(None),TypeError)
+	test.exception(lambda:program.sample_many([None]),TypeError)
+	@LEDSignProgram(device)
+	def program():
+		kp("#ff0000")
+		af(1)
+		kp("#00ff00",5)
+		af(1)
+		kp("#0000ff",duration=0.5)
+		af(1)
+		end()
+	test.equal(program.sample(0),[0xff0000 for _ in range(0,8)])
+	test.equal(program.sample(1.5,5),[0x00ff00,0x00ff00])
+	test.equal(program.sample(1.75,5),[0x008080,0x008080])
+	test.equal(program.sample(-1,1),[0xff0000])
+	test.equal(program.sample(10,1),[0x0000ff])
+	test.equal(program.sample_many([1.5,0,1.5],5),[[0x00ff00,0x00ff00],[0xff0000,0xff0000],[0x00ff00,0x00ff00]])
+	test.equal(program.sample_many([]),[])
+	test.equal(program.sample(0.75,1),[0xff0000])
+	program(lambda:kp("#ffffff",1,time=0.5))
+	test.equal(program.sample(0.75,1),[0xffffff])
+	for _ in range(0,10):
+		program=LEDSignProgram(device)(_generate_random_program,args=(program,),bypass_errors=True)
+		compiled_program=program.compile(bypass_errors=True)
+		pixels=LEDSignFrameCodec.unpack(compiled_program._data,compiled_program._led_depth)
+		frame_length=compiled_program._led_depth<<3
+		mask=random.getrandbits(LEDSignSelector.get_mask(hardware=device.get_hardware()).bit_length())
+		slots=[i for i in range(0,frame_length) if ((mask&LEDSignSelector.get_mask(hardware=device.get_hardware()))>>i)&1]
+		frames=[random.randint(0,program._duration-1) for _ in range(0,20)]
+		test.equal(program.sample_many([frame/60 for frame in frames],mask),[[pixels[frame*frame_length+slot] for slot in slots] for frame in frames])
+		frame=random.randint(0,program._duration-1)
+		test.equal(program.sample(frame/60,mask),[pixels[frame*frame_length+slot] for slot in slots])
+	device.close()
+
+
 @test
 def test_program_verify():
 	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
@@ -1085,6 +1936,108 @@ def test_program_verify():
 
 
 
+@test
+def test_program_source_location():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00\x00\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2}}})
+	device=LEDSign.open()
+	def generator(output):
+		output.append(kp(0,duration=2))
+		output.extend(kps([(0,-1,2)]))
+	location=f"{generator.__code__.co_filename}:{generator.__code__.co_firstlineno+1}({generator.__code__.co_name})"
+	batch_location=f"{generator.__code__.co_filename}:{generator.__code__.co_firstlineno+2}({generator.__code__.co_name})"
+	for source_location,location_type,expected_locations in ((LEDSignProgram.SOURCE_LOCATION_NONE,type(None),("<unknown>","<unknown>")),(LEDSignProgram.SOURCE_LOCATION_LAZY,tuple,(location,batch_location)),(LEDSignProgram.SOURCE_LOCATION_EAGER,str,(location,batch_location))):
+		LEDSignProgram.error_output_file=io.StringIO()
+		output=[]
+		program=LEDSignProgram(device,source_location=source_location)(generator,args=(output,),bypass_errors=True)
+		test.equal(len(output),2)
+		for keypoint,expected_location in zip(output,expected_locations):
+			test.equal(isinstance(keypoint._frame,location_type),True)
+			test.equal(keypoint.get_source_location(),expected_location)
+		test.equal(program.verify(),False)
+		test.equal(expected_locations[0] in LEDSignProgram.error_output_file.getvalue(),True)
+		test.equal(expected_locations[1] in LEDSignProgram.error_output_file.getvalue(),True)
+	device.close()
+
+
+
+def _get_reference_overlaps(program):
+	keypoints=list(program._keypoint_list.iterate_all())
+	out=[]
+	for i,x in enumerate(keypoints):
+		start=x.end-x.duration
+		if (start<0):
+			out.append((None,x._key,-start,x.mask))
+		for entry in reversed(keypoints[:i]):
+			if ((entry.mask&x.mask) and entry.end>start):
+				out.append((entry._key,x._key,entry.end-start,entry.mask&x.mask))
+	return out
+
+
+
+@test
+def test_program_get_overlaps():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00B\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2},"B":{"data":[(0,0),(1,0),(1,1),(2,2),(3,3)],"width":4}}})
+	LEDSignProgram.error_output_file=io.StringIO()
+	device=LEDSign.open()
+	program=LEDSignProgram(device)(lambda:(at(1),kp(0,3,duration=2),kp(0xff0000,6,time=1.5,duration=1)),bypass_errors=True)
+	test.exception(lambda:program.get_overlaps("wrong_type"),TypeError)
+	test.exception(lambda:program.get_overlaps(-1),ValueError)
+	test.equal(program.get_overlaps(0),[])
+	overlaps=program.get_overlaps()
+	test.equal(len(overlaps),2)
+	program_keypoints=tuple(program.get_keypoints())
+	test.equal(overlaps[0].get_keypoints(),(None,program_keypoints[0]))
+	test.equal(overlaps[0].get_duration(),60/60)
+	test.equal(overlaps[0].get_mask(),3)
+	test.equal(overlaps[1].get_keypoints(),program_keypoints)
+	test.equal(overlaps[1].get_duration(),30/60)
+	test.equal(overlaps[1].get_mask(),2)
+	random.seed(0)
+	for compact in (False,True):
+		for _ in range(0,10):
+			arguments=[(random.getrandbits(24),random.getrandbits(8),random.random(),random.random()*10) for _ in range(0,random.randint(1,200))]
+			program=LEDSignProgram(device,compact=compact)(lambda:kps(arguments),bypass_errors=True)
+			expected_overlaps=_get_reference_overlaps(program)
+			test.equal([((None if overlap.keypoints[0] is None else overlap.keypoints[0]._key),overlap.keypoints[1]._key,overlap.duration,overlap.mask) for overlap in program.get_overlaps(1<<30)],expected_overlaps)
+			test.equal(len(program.get_overlaps(5)),min(len(expected_overlaps),5))
+			LEDSignProgram.error_output_file=io.StringIO()
+			test.equal(program.verify(),not expected_overlaps)
+			test.equal(LEDSignProgram.error_output_file.getvalue().count("Keypoint overlap"),min(len(expected_overlaps),LEDSignProgram.VERIFY_ERROR_LIMIT))
+			test.equal("Further keypoint overlaps omitted" in LEDSignProgram.error_output_file.getvalue(),len(expected_overlaps)>LEDSignProgram.VERIFY_ERROR_LIMIT)
+	device.close()
+
+
+
+@test
+def test_program_verify_incremental():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00\x00\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2}}})
+	LEDSignProgram.error_output_file=io.StringIO()
+	device=LEDSign.open()
+	test.exception(lambda:LEDSignProgram(device).verify("wrong_type"),TypeError)
+	random.seed(0)
+	for compact in (False,True):
+		program=LEDSignProgram(device,compact=compact)(lambda:[kp(0,7,1/60,i/10) for i in range(1,301)])
+		test.equal(program._unverified_keypoints,[])
+		for _ in range(0,200):
+			arguments=[(random.getrandbits(24),random.randint(1,7),random.randint(1,12)/60,random.randint(1,300)/10+random.randint(0,5)/60) for _ in range(0,random.randint(1,3))]
+			output=[]
+			program(lambda:output.extend(kps(arguments)),bypass_errors=True)
+			has_error=bool(_get_reference_overlaps(program))
+			test.equal(program._unverified_keypoints is not None,True)
+			test.equal(program.verify(),not has_error)
+			test.equal(program.verify(True),not has_error)
+			if (has_error):
+				for program_keypoint in output:
+					program.remove_keypoint(program_keypoint)
+				test.equal(program.verify(),True)
+				test.equal(program._unverified_keypoints,[])
+		program(lambda:kps([(0,7,1/60,i/10+1/60) for i in range(1,301)]),bypass_errors=True)
+		test.equal(program._unverified_keypoints,None)
+		test.equal(program.verify(),not _get_reference_overlaps(program))
+	device.close()
+
+
+
 @test
 def test_program_builder_time():
 	TestBackend()
@@ -1173,6 +2126,233 @@ def test_program_builder_command_keypoint():
 
 
 
+def _test_keypoint_subtree(x,parent):
+	if (x is None):
+		return (0,0)
+	test.equal(x._parent,parent)
+	if (parent is not None):
+		test.equal(x._key<parent._key,x==parent._nodes[0])
+	left_height,left_mask=_test_keypoint_subtree(x._nodes[0],x)
+	right_height,right_mask=_test_keypoint_subtree(x._nodes[1],x)
+	test.equal(left_height,right_height)
+	test.equal(x._subtree_mask,x.mask|left_mask|right_mask)
+	if (x._color):
+		test.equal(any([(y is not None and y._color) for y in x._nodes]),False)
+	return (left_height+(not x._color),x._subtree_mask)
+
+
+
+@test
+def test_program_builder_command_keypoints():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00\x00\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2}}})
+	device=LEDSign.open()
+	@LEDSignProgram(device)
+	def program():
+		builder=LEDSignProgramBuilder.instance()
+		test.equal(keypoints,builder.command_keypoints)
+		test.equal(kps,builder.command_keypoints)
+		test.exception(lambda:kps(["wrong_type"]),TypeError)
+		test.exception(lambda:kps([()]),TypeError)
+		test.exception(lambda:kps([(0,1,None,None,None)]),TypeError)
+		test.exception(lambda:kps([(0,"wrong_type")]),TypeError)
+		test.equal(kps([]),[])
+		at(2)
+		output=kps([(0x2288cc,),("#ff0080",2,0.5),(0,0x100)])
+		test.equal(len(output),3)
+		test.equal(output[2],None)
+	program_keypoints=tuple(program.get_keypoints())
+	test.equal(len(program_keypoints),2)
+	_test_keypoint(program_keypoints[0],0x2288cc,7,1/60,120/60)
+	_test_keypoint(program_keypoints[1],0xff0080,2,30/60,120/60)
+	for _ in range(0,10):
+		arguments=[(random.getrandbits(24),random.randint(1,7),random.random(),random.random()*10) for _ in range(0,random.randint(1,200))]
+		program=LEDSignProgram(device)(lambda:[kp(*args) for args in arguments[:len(arguments)>>1]],bypass_errors=True)
+		program(lambda:kps(arguments[len(arguments)>>1:]),bypass_errors=True)
+		reference=LEDSignProgram(device)(lambda:[kp(*args) for args in arguments],bypass_errors=True)
+		test.equal([(kp.rgb,kp.end,kp.duration,kp.mask) for kp in program.get_keypoints()],[(kp.rgb,kp.end,kp.duration,kp.mask) for kp in reference.get_keypoints()])
+		_test_keypoint_subtree(program._keypoint_list.root,None)
+		program(lambda:kp(0,1,time=random.random()*10),bypass_errors=True)
+		_test_keypoint_subtree(program._keypoint_list.root,None)
+	device.close()
+
+
+
+def _test_compact_keypoint_subtree(keypoint_list,x,parent):
+	if (x==-1):
+		return (0,0)
+	test.equal(keypoint_list._parents[x],parent)
+	if (parent!=-1):
+		test.equal(keypoint_list._get_key(x)<keypoint_list._get_key(parent),x==keypoint_list._children[0][parent])
+	left_height,left_mask=_test_compact_keypoint_subtree(keypoint_list,keypoint_list._children[0][x],x)
+	right_height,right_mask=_test_compact_keypoint_subtree(keypoint_list,keypoint_list._children[1][x],x)
+	test.equal(left_height,right_height)
+	test.equal(keypoint_list._subtree_masks[x],keypoint_list._masks[x]|left_mask|right_mask)
+	if (keypoint_list._colors[x]):
+		test.equal(any([(y!=-1 and keypoint_list._colors[y]) for y in (keypoint_list._children[0][x],keypoint_list._children[1][x])]),False)
+	return (left_height+(not keypoint_list._colors[x]),keypoint_list._subtree_masks[x])
+
+
+
+@test
+def test_program_compact_keypoints():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00\x00\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2}}})
+	LEDSignProgram.error_output_file=io.StringIO()
+	device=LEDSign.open()
+	test.equal(LEDSignProgram(device,compact=True)._keypoint_list.lookup_increasing(0,-1),None)
+	random.seed(0)
+	for _ in range(0,10):
+		arguments=[(random.getrandbits(24),random.randint(1,7),random.random(),random.random()*10) for _ in range(0,random.randint(1,200))]
+		extra_time=random.random()*10
+		stages=[lambda:[kp(*args) for args in arguments[:len(arguments)>>1]],lambda:kps(arguments[len(arguments)>>1:]),lambda:(kp(0,1,time=extra_time),at(10),end())]
+		program=LEDSignProgram(device,compact=True)
+		reference=LEDSignProgram(device)
+		for stage in stages:
+			program(stage,bypass_errors=True)
+			reference(stage,bypass_errors=True)
+		for keypoints,reference_keypoints in ((program.get_keypoints(),reference.get_keypoints()),(program.get_keypoints(2),reference.get_keypoints(2)),(program._keypoint_list.iterate_all(True),reference._keypoint_list.iterate_all(True))):
+			test.equal([(x.rgb,x.end,x.duration,x.mask,x._key,x._frame) for x in keypoints],[(x.rgb,x.end,x.duration,x.mask,x._key,x._frame) for x in reference_keypoints])
+		for _ in range(0,20):
+			key=random.randint(0,11*60)<<44
+			mask=random.randint(1,7)
+			keys=[]
+			for keypoint_list in (program._keypoint_list,reference._keypoint_list):
+				entry=keypoint_list.lookup_decreasing(key,mask)
+				keys.append(None if entry is None else entry._key)
+			test.equal(keys[0],keys[1])
+		test.equal(program.verify(),reference.verify())
+		test.equal(program.compile(bypass_errors=True,engine=LEDSignCompiledProgram.ENGINE_SPAN)._data,reference.compile(bypass_errors=True,engine=LEDSignCompiledProgram.ENGINE_SPAN)._data)
+		test.equal(program.sample_many((0,2.5,5,9.9)),reference.sample_many((0,2.5,5,9.9)))
+		_test_compact_keypoint_subtree(program._keypoint_list,program._keypoint_list.root,-1)
+	device.close()
+
+
+
+def _test_pixel_index(program):
+	for i in range(0,3):
+		keypoints,keys=program._pixel_index.get_pixel_keypoints(1<<i)
+		test.equal(keys,[x._key for x in keypoints])
+		test.equal([(x.rgb,x.end,x.duration,x.mask,x._key) for x in keypoints],[(x.rgb,x.end,x.duration,x.mask,x._key) for x in program.get_keypoints(1<<i)])
+
+
+
+@test
+def test_program_pixel_index():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00\x00\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2}}})
+	LEDSignProgram.error_output_file=io.StringIO()
+	device=LEDSign.open()
+	test.exception(lambda:LEDSignProgram(device,pixel_index="wrong_type"),TypeError)
+	test.equal(LEDSignProgram(device)._pixel_index,None)
+	program=LEDSignProgram(device,pixel_index=True)(lambda:kp(0xff0000,1,0.5,1))
+	test.equal(program._pixel_index.get_pixel_keypoints(6),([],[]))
+	test.equal(program._pixel_index.lookup_increasing(0,4),None)
+	test.equal(sorted(program._pixel_index._pixels),[0])
+	random.seed(0)
+	for compact in (False,True):
+		for _ in range(0,10):
+			arguments=[(random.getrandbits(24),random.randint(1,7),random.random(),random.random()*10) for _ in range(0,random.randint(1,200))]
+			stages=[lambda:[kp(*args) for args in arguments[:len(arguments)>>1]],lambda:kps(arguments[len(arguments)>>1:]),lambda:(at(10),end())]
+			program=LEDSignProgram(device,compact=compact,pixel_index=True)
+			reference=LEDSignProgram(device,compact=compact)
+			for stage in stages:
+				program(stage,bypass_errors=True)
+				reference(stage,bypass_errors=True)
+				_test_pixel_index(program)
+			for _ in range(0,random.randint(0,min(program._keypoint_list._size-1,20))):
+				program_keypoint=random.choice(list(program.get_keypoints()))
+				if (random.random()<0.5):
+					program.remove_keypoint(program_keypoint)
+				else:
+					program.update_keypoint(program_keypoint,random.getrandbits(24),random.randint(1,7),random.randint(1,60)/60,random.randint(1,600)/60,bypass_errors=True)
+				_test_pixel_index(program)
+			reference=LEDSignProgram(device,compact=compact)(lambda:kps([(x.rgb,x.mask,x.duration/60,x.end/60) for x in program.get_keypoints()]),bypass_errors=True)
+			reference(lambda:(at(10),end()))
+			for _ in range(0,20):
+				key=random.randint(0,11*60)<<44
+				mask=1<<random.randint(0,2)
+				keys=[]
+				for keypoint_list in (program._pixel_index,program._keypoint_list):
+					keys.append(tuple((None if entry is None else entry._key) for entry in (keypoint_list.lookup_decreasing(key,mask),keypoint_list.lookup_increasing(key,mask))))
+				test.equal(keys[0],keys[1])
+			changed_keypoints=random.sample(list(program.get_keypoints()),min(program._keypoint_list._size,5))
+			overlaps=[]
+			for pixel_index in (program._pixel_index,None):
+				overlaps.append([((None if entry is None else entry._key),x._key,duration,mask) for entry,x,duration,mask in ledsign.program._get_changed_keypoint_overlaps(program._keypoint_list,changed_keypoints,1<<30,pixel_index)])
+			test.equal(overlaps[0],overlaps[1])
+			test.equal(program.verify(),reference.verify())
+			test.equal(program.verify(True),reference.verify(True))
+			test.equal(program.sample_many((0,2.5,5,9.9)),reference.sample_many((0,2.5,5,9.9)))
+			for engine in (LEDSignCompiledProgram.ENGINE_SPAN,LEDSignCompiledProgram.ENGINE_NUMPY):
+				if (engine==LEDSignCompiledProgram.ENGINE_NUMPY and not program_io.numpy):
+					continue
+				data=reference.compile(bypass_errors=True,engine=engine)._data
+				test.equal(program.compile(bypass_errors=True,engine=engine)._data,data)
+				test.equal(b"".join(program.compile(bypass_errors=True,engine=engine,streaming=True)._stream.iterate()),bytes(data))
+	device.close()
+
+
+@test
+def test_program_optimize():
+	TestBackend(device_config={"hardware":b"A\x00\x00\x00\x00\x00\x00\x00","hardware_data":{"A":{"data":[(0,0),(1,0),(1,1)],"width":2}}})
+	LEDSignProgram.error_output_file=io.StringIO()
+	device=LEDSign.open()
+	test.equal(LEDSignProgram(device).optimize(),0)
+	program=LEDSignProgram(device)(lambda:[kp(0xff0000,1<<i,0.5,1) for i in range(0,3)]+[kp(0x00ff00,1<<i,0.5,2) for i in range(0,2)]+[kp(0x0000ff,4,0.25,2)])
+	program_keypoints=list(program.get_keypoints())
+	data=program.compile()._data
+	test.equal(program.optimize(),3)
+	test.equal(program.optimize(),0)
+	test.equal([(x.rgb,x.mask,x.end,x.duration) for x in program.get_keypoints()],[(0xff0000,7,60,30),(0x00ff00,3,120,30),(0x0000ff,4,120,15)])
+	test.equal(next(program.get_keypoints()) is program_keypoints[0],True)
+	test.equal(program.verify(True),True)
+	test.equal(program.compile()._data,data)
+	program=LEDSignProgram(device)(lambda:(kp(0,1,0.5,1),kp(0xff,2,0.5,0.9)))
+	program(lambda:kp(0,2,0.5,1),bypass_errors=True)
+	test.equal(program.optimize(),1)
+	test.equal(program.verify(),False)
+	program=LEDSignProgram(device)(lambda:(kp(0xff0000,3,0.5,1),kp(0x00ff00,4,0.5,1)))
+	program(lambda:(kp(0xff0000,6,0.5,1),kp(0x00ff00,1,0.5,1)),bypass_errors=True)
+	test.equal(program.verify(),False)
+	test.equal(program.optimize(),1)
+	test.equal(sorted([(x.rgb,x.mask) for x in program.get_keypoints()]),[(0x00ff00,5),(0xff0000,3),(0xff0000,6)])
+	test.equal(program.verify(),False)
+	random.seed(0)
+	for compact in (False,True):
+		for _ in range(0,10):
+			arguments=[(random.choice((0,0xff0000)),1<<i,random.randint(1,3)/60,end/20) for i in range(0,3) for end in random.sample(range(1,140),random.randint(1,60))]
+			random.shuffle(arguments)
+			program=LEDSignProgram(device,compact=compact,pixel_index=True)(lambda:[kp(*args) for args in arguments[:len(arguments)>>1]],bypass_errors=True)
+			data=program.compile(bypass_errors=True)._data
+			program(lambda:(kps(arguments[len(arguments)>>1:]),at(7),end()),bypass_errors=True)
+			reference=LEDSignProgram(device)(lambda:(kps(arguments),at(7),end()),bypass_errors=True)
+			samples=reference.sample_many((0,2.5,5,6.9))
+			expected_keypoints={(x.rgb,x.end,x.duration) for x in reference.get_keypoints()}
+			test.equal(program.optimize(),reference._keypoint_list._size-len(expected_keypoints))
+			test.equal(sorted([(x.rgb,x.end,x.duration) for x in program.get_keypoints()]),sorted(expected_keypoints))
+			if (compact):
+				_test_compact_keypoint_subtree(program._keypoint_list,program._keypoint_list.root,-1)
+			else:
+				_test_keypoint_subtree(program._keypoint_list.root,None)
+			_test_pixel_index(program)
+			test.equal(program.sample_many((0,2.5,5,6.9)),samples)
+			test.equal(program.compile(bypass_errors=True)._data,reference.compile(bypass_errors=True)._data)
+			test.equal(program.verify(),True)
+	LEDSignProgram.auto_optimize=True
+	program=LEDSignProgram(device)(lambda:[kp(0xff0000,1<<i,0.5,1) for i in range(0,3)])
+	test.equal(program._is_optimized,False)
+	data=program.compile()._data
+	test.equal(program._is_optimized,True)
+	test.equal(program._keypoint_list._size,1)
+	program(lambda:kp(0xff0000,4,0.5,2))
+	test.equal(program._is_optimized,False)
+	program.remove_keypoint(next(program.get_keypoints()))
+	program.compile()
+	test.equal(program._is_optimized,True)
+	LEDSignProgram.auto_optimize=False
+	test.equal(LEDSignProgram(device)(lambda:[kp(0xff0000,1<<i,0.5,1) for i in range(0,3)]).compile()._data,data)
+	device.close()
+
+
+
 @test
 def test_program_builder_command_end():
 	TestBackend()
@@ -0,0 +1,361 @@
+from ledsign import *
+from ledsign.keypoint_list import LEDSignCompactKeypointList,LEDSignKeypointList
+from ledsign.program_io import LEDSignProgramParser
+from ledsign.protocol import LEDSignProtocol
+import io
+import os
+import random
+import struct
+import sys
+import time
+import tracemalloc
+
+
+
+class BenchmarkManager(object):
+	def __init__(self):
+		self._functions=[]
+
+	def __call__(self,fn):
+		self._functions.append(fn)
+		return fn
+
+	def execute(self,names):
+		for fn in self._functions:
+			if (names and fn.__name__ not in names):
+				continue
+			print(f"{fn.__name__}:")
+			fn()
+
+	def measure(self,fn,repeat=3):
+		out=None
+		for _ in range(0,repeat):
+			start=time.perf_counter()
+			fn()
+			end=time.perf_counter()
+			if (out is None or end-start<out):
+				out=end-start
+		return out
+
+
+
+class BenchmarkBackend(object):
+	def __init__(self,letter_count:int=8,led_depth:int=60) -> None:
+		self.letter_count=letter_count
+		self.led_depth=led_depth
+		self.pending_data=None
+
+	def enumerate(self) -> list[str]:
+		return ["/dev/ledsign/benchmark"]
+
+	def open(self,path:str) -> object:
+		return object()
+
+	def close(self,handle:object) -> None:
+		pass
+
+	def io_read_write(self,handle:object,packet:bytes) -> bytes:
+		if (packet[0]==LEDSignProtocol.PACKET_TYPE_HOST_INFO):
+			hardware=bytes([0x41+i for i in range(0,self.letter_count)])+bytes(8-self.letter_count)
+			return struct.pack(LEDSignProtocol.PACKET_FORMATS[LEDSignProtocol.PACKET_TYPE_DEVICE_INFO],LEDSignProtocol.PACKET_TYPE_DEVICE_INFO,struct.calcsize(LEDSignProtocol.PACKET_FORMATS[LEDSignProtocol.PACKET_TYPE_DEVICE_INFO]),LEDSignProtocol.VERSION,4096,hardware,0,0,0,2,0,0,bytes(20),0)
+		if (packet[0]==LEDSignProtocol.PACKET_TYPE_HARDWARE_DATA_REQUEST):
+			self.pending_data=b"".join([struct.pack("<HH",(i&7)*768,(i>>3)*768) for i in range(0,self.led_depth)])
+			return struct.pack(LEDSignProtocol.PACKET_FORMATS[LEDSignProtocol.PACKET_TYPE_HARDWARE_DATA_RESPONSE],LEDSignProtocol.PACKET_TYPE_HARDWARE_DATA_RESPONSE,struct.calcsize(LEDSignProtocol.PACKET_FORMATS[LEDSignProtocol.PACKET_TYPE_HARDWARE_DATA_RESPONSE]),len(self.pending_data),8*768)
+		raise NotImplementedError(f"Unsupported packet type {packet[0]:02x}")
+
+	def io_bulk_read(self,handle:object,size:int) -> bytearray:
+		out=self.pending_data
+		self.pending_data=None
+		return bytearray(out)
+
+	def io_bulk_write(self,handle:object,data:bytearray) -> None:
+		pass
+
+
+
+def _open_device(letter_count=8,led_depth=60):
+	LEDSignProtocol._backend=BenchmarkBackend(letter_count,led_depth)
+	LEDSignProgram.error_output_file=io.StringIO()
+	return LEDSign.open()
+
+
+
+def _generate_rainbow_program(duration):
+	for x,_,mask in LEDSignSelector.get_pixels():
+		at(0.25)
+		while (tm()<=duration):
+			kp(hsv(tm()/4-x/300,1,1),mask,duration=0.25)
+			af(0.25)
+	at(duration)
+	end()
+
+
+
+def _generate_flicker_program(duration,density):
+	for x,_,mask in LEDSignSelector.get_pixels():
+		at(0)
+		while (tm()<duration):
+			if (random.random()<density):
+				kp(random.getrandbits(24),mask)
+			af(dt())
+	at(duration)
+	end()
+
+
+
+def _generate_overlapping_program(duration,overlap_count):
+	for x,_,mask in LEDSignSelector.get_pixels():
+		at(1)
+		while (tm()<duration):
+			kp(random.getrandbits(24),mask,duration=(overlap_count+0.5)/20)
+			af(1/20)
+	at(duration)
+	end()
+
+
+
+def _fill_keypoint_list(keypoint_list,count,pixel_masks):
+	size=0
+	while (size<count):
+		batch_size=min(count-size,max(size,65536),1<<20)
+		keypoint_list.insert_many([LEDSignKeypoint(random.getrandbits(24),((size+i)//len(pixel_masks))*7+7,7,pixel_masks[(size+i)%len(pixel_masks)],None) for i in range(0,batch_size)])
+		size+=batch_size
+
+
+
+class _SequentialInsertKeypointList(LEDSignKeypointList):
+	def insert_many(self,keypoints):
+		for x in keypoints:
+			self.insert(x)
+
+
+
+class _QuadraticFlushProgramParser(LEDSignProgramParser):
+	def _flush_update_stack(self,states):
+		while (self._pixel_update_stack):
+			value=states[self._pixel_update_stack[0]]
+			mask=0
+			j=0
+			while (j<len(self._pixel_update_stack)):
+				if (states[self._pixel_update_stack[j]]==value):
+					mask|=self._pixel_masks[self._pixel_update_stack[j]]
+					self._pixel_update_stack[j]=self._pixel_update_stack[-1]
+					self._pixel_update_stack.pop()
+				else:
+					j+=1
+			self._keypoints.append((value&0xffffff,(value>>44)+self._frame_offset,(value>>24)&0xfffff,mask,None))
+
+
+
+benchmark=BenchmarkManager()
+
+
+
+@benchmark
+def benchmark_compile_workers():
+	device=_open_device()
+	program=LEDSignProgram(device)(_generate_rainbow_program,args=(30,))
+	for engine,engine_name in LEDSignCompiledProgram.ENGINES.items():
+		if (engine==LEDSignCompiledProgram.ENGINE_AUTO or engine==LEDSignCompiledProgram.ENGINE_PYTHON):
+			continue
+		try:
+			program.compile(engine=engine)
+		except LEDSignProgramError:
+			continue
+		serial_time=None
+		for workers in range(1,max(os.cpu_count() or 1,4)+1):
+			elapsed_time=benchmark.measure(lambda:LEDSignCompiledProgram(program,False,engine,workers))
+			if (serial_time is None):
+				serial_time=elapsed_time
+			print(f"  {engine_name:>6} workers={workers:<2} {elapsed_time*1000:9.1f} ms  speedup={serial_time/elapsed_time:.2f}x")
+	device.close()
+
+
+
+@benchmark
+def benchmark_parser_flush():
+	device=_open_device()
+	random.seed(0)
+	for density in (0.1,0.5,1.0):
+		program=LEDSignProgram(device)(_generate_flicker_program,args=(2,density))
+		compiled_program=program.compile()
+		data=compiled_program._data
+		def _parse(parser_type):
+			parser=parser_type(LEDSignProgram(device),compiled_program._led_depth,False,False)
+			for i in range(0,len(data),LEDSignCompiledProgram.STREAM_BLOCK_SIZE):
+				parser.update(data[i:i+LEDSignCompiledProgram.STREAM_BLOCK_SIZE])
+			parser.terminate()
+		reference_time=benchmark.measure(lambda:_parse(_QuadraticFlushProgramParser))
+		elapsed_time=benchmark.measure(lambda:_parse(LEDSignProgramParser))
+		print(f"  density={density:.1f} keypoints={len(tuple(program.get_keypoints())):<6} quadratic={reference_time*1000:9.1f} ms  dict={elapsed_time*1000:9.1f} ms  speedup={reference_time/elapsed_time:.2f}x")
+	device.close()
+
+
+
+@benchmark
+def benchmark_keypoint_memory():
+	device=_open_device()
+	pixel_masks=[1<<i for i in range(0,device._hardware._mask.bit_length()) if (device._hardware._mask>>i)&1]
+	device.close()
+	random.seed(0)
+	for count in (10**5,10**6,10**7):
+		for keypoint_list_type in (LEDSignCompactKeypointList,LEDSignKeypointList):
+			tracemalloc.start()
+			start=time.perf_counter()
+			keypoint_list=keypoint_list_type()
+			_fill_keypoint_list(keypoint_list,count,pixel_masks)
+			end=time.perf_counter()
+			size,peak_size=tracemalloc.get_traced_memory()
+			tracemalloc.stop()
+			del keypoint_list
+			print(f"  {keypoint_list_type.__name__:>26} keypoints={count:<8} {size/1048576:9.1f} MiB ({size/count:5.1f} B/keypoint)  peak={peak_size/1048576:9.1f} MiB  {end-start:7.2f} s")
+
+
+
+@benchmark
+def benchmark_keypoint_bulk_load():
+	device=_open_device()
+	pixel_masks=[1<<i for i in range(0,device._hardware._mask.bit_length()) if (device._hardware._mask>>i)&1]
+	led_depth=device._hardware._led_depth
+	random.seed(0)
+	for count in (10**5,10**6):
+		def _insert(keypoint_list_type):
+			keypoint_list_type().insert_many([LEDSignKeypoint(random.getrandbits(24),(i//len(pixel_masks))*7+7,7,pixel_masks[i%len(pixel_masks)],None) for i in range(0,count)])
+		insert_time=benchmark.measure(lambda:_insert(_SequentialInsertKeypointList),1)
+		insert_many_time=benchmark.measure(lambda:_insert(LEDSignKeypointList),1)
+		data=random.randbytes(-(-count//len(pixel_masks))*led_depth*24)
+		def _parse(keypoint_list_type):
+			program=LEDSignProgram(device)
+			program._keypoint_list=keypoint_list_type()
+			parser=LEDSignProgramParser(program,led_depth,False,False)
+			for i in range(0,len(data),65532):
+				parser.update(data[i:i+65532])
+			parser.terminate()
+		parse_insert_time=benchmark.measure(lambda:_parse(_SequentialInsertKeypointList),1)
+		parse_insert_many_time=benchmark.measure(lambda:_parse(LEDSignKeypointList),1)
+		print(f"  keypoints={count:<8} insert={insert_time*1000:9.1f} ms  insert_many={insert_many_time*1000:9.1f} ms ({insert_time/insert_many_time:.2f}x)  parse: insert={parse_insert_time*1000:9.1f} ms  insert_many={parse_insert_many_time*1000:9.1f} ms ({parse_insert_time/parse_insert_many_time:.2f}x)")
+	device.close()
+
+
+
+@benchmark
+def benchmark_verify():
+	device=_open_device()
+	random.seed(0)
+	for overlap_count in (0,1,4,16):
+		program=LEDSignProgram(device)(_generate_overlapping_program,args=(10,overlap_count),bypass_errors=True)
+		def _verify_tree_walk():
+			keypoint_list=program._keypoint_list
+			out=[]
+			kp=keypoint_list.lookup_increasing(0,-1)
+			while (kp is not None):
+				start=kp.end-kp.duration
+				if (start<0):
+					out.append((None,kp))
+				entry=keypoint_list.lookup_decreasing(kp._key-1,kp.mask)
+				while (entry is not None and entry.end>start):
+					out.append((entry,kp))
+					entry=keypoint_list.lookup_decreasing(entry._key-1,kp.mask)
+				kp=keypoint_list.lookup_increasing(kp._key+1,-1)
+			return out
+		reference_time=benchmark.measure(_verify_tree_walk)
+		elapsed_time=benchmark.measure(lambda:program.verify(True))
+		print(f"  overlaps={overlap_count:<2} keypoints={len(tuple(program.get_keypoints())):<6} tree_walk={reference_time*1000:9.1f} ms  sweep={elapsed_time*1000:9.1f} ms  speedup={reference_time/elapsed_time:.2f}x")
+	device.close()
+
+
+
+@benchmark
+def benchmark_verify_stitched():
+	device=_open_device()
+	for part_count in (10,40,160):
+		def _generate_part(part):
+			for x,_,mask in LEDSignSelector.get_pixels():
+				at(part*0.5+0.25)
+				while (tm()<part*0.5+0.5):
+					kp(hsv(tm()/4-x/300,1,1),mask,duration=dt())
+					af(1/20)
+		def _stitch():
+			program=LEDSignProgram(device)
+			for part in range(0,part_count):
+				program(_generate_part,args=(part,))
+		elapsed_time=benchmark.measure(_stitch,1)
+		print(f"  parts={part_count:<3} keypoints={part_count*5*len(device.get_hardware()._pixels):<6} {elapsed_time*1000:9.1f} ms")
+	device.close()
+
+
+
+@benchmark
+def benchmark_pixel_index():
+	device=_open_device()
+	random.seed(0)
+	times=[random.random()*30 for _ in range(0,1000)]
+	for pixel_index in (False,True):
+		program=LEDSignProgram(device,pixel_index=pixel_index)(_generate_rainbow_program,args=(30,))
+		compile_time=benchmark.measure(lambda:LEDSignCompiledProgram(program,False,LEDSignCompiledProgram.ENGINE_SPAN))
+		def _sample():
+			program._timeline_index=None
+			program.sample_many(times)
+		sample_time=benchmark.measure(_sample)
+		changed_keypoints=random.sample(list(program.get_keypoints()),1000)
+		def _verify():
+			program._unverified_keypoints=list(changed_keypoints)
+			program.verify()
+		verify_time=benchmark.measure(_verify)
+		print(f"  pixel_index={pixel_index!s:<5} compile={compile_time*1000:9.1f} ms  sample={sample_time*1000:9.1f} ms  verify={verify_time*1000:9.1f} ms")
+	device.close()
+
+
+
+@benchmark
+def benchmark_mask():
+	random.seed(0)
+	for width in (1000,10000,100000):
+		value=random.getrandbits(width)&random.getrandbits(width)&random.getrandbits(width)
+		masks=[random.getrandbits(width) for _ in range(0,100)]
+		def _iterate_int():
+			mask=value
+			for i in range(0,width):
+				if (mask&1):
+					pass
+				mask>>=1
+		def _combine_int():
+			out=value
+			for mask in masks:
+				out|=mask
+				out&=value
+		mask_objects=[LEDSignMask(mask,width) for mask in masks]
+		value_mask=LEDSignMask(value,width)
+		def _combine_mask():
+			out=LEDSignMask(value_mask)
+			for mask in mask_objects:
+				out|=mask
+				out&=value_mask
+		print(f"  width={width:<6} iterate: int={benchmark.measure(_iterate_int)*1000:8.2f} ms  mask={benchmark.measure(lambda:list(LEDSignMask(value,width).iterate()))*1000:8.2f} ms  combine: int={benchmark.measure(_combine_int)*1000:8.2f} ms  mask={benchmark.measure(_combine_mask)*1000:8.2f} ms")
+
+
+
+@benchmark
+def benchmark_optimize():
+	device=_open_device()
+	def _generate_radial_program(duration):
+		cx,cy=LEDSignSelector.get_center()
+		for x,y,mask in LEDSignSelector.get_pixels():
+			offset=round(((x-cx)**2+(y-cy)**2)**0.5*8)/8
+			at(0.25)
+			while (tm()<=duration):
+				kp(hsv(tm()/duration-offset,1,1),mask,duration=0.25)
+				af(0.25)
+		at(duration)
+		end()
+	for is_optimized in (False,True):
+		program=LEDSignProgram(device)(_generate_radial_program,args=(30,))
+		optimize_time=(benchmark.measure(program.optimize,1) if is_optimized else 0)
+		verify_time=benchmark.measure(lambda:program.verify(True))
+		compile_time=benchmark.measure(lambda:LEDSignCompiledProgram(program,False,LEDSignCompiledProgram.ENGINE_SPAN))
+		print(f"  optimized={is_optimized!s:<5} keypoints={program._keypoint_list._size:<6} optimize={optimize_time*1000:9.1f} ms  verify={verify_time*1000:9.1f} ms  compile={compile_time*1000:9.1f} ms")
+	device.close()
+
+
+if (__name__=="__main__"):
+	benchmark.execute(sys.argv[1:])